@@ -0,0 +1,758 @@
+from __future__ import annotations
+import heapq
+import math
+from array import array
+from typing import Optional, List, Tuple, Dict, Set, Union
+from trees import Tree, OutOfBoundsError, directions, quadrant_bounds, \
+    range_box, in_box, boxes_overlap, boxes_distance2, box_distance2, \
+    step_point, plan_moves, nearest_by_name, box_contains, add_teams, \
+    shift_team
+
+NONE = -1
+
+
+class ArrayQuadTree(Tree):
+    """ A QuadTree laid out like trees.QuadTree (points only in leaves,
+    children created on demand, a lone leaf child merged back into its
+    parent) whose nodes are rows of parallel typed arrays instead of Python
+    objects.
+
+    Node 0 is the root. Freed rows are kept on a free list and reused by the
+    next split. Names are stored once and referred to by integer ids. Each
+    row also keeps the per-team counts of the players below it. It
+    offers the same field interface as QuadTree, so a game can be played
+    on it unchanged.
+    """
+    _centre: Tuple[int, int]
+    _cx: array
+    _cy: array
+    _px: array
+    _py: array
+    _pid: array
+    _kids: array
+    _free: List[int]
+    _names: List[Optional[str]]
+    _ids: Dict[str, int]
+    _free_ids: List[int]
+    _node_of: array
+    _teams: List[Dict[Optional[str], int]]
+    _team_of: Dict[str, Optional[str]]
+    _moves: int
+    _in_place_moves: int
+
+    def __init__(self, centre: Tuple[int, int]) -> None:
+        """Initialize a new ArrayQuadTree instance
+        Runtime: O(1)
+        """
+        self._centre = centre
+        self._cx = array('i')
+        self._cy = array('i')
+        self._px = array('i')
+        self._py = array('i')
+        self._pid = array('i')
+        self._kids = array('i')
+        self._free = []
+        self._names = []
+        self._ids = {}
+        self._free_ids = []
+        self._node_of = array('i')
+        self._teams = []
+        self._team_of = {}
+        self._moves = 0
+        self._in_place_moves = 0
+        self._new_node(centre)
+
+    def _new_node(self, centre: Tuple[int, int]) -> int:
+        """ Return the row of a new empty node centred at <centre>, reusing a
+        freed row if there is one.
+        """
+        if self._free:
+            node = self._free.pop()
+            self._cx[node] = centre[0]
+            self._cy[node] = centre[1]
+            self._pid[node] = NONE
+            self._teams[node] = {}
+            return node
+        self._teams.append({})
+        self._cx.append(centre[0])
+        self._cy.append(centre[1])
+        self._px.append(0)
+        self._py.append(0)
+        self._pid.append(NONE)
+        self._kids.extend((NONE, NONE, NONE, NONE))
+        return len(self._cx) - 1
+
+    def _free_node(self, node: int) -> None:
+        """ Put the row <node> on the free list.
+        """
+        self._pid[node] = NONE
+        self._teams[node] = {}
+        for i in range(4 * node, 4 * node + 4):
+            self._kids[i] = NONE
+        self._free.append(node)
+
+    def _new_id(self, name: str) -> int:
+        """ Return a fresh id for <name>.
+        """
+        if self._free_ids:
+            i = self._free_ids.pop()
+            self._names[i] = name
+        else:
+            i = len(self._names)
+            self._names.append(name)
+            self._node_of.append(NONE)
+        self._ids[name] = i
+        return i
+
+    def _free_id(self, i: int) -> None:
+        """ Forget the name with id <i>.
+        """
+        del self._ids[self._names[i]]
+        self._names[i] = None
+        self._free_ids.append(i)
+
+    def _team(self, i: int) -> Optional[str]:
+        """ Return the team of the player with id <i>.
+        """
+        return self._team_of.get(self._names[i])
+
+    def _store(self, node: int, i: int, point: Tuple[int, int]) -> None:
+        """ Make <node> the leaf holding the player with id <i> at <point>.
+        """
+        self._px[node] = point[0]
+        self._py[node] = point[1]
+        self._pid[node] = i
+        self._node_of[i] = node
+
+    def _is_leaf(self, node: int) -> bool:
+        """ Return True if <node> has no children.
+        """
+        kids = self._kids
+        k = 4 * node
+        return kids[k] == NONE and kids[k + 1] == NONE \
+            and kids[k + 2] == NONE and kids[k + 3] == NONE
+
+    def _bounds(self) -> Tuple[int, int, int, int]:
+        """ Return the (left, top, right, bottom) region covered by the root.
+        """
+        return 0, 0, self._centre[0] * 2, self._centre[1] * 2
+
+    def _find(self, point: Tuple[int, int]) -> int:
+        """ Return the leaf holding a player at <point>, or NONE.
+        """
+        node = 0
+        while self._pid[node] == NONE:
+            q = directions((self._cx[node], self._cy[node]), point)
+            node = self._kids[4 * node + q - 1]
+            if node == NONE:
+                return NONE
+        if self._px[node] == point[0] and self._py[node] == point[1]:
+            return node
+        return NONE
+
+    def __contains__(self, name: str) -> bool:
+        """ Return True if a player named <name> is stored in this tree.
+        Runtime: O(1)
+        >>> q = ArrayQuadTree((50, 50))
+        >>> q.insert("Eric", (60, 60))
+        >>> q.__contains__("Eric")
+        True
+        """
+        return name in self._ids
+
+    def contains_point(self, point: Tuple[int, int]) -> bool:
+        """ Return True if a player at location <point> is stored in this tree.
+        Runtime: O(log(n))
+        >>> q = ArrayQuadTree((50, 50))
+        >>> q.insert("Eric", (60, 60))
+        >>> q.contains_point((60, 60))
+        True
+        >>> q.contains_point((61, 60))
+        False
+        """
+        return self._find(point) != NONE
+
+    def getpoint(self, name: str) -> Optional[Tuple[int, int]]:
+        """ Return the location of the player named <name>, or None if there
+        is no such player in this tree.
+        Runtime: O(1)
+        """
+        i = self._ids.get(name)
+        if i is None:
+            return None
+        node = self._node_of[i]
+        return self._px[node], self._py[node]
+
+    def getname(self, point: Tuple[int, int]) -> Optional[str]:
+        node = self._find(point)
+        if node == NONE:
+            return None
+        return self._names[self._pid[node]]
+
+    def insert(self, name: str, point: Tuple[int, int]) -> None:
+        """Insert a player named <name> into this tree at point <point>.
+        Raise an OutOfBoundsError if <point> is out of bounds.
+        Raise an OutOfBoundsError if another player is already named <name>
+        or already at <point>.
+        Runtime: O(log(n))
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (160, 160))
+        >>> q.getpoint("Eric"), q.getpoint("Joe")
+        ((150, 150), (160, 160))
+        """
+        if point[0] < 0 or point[1] < 0 or point[0] > self._centre[0] * 2 \
+                or point[1] > self._centre[1] * 2:
+            raise OutOfBoundsError('out of bounds')
+        if name in self._ids or self.contains_point(point):
+            raise OutOfBoundsError('occupied')
+        self._insert(self._new_id(name), point, 0, self._bounds())
+
+    def _insert(self, i: int, point: Tuple[int, int], node: int,
+                bounds: Tuple[int, int, int, int]) -> None:
+        """ Store the player with id <i> at <point> below <node>, which covers
+        the region <bounds>, splitting leaves on the way down, and count it
+        in the team counts of every node it passes.
+        """
+        pid = self._pid
+        kids = self._kids
+        teams = self._teams
+        team = self._team(i)
+        while True:
+            if pid[node] == NONE and self._is_leaf(node):
+                self._store(node, i, point)
+                teams[node] = {team: 1}
+                return
+            centre = (self._cx[node], self._cy[node])
+            if pid[node] != NONE:
+                old = (self._px[node], self._py[node])
+                q = directions(centre, old)
+                sub = quadrant_bounds(bounds, centre, q)
+                child = self._new_node(((sub[0] + sub[2]) // 2,
+                                        (sub[1] + sub[3]) // 2))
+                self._store(child, pid[node], old)
+                teams[child] = dict(teams[node])
+                pid[node] = NONE
+                kids[4 * node + q - 1] = child
+            teams[node][team] = teams[node].get(team, 0) + 1
+            q = directions(centre, point)
+            sub = quadrant_bounds(bounds, centre, q)
+            child = kids[4 * node + q - 1]
+            if child == NONE:
+                child = self._new_node(((sub[0] + sub[2]) // 2,
+                                        (sub[1] + sub[3]) // 2))
+                self._store(child, i, point)
+                teams[child] = {team: 1}
+                kids[4 * node + q - 1] = child
+                return
+            node, bounds = child, sub
+
+    def _detach(self, point: Tuple[int, int], node: int) -> int:
+        """ Remove the player at <point> from below <node> and return its id,
+        or NONE if there is no such player. The id is not freed.
+
+        The player is taken out of the team counts of every node it was
+        below. Empty leaves are freed on the way back up, and a node left
+        with a single leaf child takes that child's point back.
+        """
+        pid = self._pid
+        kids = self._kids
+        path = []
+        while pid[node] == NONE:
+            q = directions((self._cx[node], self._cy[node]), point)
+            child = kids[4 * node + q - 1]
+            if child == NONE:
+                return NONE
+            path.append((node, q))
+            node = child
+        if self._px[node] != point[0] or self._py[node] != point[1]:
+            return NONE
+        i = pid[node]
+        pid[node] = NONE
+        self._teams[node] = {}
+        team = self._team(i)
+        for parent, _ in path:
+            counts = self._teams[parent]
+            if counts[team] == 1:
+                del counts[team]
+            else:
+                counts[team] -= 1
+        for parent, q in reversed(path):
+            changed = False
+            child = kids[4 * parent + q - 1]
+            if pid[child] == NONE and self._is_leaf(child):
+                kids[4 * parent + q - 1] = NONE
+                self._free_node(child)
+                changed = True
+            slots = [k for k in range(4 * parent, 4 * parent + 4)
+                     if kids[k] != NONE]
+            if len(slots) == 1 and pid[kids[slots[0]]] != NONE:
+                kid = kids[slots[0]]
+                self._store(parent, pid[kid],
+                            (self._px[kid], self._py[kid]))
+                kids[slots[0]] = NONE
+                self._free_node(kid)
+                changed = True
+            if not changed:
+                break
+        return i
+
+    def remove(self, name: str) -> None:
+        """ Remove information about a player named <name> from this tree.
+        Runtime: O(log(n))
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.remove("Eric")
+        >>> q.__contains__("Eric")
+        False
+        """
+        point = self.getpoint(name)
+        if point is not None:
+            self.remove_point(point)
+
+    def remove_point(self, point: Tuple[int, int]) -> None:
+        """ Remove information about a player at point <point> from this tree.
+        Runtime: O(log(n))
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (50, 50))
+        >>> q.remove_point((150, 150))
+        >>> q.contains_point((150, 150)), q.size(), q.height()
+        (False, 1, 1)
+        """
+        i = self._detach(point, 0)
+        if i != NONE:
+            self._free_id(i)
+
+    def move(self, name: str, direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player named <name> after moving it
+        in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(log(n))
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.move("Eric", "N", 10)
+        (150, 140)
+        """
+        point = self.getpoint(name)
+        if point is None:
+            return None
+        return self._relocate(point, step_point(point, direction, steps))
+
+    def move_point(self, point: Tuple[int, int], direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player at point <point> after
+        moving it in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(log(n))
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        """
+        if not self.contains_point(point):
+            return None
+        return self._relocate(point, step_point(point, direction, steps))
+
+    def move_many(self, moves: List[Tuple[str, str, int]]) \
+            -> List[Union[Tuple[int, int], OutOfBoundsError, None]]:
+        """ Make each (name, direction, steps) move of <moves> in order, as
+        move(name, direction, steps) would, and return the outcome of each:
+        the player's new location, None if there is no player named <name>,
+        or the OutOfBoundsError move would have raised.
+        Runtime: O(n + m log(n)) for m moves
+        === precondition ===
+        every direction in ['N', 'S', 'E', 'W']
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.move_many([("Eric", "S", 60), ("Eric", "W", 10)])
+        [OutOfBoundsError('out of bounds'), (140, 150)]
+        """
+        index = {name: self.getpoint(name) for name in self._ids}
+        outcomes, steps = plan_moves(index, self._bounds(), moves)
+        for _, point, new in steps:
+            self._shift(point, new)
+        return outcomes
+
+    def _relocate(self, point: Tuple[int, int],
+                  new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player at <point> to <new> and return <new>.
+        """
+        if new[0] < 0 or new[1] < 0 or new[0] > self._centre[0] * 2 \
+                or new[1] > self._centre[1] * 2:
+            raise OutOfBoundsError('out of bounds')
+        if self.contains_point(new):
+            raise OutOfBoundsError('occupied')
+        return self._shift(point, new)
+
+    def _shift(self, point: Tuple[int, int],
+               new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player at <point> to the free, in-bounds point <new> and
+        return <new>, updating its leaf in place when no split line
+        separates the two locations.
+        """
+        node = 0
+        bounds = self._bounds()
+        while self._pid[node] == NONE:
+            centre = (self._cx[node], self._cy[node])
+            q = directions(centre, point)
+            if q != directions(centre, new):
+                break
+            bounds = quadrant_bounds(bounds, centre, q)
+            node = self._kids[4 * node + q - 1]
+        if self._pid[node] != NONE:
+            self._px[node] = new[0]
+            self._py[node] = new[1]
+            self._in_place_moves += 1
+        else:
+            self._insert(self._detach(point, node), new, node, bounds)
+        self._moves += 1
+        return new
+
+    def move_stats(self) -> Dict[str, int]:
+        """ Return the number of successful moves made in this tree under
+        'moves', and how many of those updated the player's leaf in place
+        under 'in_place'.
+        Runtime: O(1)
+        """
+        return {'moves': self._moves, 'in_place': self._in_place_moves}
+
+    def names_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> List[str]:
+        """ Return a list of names of players whose location is in the
+        <direction> relative to <point> and whose location is within
+        <distance> along both the x and y axis.
+        Runtime: O(log(n) + k) for k names found when distance is small
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW']
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (110, 110))
+        >>> q.insert('Jack', (90, 109))
+        >>> sorted(q.names_in_range((100, 100), 'SE', 10))
+        ['Eric', 'Joe']
+        """
+        lst = []
+        box = range_box(point, direction, distance)
+        left, top, right, bottom = box
+        pid, kids, px, py = self._pid, self._kids, self._px, self._py
+        stack = [(0, self._bounds())]
+        while stack:
+            node, bounds = stack.pop()
+            if pid[node] != NONE:
+                if left <= px[node] <= right and top <= py[node] <= bottom:
+                    lst.append(self._names[pid[node]])
+                continue
+            cx = self._cx[node]
+            cy = self._cy[node]
+            for q in (1, 2, 3, 4):
+                child = kids[4 * node + q - 1]
+                if child != NONE:
+                    sub = quadrant_bounds(bounds, (cx, cy), q)
+                    if boxes_overlap(box, sub):
+                        stack.append((child, sub))
+        return lst
+
+    def names_in_range_many(self, queries: List[Tuple[Tuple[int, int], str,
+                                                      int]]) \
+            -> List[List[str]]:
+        """ Return, for each (point, direction, distance) query in <queries>,
+        the list names_in_range(point, direction, distance) would return.
+        Results are in the same order as <queries>.
+        Runtime: faster than len(queries) separate names_in_range calls
+        === precondition ===
+        every direction in ['NE', 'SE', 'NW', 'SW']
+        """
+        results = [[] for _ in queries]
+        boxes = [(i, range_box(point, direction, distance))
+                 for i, (point, direction, distance) in enumerate(queries)]
+        pid = self._pid
+        kids = self._kids
+        stack = [(0, self._bounds(), boxes)]
+        while stack:
+            node, bounds, active = stack.pop()
+            if pid[node] != NONE:
+                point = (self._px[node], self._py[node])
+                for i, box in active:
+                    if in_box(box, point):
+                        results[i].append(self._names[pid[node]])
+                continue
+            centre = (self._cx[node], self._cy[node])
+            for q in (1, 2, 3, 4):
+                child = kids[4 * node + q - 1]
+                if child != NONE:
+                    sub = quadrant_bounds(bounds, centre, q)
+                    inner = [(i, box) for i, box in active
+                             if boxes_overlap(box, sub)]
+                    if inner:
+                        stack.append((child, sub, inner))
+        return results
+
+    def nearest(self, point: Tuple[int, int], k: int = 1,
+                include: Optional[Set[str]] = None) \
+            -> List[Tuple[str, float]]:
+        """ Return (name, distance) pairs for the <k> players closest to
+        <point>, nearest first, counting only players named in <include> if
+        it is given. Distances are straight-line distances. A player standing
+        at <point> itself is included, at distance 0.
+
+        Nodes are visited best first, in order of how close their region comes
+        to <point>, and the search stops once the <k> best players found are
+        closer than every region left. An <include> of at most sqrt(n) names
+        is answered from the name ids instead.
+        Runtime: O(log(n) + k) typical
+        === precondition ===
+        k >= 0
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (110, 100))
+        >>> q.insert('Jack', (30, 160))
+        >>> q.nearest((100, 100), 2)
+        [('Eric', 7.0710678118654755), ('Joe', 10.0)]
+        >>> q.nearest((100, 100), 1, {'Jack', 'Joe'})
+        [('Joe', 10.0)]
+        """
+        if include is not None and len(include) ** 2 <= len(self._ids):
+            return nearest_by_name({name: self.getpoint(name)
+                                    for name in include if name in self._ids},
+                                   point, k, include)
+        best = []
+        if k <= 0 or not self._ids:
+            return []
+        pid, px, py, names = self._pid, self._px, self._py, self._names
+        heap = [(0, 0, self._bounds())]
+        while heap:
+            d2, node, bounds = heapq.heappop(heap)
+            if len(best) == k and d2 >= -best[0][0]:
+                break
+            if pid[node] != NONE:
+                name = names[pid[node]]
+                if include is not None and name not in include:
+                    continue
+                d2 = (px[node] - point[0]) ** 2 + (py[node] - point[1]) ** 2
+                if len(best) < k:
+                    heapq.heappush(best, (-d2, name))
+                elif d2 < -best[0][0]:
+                    heapq.heapreplace(best, (-d2, name))
+                continue
+            for child, region in self._parts(node, bounds):
+                d2 = box_distance2(region, point)
+                if len(best) < k or d2 < -best[0][0]:
+                    heapq.heappush(heap, (d2, child, region))
+        return [(name, math.sqrt(-d2)) for d2, name in
+                sorted(best, key=lambda item: (-item[0], item[1]))]
+
+    def find_pairs_within(self, radius: int) -> List[Tuple[str, str]]:
+        """ Return a (name, name) pair for every two players in this tree
+        whose straight-line distance apart is at most <radius>. Each pair
+        appears once, in no particular order.
+
+        The tree is joined with itself as in QuadTree.find_pairs_within: a
+        stack item is one node, whose children are paired with each other,
+        or two nodes whose regions come within <radius> of each other.
+        Runtime: O(n + k) typical for k pairs and a small radius
+        === precondition ===
+        radius >= 0
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (108, 109))
+        >>> q.insert('Jack', (102, 101))
+        >>> q.insert('Ann', (150, 150))
+        >>> sorted(sorted(pair) for pair in q.find_pairs_within(5))
+        [['Eric', 'Jack'], ['Eric', 'Joe']]
+        """
+        pairs = []
+        if len(self._ids) < 2:
+            return pairs
+        limit = radius * radius
+        pid, px, py, names = self._pid, self._px, self._py, self._names
+        stack = [(0, self._bounds(), NONE, None)]
+        while stack:
+            a, a_region, b, b_region = stack.pop()
+            if b == NONE:
+                if pid[a] != NONE:
+                    continue
+                parts = self._parts(a, a_region)
+                for i, (child, region) in enumerate(parts):
+                    stack.append((child, region, NONE, None))
+                    for other, other_region in parts[i + 1:]:
+                        if boxes_distance2(region, other_region) <= limit:
+                            stack.append((child, region, other, other_region))
+                continue
+            if pid[a] != NONE and pid[b] != NONE:
+                if (px[a] - px[b]) ** 2 + (py[a] - py[b]) ** 2 <= limit:
+                    pairs.append((names[pid[a]], names[pid[b]]))
+                continue
+            if pid[a] != NONE:
+                a, a_region, b, b_region = b, b_region, a, a_region
+            for child, region in self._parts(a, a_region):
+                if boxes_distance2(region, b_region) <= limit:
+                    stack.append((child, region, b, b_region))
+        return pairs
+
+    def _parts(self, node: int, bounds: Tuple[int, int, int, int]) \
+            -> List[Tuple[int, Tuple[int, int, int, int]]]:
+        """ Return the (child, region) pairs of the children of <node>, which
+        covers the region <bounds>.
+        """
+        centre = (self._cx[node], self._cy[node])
+        parts = []
+        for q in (1, 2, 3, 4):
+            child = self._kids[4 * node + q - 1]
+            if child != NONE:
+                parts.append((child, quadrant_bounds(bounds, centre, q)))
+        return parts
+
+    def set_team(self, name: str, team: Optional[str]) -> None:
+        """ Record that the player named <name> plays for <team>, whether or
+        not it is in this tree yet. The team is kept if the player is
+        removed, and is used again if it is inserted later. Players never
+        given a team count under None.
+        Runtime: O(log(n))
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.count_in_range((100, 100), 'SE', 10)
+        {None: 1}
+        >>> q.set_team('Eric', 'green')
+        >>> q.count_in_range((100, 100), 'SE', 10)
+        {'green': 1}
+        """
+        old = self._team_of.get(name)
+        self._team_of[name] = team
+        point = self.getpoint(name)
+        if point is None or old == team:
+            return
+        node = 0
+        while node != NONE:
+            shift_team(self._teams[node], old, team)
+            if self._pid[node] != NONE:
+                return
+            q = directions((self._cx[node], self._cy[node]), point)
+            node = self._kids[4 * node + q - 1]
+
+    def count_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> Dict[Optional[str], int]:
+        """ Return how many of the players names_in_range(<point>,
+        <direction>, <distance>) would list play for each team, leaving out
+        teams with no such player.
+
+        A node whose whole region lies in the box adds its stored counts
+        without being searched.
+        Runtime: O(log(n)) for each node on the edge of the box
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW', 'ALL']
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.set_team('Eric', 'green')
+        >>> q.set_team('Jack', 'purple')
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (110, 110))
+        >>> q.insert('Jack', (109, 109))
+        >>> q.insert('Ann', (150, 150))
+        >>> q.count_in_range((100, 100), 'SE', 10) == {
+        ...     'green': 1, 'purple': 1, None: 1}
+        True
+        """
+        counts = {}
+        if not self._ids:
+            return counts
+        box = range_box(point, direction, distance)
+        pid = self._pid
+        stack = [(0, self._bounds())]
+        while stack:
+            node, bounds = stack.pop()
+            if box_contains(box, bounds):
+                add_teams(counts, self._teams[node])
+            elif pid[node] != NONE:
+                if in_box(box, (self._px[node], self._py[node])):
+                    team = self._team(pid[node])
+                    counts[team] = counts.get(team, 0) + 1
+            else:
+                for child, sub in self._parts(node, bounds):
+                    if boxes_overlap(box, sub):
+                        stack.append((child, sub))
+        return counts
+
+    def size(self) -> int:
+        """ Return the number of players in <self>
+        Runtime: O(1)
+        """
+        return len(self._ids)
+
+    def height(self) -> int:
+        """ Return the height of <self>
+        Height is measured as the number of nodes in the path from the root
+        of this tree to the node at the greatest depth in this tree.
+        Runtime: O(n)
+        >>> q = ArrayQuadTree((100, 100))
+        >>> q.height()
+        0
+        >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (50, 50))
+        >>> q.height()
+        2
+        """
+        if self.is_empty():
+            return 0
+        best = 0
+        stack = [(0, 1)]
+        while stack:
+            node, level = stack.pop()
+            best = max(best, level)
+            for child in self._kids[4 * node:4 * node + 4]:
+                if child != NONE:
+                    stack.append((child, level + 1))
+        return best
+
+    def is_leaf(self) -> bool:
+        """ Return True if <self> has no children
+        Runtime: O(1)
+        """
+        return self._is_leaf(0)
+
+    def is_empty(self) -> bool:
+        """ Return True if <self> does not store any information about the
+        location of any players.
+        Runtime: O(1)
+        """
+        return not self._ids
+
+    def is_valid(self) -> bool:
+        """ Return True if every player sits in a leaf whose region contains
+        its location, no node below the root is empty, the name ids agree
+        with the leaves, and every node's team counts add up to those of its
+        children.
+        Runtime: O(n)
+        """
+        seen = 0
+        stack = [(0, self._bounds())]
+        while stack:
+            node, bounds = stack.pop()
+            if self._pid[node] != NONE:
+                i = self._pid[node]
+                if not self._is_leaf(node) or self._node_of[i] != node \
+                        or not in_box(bounds, (self._px[node],
+                                               self._py[node])):
+                    return False
+                if self._teams[node] != {self._team(i): 1}:
+                    return False
+                seen += 1
+                continue
+            if node != 0 and self._is_leaf(node):
+                return False
+            total = {}
+            for child, sub in self._parts(node, bounds):
+                add_teams(total, self._teams[child])
+                stack.append((child, sub))
+            if total != self._teams[node]:
+                return False
+        return seen == len(self._ids)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={'extra-imports': ['array', 'heapq', 'math',
+                                                  'typing', 'trees']})
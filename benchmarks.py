@@ -0,0 +1,945 @@
+"""Timing runs for the field types in trees.py.
+
+Run with:  python benchmarks.py
+"""
+from __future__ import annotations
+import copy
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import List, Tuple, Union
+from arraytree import ArrayQuadTree
+from buckettree import BucketQuadTree
+from games import Tag, EliminationTag
+from gridfield import GridField
+from lineartree import LinearQuadTree
+from players import Player, PlayerStore, DIRECTION_CODES, field_bounds
+from scheduler import DecisionScheduler
+from sharded import ShardedSimulation
+from trees import QuadTree, TwoDTree, OutOfBoundsError
+
+DIRECTIONS = ['NE', 'NW', 'SE', 'SW']
+
+
+def random_points(n: int, side: int) -> List[Tuple[int, int]]:
+    """ Return <n> distinct random points in the square [0, side] x [0, side].
+    """
+    points = set()
+    while len(points) < n:
+        points.add((random.randint(0, side), random.randint(0, side)))
+    return list(points)
+
+
+def clustered_points(n: int, side: int, clusters: int = 20,
+                     spread: int = 12) -> List[Tuple[int, int]]:
+    """ Return <n> distinct random points in the square [0, side] x [0, side],
+    gathered in <clusters> groups whose points lie about <spread> from the
+    group's centre.
+    """
+    centres = random_points(clusters, side)
+    points = set()
+    while len(points) < n:
+        cx, cy = random.choice(centres)
+        points.add((min(max(int(random.gauss(cx, spread)), 0), side),
+                    min(max(int(random.gauss(cy, spread)), 0), side)))
+    return list(points)
+
+
+def make_field(field_type: type, side: int) \
+        -> Union[QuadTree, TwoDTree, GridField]:
+    """ Return an empty field of <field_type> covering [0, side] x [0, side].
+    """
+    if field_type in (QuadTree, ArrayQuadTree, BucketQuadTree,
+                      LinearQuadTree):
+        return field_type((side // 2, side // 2))
+    return field_type((0, 0), (side, side))
+
+
+def fill_field(field_type: type, n: int, side: int) \
+        -> Union[QuadTree, TwoDTree]:
+    """ Return a field of <field_type> holding <n> random players.
+    """
+    field = make_field(field_type, side)
+    for i, point in enumerate(random_points(n, side)):
+        field.insert(str(i), point)
+    return field
+
+
+def fill_items(field: Union[QuadTree, TwoDTree],
+               items: List[Tuple[str, Tuple[int, int]]]) \
+        -> Union[QuadTree, TwoDTree]:
+    """ Insert every (name, point) pair of <items> into <field>, one at a
+    time, and return <field>.
+    """
+    for name, point in items:
+        field.insert(name, point)
+    return field
+
+
+def time_queries(field: Union[QuadTree, TwoDTree], side: int, distance: int,
+                 queries: int) -> Tuple[float, float]:
+    """ Return the mean time in microseconds and the mean number of names
+    found for <queries> random names_in_range calls of <distance> on <field>.
+    """
+    args = [((random.randint(0, side), random.randint(0, side)),
+             random.choice(DIRECTIONS)) for _ in range(queries)]
+    found = 0
+    start = time.perf_counter()
+    for point, direction in args:
+        found += len(field.names_in_range(point, direction, distance))
+    elapsed = time.perf_counter() - start
+    return elapsed / queries * 1e6, found / queries
+
+
+def bench_names_in_range(queries: int = 2000) -> None:
+    """ Show that names_in_range cost follows the number of names found.
+
+    The first table grows the population at a fixed density, so each query
+    finds about the same number of names while n grows 64 times. The second
+    table keeps n fixed and grows the query distance.
+    """
+    print('names_in_range, fixed density (1 player per 25 cells), '
+          'distance 10')
+    print(f'{"field":>10} {"n":>8} {"found":>8} {"us/query":>10}')
+    for field_type in (QuadTree, TwoDTree):
+        for n in (1000, 4000, 16000, 64000):
+            side = int((n * 25) ** 0.5)
+            field = fill_field(field_type, n, side)
+            per_query, found = time_queries(field, side, 10, queries)
+            print(f'{field_type.__name__:>10} {n:>8} {found:>8.1f} '
+                  f'{per_query:>10.1f}')
+    print()
+    print('names_in_range, n = 16000 on a 500 x 500 field')
+    print(f'{"field":>10} {"distance":>8} {"found":>8} {"us/query":>10}')
+    for field_type in (QuadTree, TwoDTree):
+        field = fill_field(field_type, 16000, 500)
+        for distance in (5, 10, 20, 40, 80):
+            per_query, found = time_queries(field, 500, distance, queries)
+            print(f'{field_type.__name__:>10} {distance:>8} {found:>8.1f} '
+                  f'{per_query:>10.1f}')
+
+
+def bench_names_in_range_many(n: int = 16000, side: int = 500) -> None:
+    """ Compare one tick of 2n vision queries issued one by one against the
+    same queries issued as a single names_in_range_many call.
+    """
+    print(f'one tick of {2 * n} vision queries, n = {n}')
+    print(f'{"field":>10} {"distance":>8} {"separate s":>11} '
+          f'{"batched s":>10}')
+    for field_type in (QuadTree, TwoDTree):
+        field = fill_field(field_type, n, side)
+        for distance in (5, 20):
+            queries = [((random.randint(0, side), random.randint(0, side)),
+                        random.choice(DIRECTIONS), distance)
+                       for _ in range(2 * n)]
+            start = time.perf_counter()
+            for point, direction, dist in queries:
+                field.names_in_range(point, direction, dist)
+            separate = time.perf_counter() - start
+            start = time.perf_counter()
+            field.names_in_range_many(queries)
+            batched = time.perf_counter() - start
+            print(f'{field_type.__name__:>10} {distance:>8} {separate:>11.3f} '
+                  f'{batched:>10.3f}')
+
+
+def bench_moves(n: int = 16000, side: int = 500, ticks: int = 5) -> None:
+    """ Move every player a few steps per tick, as Player.move does, and
+    report the time per tick and how many moves took the in-place path.
+    """
+    print(f'{ticks} ticks of small moves, n = {n}')
+    print(f'{"field":>10} {"s/tick":>8} {"in place":>9}')
+    for field_type in (QuadTree, TwoDTree):
+        field = fill_field(field_type, n, side)
+        names = [str(i) for i in range(n)]
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for name in names:
+                try:
+                    field.move(name, random.choice('NSEW'),
+                               random.randint(1, 3))
+                except OutOfBoundsError:
+                    pass
+        per_tick = (time.perf_counter() - start) / ticks
+        stats = field.move_stats()
+        print(f'{field_type.__name__:>10} {per_tick:>8.3f} '
+              f'{stats["in_place"] / stats["moves"]:>9.1%}')
+
+
+def bench_move_many(n: int = 16000, side: int = 500, ticks: int = 5) -> None:
+    """ Compare making every player's move of a tick with one move call each
+    against one move_many call per tick.
+    """
+    print(f'{ticks} ticks of small moves, n = {n}')
+    print(f'{"field":>10} {"move s/tick":>12} {"move_many s/tick":>17}')
+    for field_type in (QuadTree, TwoDTree, GridField):
+        moves = [[(str(i), random.choice('NSEW'), random.randint(1, 3))
+                  for i in range(n)] for _ in range(ticks)]
+        points = random_points(n, side)
+        results = []
+        for batched in (False, True):
+            field = make_field(field_type, side)
+            for i, point in enumerate(points):
+                field.insert(str(i), point)
+            start = time.perf_counter()
+            for tick in moves:
+                if batched:
+                    field.move_many(tick)
+                    continue
+                for name, direction, steps in tick:
+                    try:
+                        field.move(name, direction, steps)
+                    except OutOfBoundsError:
+                        pass
+            results.append((time.perf_counter() - start) / ticks)
+        print(f'{field_type.__name__:>10} {results[0]:>12.3f} '
+              f'{results[1]:>17.3f}')
+
+
+def bench_bulk_load(side: int = 2000) -> None:
+    """ Compare building a TwoDTree one insert at a time against
+    TwoDTree.from_points, for random and for sorted spawn points.
+    """
+    print('TwoDTree construction')
+    print(f'{"points":>8} {"n":>7} {"insert s":>9} {"height":>7} '
+          f'{"bulk s":>7} {"height":>7}')
+    for layout, n in (('random', 1000), ('random', 10000),
+                      ('random', 100000), ('sorted', 2000)):
+        if layout == 'random':
+            points = random_points(n, side)
+        else:
+            points = [(i, i) for i in range(n)]
+        items = [(str(i), point) for i, point in enumerate(points)]
+        start = time.perf_counter()
+        field = TwoDTree((0, 0), (side, side))
+        for name, point in items:
+            field.insert(name, point)
+        one_by_one = time.perf_counter() - start
+        height = field.height()
+        start = time.perf_counter()
+        bulk = TwoDTree.from_points((0, 0), (side, side), items)
+        bulk_time = time.perf_counter() - start
+        print(f'{layout:>8} {n:>7} {one_by_one:>9.3f} {height:>7} '
+              f'{bulk_time:>7.3f} {bulk.height():>7}')
+
+
+def bench_self_balancing(side: int = 2000, alpha: float = 0.75) -> None:
+    """ Compare a plain TwoDTree with a self-balancing one while players
+    spawn along a line, in a few columns, or at random, and then half of
+    them leave. Heights are taken once everyone has spawned.
+    """
+    print(f'TwoDTree updates, plain against alpha = {alpha}')
+    print(f'{"spawns":>8} {"n":>6} {"plain s":>8} {"height":>7} '
+          f'{"alpha s":>8} {"height":>7}')
+    for layout, n in (('line', 900), ('columns', 900), ('random', 900),
+                      ('random', 20000)):
+        if layout == 'line':
+            points = [(side // 2, i) for i in range(n)]
+        elif layout == 'columns':
+            points = [(side // 2 + i % 3, i // 3) for i in range(n)]
+        else:
+            points = random_points(n, side)
+        row = f'{layout:>8} {n:>6}'
+        for balance in (None, alpha):
+            start = time.perf_counter()
+            field = TwoDTree((0, 0), (side, side), balance)
+            for i, point in enumerate(points):
+                field.insert(str(i), point)
+            height = field.height()
+            for i in range(0, n, 2):
+                field.remove(str(i))
+            elapsed = time.perf_counter() - start
+            row += f' {elapsed:>8.3f} {height:>7}'
+        print(row)
+
+
+def nearest_by_scanning(field: Union[QuadTree, TwoDTree, GridField],
+                        point: Tuple[int, int], k: int) -> List[str]:
+    """ Return the names of the <k> players nearest to <point> the way a bot
+    had to find them before Tree.nearest: scan all four quadrants with a
+    doubling radius until at least <k> players turn up, then sort them.
+    """
+    radius = 1
+    while True:
+        names = set()
+        for direction in DIRECTIONS:
+            names.update(field.names_in_range(point, direction, radius))
+        if len(names) >= k or radius > 1000:
+            break
+        radius *= 2
+    return sorted(names, key=lambda name: (
+        (field.getpoint(name)[0] - point[0]) ** 2
+        + (field.getpoint(name)[1] - point[1]) ** 2))[:k]
+
+
+def bench_nearest(n: int = 16000, side: int = 500,
+                  queries: int = 2000) -> None:
+    """ Compare nearest() against scanning quadrants with growing radii.
+    """
+    print(f'{queries} nearest-player queries, n = {n}')
+    print(f'{"field":>10} {"k":>3} {"scan s":>8} {"nearest s":>10}')
+    points = [(random.randint(0, side), random.randint(0, side))
+              for _ in range(queries)]
+    for field_type in (QuadTree, TwoDTree, GridField):
+        field = fill_field(field_type, n, side)
+        for k in (1, 8):
+            start = time.perf_counter()
+            for point in points:
+                nearest_by_scanning(field, point, k)
+            scan = time.perf_counter() - start
+            start = time.perf_counter()
+            for point in points:
+                field.nearest(point, k)
+            best_first = time.perf_counter() - start
+            print(f'{field_type.__name__:>10} {k:>3} {scan:>8.3f} '
+                  f'{best_first:>10.3f}')
+
+
+def bench_count_in_range(n: int = 16000, side: int = 500,
+                         queries: int = 2000) -> None:
+    """ Compare counting the players of each team in a box by listing them
+    with names_in_range against count_in_range, for boxes of growing size on
+    fields where one player in ten is on the chasing team.
+    """
+    print(f'{queries} team counts, n = {n}')
+    print(f'{"field":>10} {"distance":>9} {"list s":>8} {"count s":>8}')
+    for field_type in (QuadTree, TwoDTree, GridField):
+        field = make_field(field_type, side)
+        team_of = {}
+        for i, point in enumerate(random_points(n, side)):
+            team_of[str(i)] = 'purple' if i % 10 == 0 else 'green'
+            field.set_team(str(i), team_of[str(i)])
+            field.insert(str(i), point)
+        for distance in (10, 50, 200):
+            args = [((random.randint(0, side), random.randint(0, side)),
+                     random.choice(DIRECTIONS)) for _ in range(queries)]
+            start = time.perf_counter()
+            for point, direction in args:
+                counts = {}
+                for name in field.names_in_range(point, direction, distance):
+                    team = team_of[name]
+                    counts[team] = counts.get(team, 0) + 1
+            listed = time.perf_counter() - start
+            start = time.perf_counter()
+            for point, direction in args:
+                field.count_in_range(point, direction, distance)
+            counted = time.perf_counter() - start
+            print(f'{field_type.__name__:>10} {distance:>9} {listed:>8.3f} '
+                  f'{counted:>8.3f}')
+
+
+def pairs_by_querying(field: Union[QuadTree, TwoDTree, GridField],
+                      radius: int) -> List[Tuple[str, str]]:
+    """ Return the pairs of players within <radius> of each other the way a
+    game had to find them before Tree.find_pairs_within: one names_in_range
+    query per player and direction, keeping each pair once.
+    """
+    pairs = []
+    for name, point in field._index.items():
+        for direction in DIRECTIONS:
+            for other in field.names_in_range(point, direction, radius):
+                spot = field.getpoint(other)
+                if name < other and (spot[0] - point[0]) ** 2 \
+                        + (spot[1] - point[1]) ** 2 <= radius * radius \
+                        and (direction in ('NE', 'SE') or spot[0] != point[0]) \
+                        and (direction in ('SE', 'SW') or spot[1] != point[1]):
+                    pairs.append((name, other))
+    return pairs
+
+
+def bench_find_pairs(n: int = 16000, side: int = 500) -> None:
+    """ Compare finding every pair of players within a collision radius with
+    one names_in_range query per player against find_pairs_within.
+    """
+    print(f'Collision pairs, n = {n}')
+    print(f'{"field":>10} {"radius":>7} {"pairs":>7} {"query s":>8} '
+          f'{"join s":>7}')
+    for field_type in (QuadTree, TwoDTree, GridField):
+        field = fill_field(field_type, n, side)
+        for radius in (1, 2, 5):
+            start = time.perf_counter()
+            pairs_by_querying(field, radius)
+            queried = time.perf_counter() - start
+            start = time.perf_counter()
+            pairs = field.find_pairs_within(radius)
+            joined = time.perf_counter() - start
+            print(f'{field_type.__name__:>10} {radius:>7} {len(pairs):>7} '
+                  f'{queried:>8.3f} {joined:>7.3f}')
+
+
+def bench_snapshot(n: int = 200000, side: int = 2000) -> None:
+    """ Time saving a field of <n> players with dump and restoring it with
+    load, against restoring it by inserting every player again.
+    """
+    items = [(str(i), point)
+             for i, point in enumerate(random_points(n, side))]
+    path = os.path.join(tempfile.mkdtemp(), 'field.snap')
+    print(f'Snapshots, n = {n}')
+    print(f'{"field":>10} {"MB":>6} {"dump s":>7} {"load s":>7} '
+          f'{"insert s":>9}')
+    for field_type in (QuadTree, TwoDTree):
+        field = make_field(field_type, side)
+        for name, point in items:
+            field.insert(name, point)
+        start = time.perf_counter()
+        field.dump(path)
+        dumped = time.perf_counter() - start
+        start = time.perf_counter()
+        field_type.load(path)
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        field = make_field(field_type, side)
+        for name, point in items:
+            field.insert(name, point)
+        inserted = time.perf_counter() - start
+        print(f'{field_type.__name__:>10} '
+              f'{os.path.getsize(path) / 2 ** 20:>6.1f} {dumped:>7.3f} '
+              f'{loaded:>7.3f} {inserted:>9.3f}')
+    os.remove(path)
+
+
+def run_versions(field: Union[QuadTree, TwoDTree],
+                 moves: List[List[Tuple[str, str]]], persistent: bool) -> List:
+    """ Make the <moves> of every tick on <field>, keeping the field of each
+    tick with snapshot if <persistent> and as a deep copy otherwise. Return
+    what was kept.
+    """
+    kept = []
+    for tick in moves:
+        for name, direction in tick:
+            try:
+                field.move(name, direction, 1)
+            except OutOfBoundsError:
+                pass
+        if persistent:
+            kept.append(field.snapshot())
+        else:
+            kept.append(copy.deepcopy(field))
+    return kept
+
+
+def bench_versions(n: int = 5000, side: int = 1000, ticks: int = 20,
+                   moving: float = 0.05) -> None:
+    """ Compare keeping the field of every tick with snapshot against
+    keeping a deep copy of it, for ticks in which a fraction <moving> of the
+    players take one step.
+    """
+    print(f'Per-tick versions, n = {n}, ticks = {ticks}, moving = {moving}')
+    print(f'{"field":>10} {"copy s":>7} {"copy MB":>8} {"snapshot s":>11} '
+          f'{"snapshot MB":>12}')
+    for field_type in (QuadTree, TwoDTree):
+        moves = [[(str(random.randrange(n)), random.choice('NSEW'))
+                  for _ in range(int(n * moving))] for _ in range(ticks)]
+        items = [(str(i), point)
+                 for i, point in enumerate(random_points(n, side))]
+        results = []
+        for persistent in (False, True):
+            field = make_field(field_type, side)
+            for name, point in items:
+                field.insert(name, point)
+            start = time.perf_counter()
+            run_versions(field, moves, persistent)
+            results.append(time.perf_counter() - start)
+            field = make_field(field_type, side)
+            for name, point in items:
+                field.insert(name, point)
+            tracemalloc.start()
+            kept = run_versions(field, moves, persistent)
+            results.append(tracemalloc.get_traced_memory()[0] / 2 ** 20)
+            tracemalloc.stop()
+            del kept
+        print(f'{field_type.__name__:>10} {results[0]:>7.3f} '
+              f'{results[1]:>8.1f} {results[2]:>11.3f} {results[3]:>12.1f}')
+
+
+def play_tag(field: Union[QuadTree, TwoDTree], n: int, ticks: int,
+             seed: int) -> bool:
+    """ Play <ticks> ticks of a Tag game with <n> players on the 500 x 500
+    <field>, steering every player towards its nearest target or away from
+    its nearest enemy, moving it, and respawning one player per tick. Return
+    True if the field is valid afterwards and agrees with every player's
+    location.
+    """
+    rng = random.Random(seed)
+    game = Tag(n, field, 60, 3, 10)
+    for name, player in game._players.items():
+        field.insert(name, player._location)
+    for _ in range(ticks):
+        for name, player in game._players.items():
+            player.nearest_direction()
+            try:
+                player._location = field.move(name, player._direction,
+                                              player._speed)
+            except OutOfBoundsError:
+                player.reverse_direction()
+        name = rng.choice(list(game._players))
+        field.remove(name)
+        while True:
+            location = (rng.randint(0, 500), rng.randint(0, 500))
+            if not field.contains_point(location):
+                break
+        field.insert(name, location)
+        game._players[name]._location = location
+        if isinstance(field, TwoDTree) and rng.random() < 0.2:
+            field.balance()
+    return field.is_valid() and all(
+        field.getpoint(name) == player._location
+        for name, player in game._players.items())
+
+
+def stress_concurrent_games(games: int = 16, n: int = 300,
+                            ticks: int = 30) -> bool:
+    """ Play <games> Tag games at once in separate threads, half on QuadTree
+    fields and half on TwoDTree fields, switching threads as often as the
+    interpreter allows. Return True if every field is valid afterwards.
+
+    >>> stress_concurrent_games(4, 50, 5)
+    True
+    """
+    results = [False] * games
+
+    def worker(i: int) -> None:
+        if i % 2 == 0:
+            field = QuadTree((250, 250))
+        else:
+            field = TwoDTree((0, 0), (500, 500))
+        results[i] = play_tag(field, n, ticks, i)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=worker, args=(i,))
+                   for i in range(games)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return all(results)
+
+
+def bench_memory(n: int = 100000, side: int = 2000) -> None:
+    """ Compare the memory held by an object-per-node QuadTree and by an
+    ArrayQuadTree storing the same <n> players, along with their insert and
+    query times.
+    """
+    items = [(str(i), point)
+             for i, point in enumerate(random_points(n, side))]
+    queries = [((random.randint(0, side), random.randint(0, side)),
+                random.choice(DIRECTIONS), 20) for _ in range(2000)]
+    print(f'QuadTree storage, n = {n}')
+    print(f'{"field":>14} {"MB":>7} {"bytes/player":>13} {"insert s":>9} '
+          f'{"query s":>8}')
+    for field_type in (QuadTree, ArrayQuadTree):
+        tracemalloc.start()
+        field = field_type((side // 2, side // 2))
+        for name, point in items:
+            field.insert(name, point)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        field = field_type((side // 2, side // 2))
+        for name, point in items:
+            field.insert(name, point)
+        insert_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for point, direction, distance in queries:
+            field.names_in_range(point, direction, distance)
+        query_time = time.perf_counter() - start
+        print(f'{field_type.__name__:>14} {used / 2 ** 20:>7.1f} '
+              f'{used / n:>13.0f} {insert_time:>9.3f} {query_time:>8.3f}')
+
+
+def bench_bucket_capacity(n: int = 20000, side: int = 1000,
+                          ticks: int = 2) -> None:
+    """ Compare QuadTree with BucketQuadTree at several bucket capacities on
+    clustered players: height, memory, insert time, one tick of small moves
+    and names_in_range at typical vision radii.
+    """
+    items = [(str(i), point)
+             for i, point in enumerate(clustered_points(n, side))]
+    radii = (5, 10, 20)
+    queries = [(point, random.choice(DIRECTIONS))
+               for _, point in random.sample(items, 2000)]
+    print(f'bucketed QuadTree, {n} clustered players')
+    print(f'{"field":>16} {"height":>7} {"MB":>6} {"insert s":>9} '
+          f'{"move s/tick":>12}'
+          + ''.join(f' {f"us/q r={r}":>10}' for r in radii))
+    for capacity in (None, 1, 4, 8, 16, 32, 64):
+        def make() -> Union[QuadTree, BucketQuadTree]:
+            if capacity is None:
+                return QuadTree((side // 2, side // 2))
+            return BucketQuadTree((side // 2, side // 2), capacity)
+        tracemalloc.start()
+        field = make()
+        for name, point in items:
+            field.insert(name, point)
+        used = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        tracemalloc.stop()
+        field = make()
+        start = time.perf_counter()
+        for name, point in items:
+            field.insert(name, point)
+        insert_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(ticks):
+            field.move_many([(name, random.choice('NSEW'),
+                              random.randint(1, 3)) for name, _ in items])
+        move_time = (time.perf_counter() - start) / ticks
+        per_query = []
+        for radius in radii:
+            start = time.perf_counter()
+            for point, direction in queries:
+                field.names_in_range(point, direction, radius)
+            per_query.append((time.perf_counter() - start)
+                             / len(queries) * 1e6)
+        label = 'QuadTree' if capacity is None else f'Bucket({capacity})'
+        print(f'{label:>16} {field.height():>7} {used:>6.1f} '
+              f'{insert_time:>9.3f} {move_time:>12.3f}'
+              + ''.join(f' {t:>10.1f}' for t in per_query))
+
+
+def bench_linear_quadtree(n: int = 100000, side: int = 2000) -> None:
+    """ Compare LinearQuadTree with QuadTree and TwoDTree for a field rebuilt
+    every round: the memory it holds, building it from all the players at
+    once, a tick of small moves and names_in_range queries.
+    """
+    items = [(str(i), point)
+             for i, point in enumerate(random_points(n, side))]
+    queries = [((random.randint(0, side), random.randint(0, side)),
+                random.choice(DIRECTIONS), 20) for _ in range(2000)]
+    moves = [(name, random.choice('NSEW'), random.randint(1, 3))
+             for name, _ in items]
+    builders = [
+        ('QuadTree', lambda: fill_items(QuadTree((side // 2, side // 2)),
+                                        items)),
+        ('TwoDTree', lambda: TwoDTree.from_points((0, 0), (side, side),
+                                                  items)),
+        ('LinearQuadTree', lambda: LinearQuadTree.from_points(
+            (side // 2, side // 2), items))]
+    print(f'rebuilt fields, n = {n}')
+    print(f'{"field":>14} {"MB":>7} {"build s":>8} {"move s/tick":>12} '
+          f'{"query s":>8}')
+    for label, build in builders:
+        tracemalloc.start()
+        field = build()
+        used = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        tracemalloc.stop()
+        del field
+        start = time.perf_counter()
+        field = build()
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        field.move_many(moves)
+        move_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for point, direction, distance in queries:
+            field.names_in_range(point, direction, distance)
+        query_time = time.perf_counter() - start
+        print(f'{label:>14} {used:>7.1f} {build_time:>8.3f} '
+              f'{move_time:>12.3f} {query_time:>8.3f}')
+
+
+def bench_player_store(n: int = 100000, side: int = 2000) -> None:
+    """ Compare the memory held by <n> Player views over one PlayerStore
+    with <n> objects keeping the same state in attribute dicts, as Player
+    used to.
+    """
+    locations = random_points(n, side)
+    print(f'player state, n = {n}')
+    print(f'{"layout":>16} {"MB":>7} {"bytes/player":>13} {"create s":>9}')
+    for layout in ('attribute dicts', 'PlayerStore'):
+        tracemalloc.start()
+        start = time.perf_counter()
+        if layout == 'PlayerStore':
+            game = EliminationTag(n, None, 3, 10)
+            players = [Player(str(i), 10, 3, game, 'green', location)
+                       for i, location in enumerate(locations)]
+        else:
+            players = [SimpleNamespace(
+                _name=str(i), _vision=10, _speed=3, _game=None,
+                _colour='green', _location=location, _points=0,
+                _targets=[], _enemies=[], _direction='')
+                for i, location in enumerate(locations)]
+        elapsed = time.perf_counter() - start
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del players
+        print(f'{layout:>16} {used / 2 ** 20:>7.1f} {used / n:>13.0f} '
+              f'{elapsed:>9.3f}')
+
+
+def bench_relationships(sizes: Tuple[int, ...] = (1000, 2000, 4000,
+                                              8000)) -> None:
+    """ Time setting up a Tag game of each size in <sizes>, and the memory
+    the game holds afterwards. Team rules keep both linear in the number of
+    players, where a target and an enemy list per player grew with n ** 2.
+    """
+    print('Tag setup')
+    print(f'{"n":>7} {"setup s":>8} {"MB":>7} {"bytes/player":>13}')
+    for n in sizes:
+        tracemalloc.start()
+        start = time.perf_counter()
+        game = Tag(n, None, 60, 3, 10)
+        elapsed = time.perf_counter() - start
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del game
+        print(f'{n:>7} {elapsed:>8.3f} {used / 2 ** 20:>7.2f} '
+              f'{used / n:>13.0f}')
+
+
+def bench_box_direction(n: int = 5000, vision: int = 30,
+                        rounds: int = 3) -> None:
+    """ Time <rounds> of direction decisions for every player of a Tag game
+    of <n> players, with the two-quadrant next_direction and with the
+    single-query box_direction, and the names_in_range queries alone: the
+    two quadrants next_direction looks at, all four quadrants one by one,
+    and the one whole box box_direction asks for.
+    """
+    game = Tag(n, QuadTree((250, 250)), 60, 3, vision)
+    for player in game._players.values():
+        player._vision = vision
+        game.field.insert(player._name, player._location)
+    players = list(game._players.values())
+    queries = (('two quadrants', ('NE', 'SW')),
+               ('four quadrants', ('NE', 'NW', 'SW', 'SE')),
+               ('one box', ('ALL',)))
+    print(f'direction decisions, n = {n}, vision = {vision}')
+    print(f'{"":>15} {"us/player":>10}')
+    for label, quadrants in queries:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for player in players:
+                for direction in quadrants:
+                    game.field.names_in_range(player._location, direction,
+                                              vision)
+        elapsed = time.perf_counter() - start
+        print(f'{label:>15} {elapsed / (rounds * n) * 1e6:>10.1f}')
+    for mode in ('next_direction', 'box_direction'):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for player in players:
+                getattr(player, mode)()
+        elapsed = time.perf_counter() - start
+        print(f'{mode:>15} {elapsed / (rounds * n) * 1e6:>10.1f}')
+
+
+def bench_scheduler(n: int = 2000, side: int = 5000, vision: int = 30,
+                    ticks: int = 20, chasers: float = 0.05) -> None:
+    """ Time the direction decisions of <ticks> ticks of a sparse Tag-like
+    arena of <n> moving players, <chasers> of them purple, deciding for
+    every player every tick and with a DecisionScheduler. Moving the
+    players and the field is not timed.
+    """
+    results = []
+    for scheduled in (False, True):
+        random.seed(n)
+        game = Tag(0, QuadTree((side // 2, side // 2)), 60, 3, vision)
+        game._players = {}
+        for i, point in enumerate(random_points(n, side)):
+            colour = 'purple' if random.random() < chasers else 'green'
+            game._players[str(i)] = Player(str(i), vision,
+                                           random.randint(1, 3), game,
+                                           colour, point)
+            game.field.insert(str(i), point)
+        players = list(game._players.values())
+        scheduler = DecisionScheduler(game) if scheduled else None
+        for player in players:
+            player.assignd()
+            if scheduler is not None:
+                scheduler.subscribe(player)
+        elapsed = 0.0
+        for _ in range(ticks):
+            start = time.perf_counter()
+            if scheduler is None:
+                for player in players:
+                    player.next_direction()
+            else:
+                scheduler.tick()
+            elapsed += time.perf_counter() - start
+            game._store.move(field_bounds(game.field))
+            for player in players:
+                game.field.remove(player._name)
+            for player in players:
+                try:
+                    game.field.insert(player._name, player._location)
+                except OutOfBoundsError:
+                    pass
+        skipped = 0.0 if scheduler is None else \
+            sum(scheduler.skipped[1:]) / (ticks - 1)
+        results.append(('every tick' if scheduler is None else 'scheduled',
+                        elapsed / ticks, skipped))
+    print(f'direction decisions per tick, n = {n}, '
+          f'{side} x {side}, vision = {vision}')
+    print(f'{"mode":>11} {"ms/tick":>8} {"skipped":>8}')
+    for label, per_tick, skipped in results:
+        print(f'{label:>11} {per_tick * 1e3:>8.2f} {skipped:>8.1%}')
+
+
+def bench_sharded(n: int = 20000, side: int = 4000, vision: int = 30,
+                  ticks: int = 5,
+                  layouts: Tuple[Tuple[int, int], ...] = ((2, 1), (2, 2),
+                                                           (4, 2))) -> None:
+    """ Time <ticks> ticks of a Tag-like arena of <n> players played by a
+    ShardedSimulation with a single tile, against the same arena split into
+    each (columns, rows) grid of tiles in <layouts>, with one worker process
+    per tile. The first tick, which sends every player to the workers, is
+    timed on its own. Speedups need at least as many cores as tiles.
+    """
+    print(f'sharded ticks, n = {n}, {side} x {side}, vision = {vision}, '
+          f'{os.cpu_count()} cores')
+    print(f'{"tiles":>7} {"first ms":>9} {"ms/tick":>8} {"speedup":>8} '
+          f'{"collisions":>11}')
+    single = None
+    for columns, rows in ((1, 1),) + tuple(layouts):
+        random.seed(n)
+        game = Tag(0, QuadTree((side // 2, side // 2)), 60, 3, vision)
+        game._players = {}
+        for i, point in enumerate(random_points(n, side)):
+            colour = 'purple' if i == 0 else 'green'
+            game._players[str(i)] = Player(str(i), vision,
+                                           random.randint(1, 3), game,
+                                           colour, point)
+            game._players[str(i)].assignd()
+        game._it = '0'
+        simulation = ShardedSimulation(game, columns, rows)
+        start = time.perf_counter()
+        collisions = simulation.tick()
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(ticks):
+            collisions += simulation.tick()
+        per_tick = (time.perf_counter() - start) / ticks
+        simulation.close()
+        if single is None:
+            single = per_tick
+        print(f'{columns}x{rows:<5} {first * 1e3:>9.1f} '
+              f'{per_tick * 1e3:>8.1f} {single / per_tick:>7.2f}x '
+              f'{collisions:>11}')
+
+
+def bench_move_kernel(n: int = 1000000, side: int = 2000,
+                      ticks: int = 10, sample: int = 20000) -> None:
+    """ Time one tick of PlayerStore.move over <n> players, against calling
+    Player.move for each of <sample> players and scaling up to <n>.
+    """
+    store = PlayerStore(n)
+    for i in range(n):
+        store.add(str(i), 10, random.randint(1, 3),
+                  (random.randint(0, side), random.randint(0, side)))
+    store._directions[:n] = [random.randint(1, len(DIRECTION_CODES) - 1)
+                             for _ in range(n)]
+    bounds = (0, 0, side, side)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        store.move(bounds)
+    kernel = (time.perf_counter() - start) / ticks
+    game = EliminationTag(sample, QuadTree((side // 2, side // 2)), 3, 10)
+    players = [Player(str(i), 10, random.randint(1, 3), game, 'green',
+                      (random.randint(0, side), random.randint(0, side)))
+               for i in range(sample)]
+    for player in players:
+        player._direction = random.choice('NSEW')
+    start = time.perf_counter()
+    for player in players:
+        player.move()
+    per_player = (time.perf_counter() - start) / sample
+    print(f'one movement tick, n = {n}')
+    print(f'{"PlayerStore.move ms":>20} {"Player.move loop ms":>20}')
+    print(f'{kernel * 1e3:>20.1f} {per_player * n * 1e3:>20.0f}')
+
+
+def bench_field_types(side: int = 500, max_vision: int = 10,
+                      ticks: int = 3) -> None:
+    """ Compare QuadTree, TwoDTree and GridField on dense 500 x 500 arenas:
+    filling the field, one tick of small moves, and one tick of two vision
+    queries per player.
+    """
+    print(f'field types on a {side} x {side} arena, max_vision {max_vision}')
+    print(f'{"field":>10} {"n":>7} {"insert s":>9} {"move s/tick":>12} '
+          f'{"vision s/tick":>14}')
+    for n in (5000, 20000, 80000):
+        items = [(str(i), point)
+                 for i, point in enumerate(random_points(n, side))]
+        queries = [(point, random.choice(DIRECTIONS),
+                    random.randint(0, max_vision))
+                   for _ in range(2) for _, point in items]
+        for field_type in (QuadTree, TwoDTree, GridField):
+            if field_type is GridField:
+                field = GridField((0, 0), (side, side),
+                                  max_vision=max_vision)
+            else:
+                field = make_field(field_type, side)
+            start = time.perf_counter()
+            for name, point in items:
+                field.insert(name, point)
+            insert_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(ticks):
+                for name, _ in items:
+                    try:
+                        field.move(name, random.choice('NSEW'),
+                                   random.randint(1, 3))
+                    except OutOfBoundsError:
+                        pass
+            move_time = (time.perf_counter() - start) / ticks
+            start = time.perf_counter()
+            for point, direction, distance in queries:
+                field.names_in_range(point, direction, distance)
+            query_time = time.perf_counter() - start
+            print(f'{field_type.__name__:>10} {n:>7} {insert_time:>9.3f} '
+                  f'{move_time:>12.3f} {query_time:>14.3f}')
+
+
+if __name__ == '__main__':
+    random.seed(148)
+    bench_names_in_range()
+    print()
+    bench_names_in_range_many()
+    print()
+    bench_moves()
+    print()
+    bench_move_many()
+    print()
+    bench_bulk_load()
+    print()
+    bench_self_balancing()
+    print()
+    bench_nearest()
+    print()
+    bench_count_in_range()
+    print()
+    bench_find_pairs()
+    print()
+    bench_snapshot()
+    print()
+    bench_versions()
+    print()
+    print('concurrent games valid:', stress_concurrent_games())
+    print()
+    bench_memory()
+    print()
+    bench_bucket_capacity()
+    print()
+    bench_linear_quadtree()
+    print()
+    bench_player_store()
+    print()
+    bench_move_kernel()
+    print()
+    bench_relationships()
+    print()
+    bench_box_direction()
+    print()
+    bench_scheduler()
+    print()
+    bench_sharded()
+    print()
+    bench_field_types()
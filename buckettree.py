@@ -0,0 +1,840 @@
+from __future__ import annotations
+import heapq
+import math
+from typing import Optional, List, Tuple, Dict, Set, Union
+from trees import Tree, OutOfBoundsError, directions, quadrant_bounds, \
+    range_box, step_point, in_box, boxes_overlap, box_contains, \
+    boxes_distance2, box_distance2, nearest_by_name, add_teams, shift_team, \
+    plan_moves
+
+DEFAULT_CAPACITY = 8
+DEFAULT_MAX_DEPTH = 16
+
+
+class BucketQuadTree(Tree):
+    """ A PR quadtree whose leaves are buckets of up to <capacity> players.
+
+    A leaf keeps the points and names of its players in two flat lists and
+    only splits into quadrants when an insert takes it past <capacity>, so a
+    cluster of players fills a few buckets instead of a long chain of
+    one-player nodes. Nodes <max_depth> levels below the root never split.
+    When a remove leaves a node with at most half of <capacity> players, its
+    subtree is merged back into a single bucket; the gap between the two
+    thresholds keeps a player moving back and forth over a split line from
+    splitting and merging the same node on every move.
+    """
+    _centre: Tuple[int, int]
+    _level: int
+    _capacity: int
+    _max_depth: int
+    _points: Optional[List[Tuple[int, int]]]
+    _names: Optional[List[str]]
+    _ne: Optional[BucketQuadTree]
+    _nw: Optional[BucketQuadTree]
+    _se: Optional[BucketQuadTree]
+    _sw: Optional[BucketQuadTree]
+    _size: int
+    _height: int
+    _teams: Dict[Optional[str], int]
+    _team_of: Dict[str, Optional[str]]
+    _index: Dict[str, Tuple[int, int]]
+    _moves: int
+    _in_place_moves: int
+
+    def __init__(self, centre: Tuple[int, int],
+                 capacity: int = DEFAULT_CAPACITY,
+                 max_depth: int = DEFAULT_MAX_DEPTH) -> None:
+        """Initialize an empty BucketQuadTree covering (0, 0) to twice
+        <centre>, whose leaves split once they hold more than <capacity>
+        players unless they are <max_depth> levels below the root.
+        Runtime: O(1)
+        """
+        self._centre = centre
+        self._level = 0
+        self._capacity = max(capacity, 1)
+        self._max_depth = max_depth
+        self._points = []
+        self._names = []
+        self._ne = None
+        self._nw = None
+        self._sw = None
+        self._se = None
+        self._size = 0
+        self._height = 0
+        self._teams = {}
+        self._team_of = {}
+        self._index = {}
+        self._moves = 0
+        self._in_place_moves = 0
+
+    def _new_node(self, bounds: Tuple[int, int, int, int]) -> BucketQuadTree:
+        """ Return a new empty leaf one level below <self>, centred in the
+        region <bounds> and belonging to the same tree.
+        """
+        node = BucketQuadTree(((bounds[0] + bounds[2]) // 2,
+                               (bounds[1] + bounds[3]) // 2),
+                              self._capacity, self._max_depth)
+        node._level = self._level + 1
+        node._team_of = self._team_of
+        return node
+
+    def _child(self, quadrant: int) -> Optional[BucketQuadTree]:
+        """ Return the child of <self> in <quadrant>, as numbered by
+        directions().
+        """
+        if quadrant == 1:
+            return self._ne
+        elif quadrant == 2:
+            return self._nw
+        elif quadrant == 3:
+            return self._sw
+        return self._se
+
+    def _set_child(self, quadrant: int,
+                   tree: Optional[BucketQuadTree]) -> None:
+        """ Replace the child of <self> in <quadrant> with <tree>.
+        """
+        if quadrant == 1:
+            self._ne = tree
+        elif quadrant == 2:
+            self._nw = tree
+        elif quadrant == 3:
+            self._sw = tree
+        else:
+            self._se = tree
+
+    def _bounds(self) -> Tuple[int, int, int, int]:
+        """ Return the (left, top, right, bottom) region covered by the root.
+        """
+        return 0, 0, self._centre[0] * 2, self._centre[1] * 2
+
+    def _counts(self) -> Tuple[int, int]:
+        """ Return the size and height of <self> worked out from its bucket
+        or the stored counts of its children.
+        """
+        if self._points is not None:
+            return len(self._points), 1 if self._points else 0
+        size = 0
+        height = 0
+        for child in (self._ne, self._nw, self._sw, self._se):
+            if child is not None:
+                size += child._size
+                height = max(height, child._height)
+        return size, height + 1 if size else 0
+
+    def _team_counts(self) -> Dict[Optional[str], int]:
+        """ Return the per-team player counts of <self> worked out from its
+        bucket or the stored counts of its children.
+        """
+        teams = {}
+        if self._points is not None:
+            for name in self._names:
+                team = self._team_of.get(name)
+                teams[team] = teams.get(team, 0) + 1
+            return teams
+        for child in (self._ne, self._nw, self._sw, self._se):
+            if child is not None:
+                add_teams(teams, child._teams)
+        return teams
+
+    def _recount(self) -> None:
+        """ Refresh the stored size, height and team counts of <self>.
+        """
+        self._size, self._height = self._counts()
+        self._teams = self._team_counts()
+
+    def _leaf(self, point: Tuple[int, int]) -> Optional[BucketQuadTree]:
+        """ Return the leaf whose region holds <point>, or None if the node
+        that would hold it has not been created.
+        """
+        tree = self
+        while tree is not None and tree._points is None:
+            tree = tree._child(directions(tree._centre, point))
+        return tree
+
+    def __contains__(self, name: str) -> bool:
+        """ Return True if a player named <name> is stored in this tree.
+        Runtime: O(1)
+        >>> b = BucketQuadTree((100, 100))
+        >>> b.insert("Eric", (150, 150))
+        >>> b.__contains__("Eric")
+        True
+        """
+        return name in self._index
+
+    def contains_point(self, point: Tuple[int, int]) -> bool:
+        """ Return True if a player at location <point> is stored in this tree.
+        Runtime: O(log(n) + capacity)
+        >>> b = BucketQuadTree((100, 100))
+        >>> b.insert("Eric", (150, 150))
+        >>> b.contains_point((150, 150)), b.contains_point((150, 151))
+        (True, False)
+        """
+        leaf = self._leaf(point)
+        return leaf is not None and point in leaf._points
+
+    def getpoint(self, name: str) -> Optional[Tuple[int, int]]:
+        """ Return the location of the player named <name>, or None if there
+        is no such player in this tree.
+        Runtime: O(1)
+        """
+        return self._index.get(name)
+
+    def getname(self, point: Tuple[int, int]) -> Optional[str]:
+        leaf = self._leaf(point)
+        if leaf is None or point not in leaf._points:
+            return None
+        return leaf._names[leaf._points.index(point)]
+
+    def insert(self, name: str, point: Tuple[int, int]) -> None:
+        """Insert a player named <name> into this tree at point <point>.
+        Raise an OutOfBoundsError if <point> is out of bounds.
+        Raise an OutOfBoundsError if another player is already named <name>
+        or already at <point>.
+        Runtime: O(log(n) + capacity)
+        >>> b = BucketQuadTree((100, 100), capacity=2)
+        >>> b.insert("Eric", (150, 150))
+        >>> b.insert("Joe", (160, 160))
+        >>> b.height()
+        1
+        >>> b.insert("Jack", (50, 50))
+        >>> b.height()
+        2
+        """
+        if point[0] < 0 or point[1] < 0 or point[0] > self._centre[0] * 2 \
+                or point[1] > self._centre[1] * 2:
+            raise OutOfBoundsError
+        if name in self._index or self.contains_point(point):
+            raise OutOfBoundsError
+        self._insert(name, point, self._bounds())
+        self._index[name] = point
+
+    def _insert(self, name: str, point: Tuple[int, int],
+                bounds: Tuple[int, int, int, int]) -> None:
+        """ Insert <name> at the free point <point> below <self>, which covers
+        the region <bounds>, splitting the bucket it lands in if that takes
+        the bucket past capacity.
+        """
+        tree = self
+        path = []
+        while tree._points is None:
+            quadrant = directions(tree._centre, point)
+            bounds = quadrant_bounds(bounds, tree._centre, quadrant)
+            child = tree._child(quadrant)
+            if child is None:
+                child = tree._new_node(bounds)
+                tree._set_child(quadrant, child)
+            path.append(tree)
+            tree = child
+        tree._points.append(point)
+        tree._names.append(name)
+        team = tree._team_of.get(name)
+        if len(tree._points) > tree._capacity \
+                and tree._level < tree._max_depth:
+            tree._split(bounds)
+        else:
+            tree._size += 1
+            tree._height = 1
+            tree._teams[team] = tree._teams.get(team, 0) + 1
+        height = tree._height
+        for node in reversed(path):
+            node._size += 1
+            node._teams[team] = node._teams.get(team, 0) + 1
+            height += 1
+            if node._height < height:
+                node._height = height
+            else:
+                height = node._height
+
+    def _split(self, bounds: Tuple[int, int, int, int]) -> None:
+        """ Turn the leaf <self>, covering <bounds>, into a node whose
+        children share out its bucket, splitting any child that is still
+        over capacity in turn.
+        """
+        points = self._points
+        names = self._names
+        self._points = None
+        self._names = None
+        for point, name in zip(points, names):
+            quadrant = directions(self._centre, point)
+            child = self._child(quadrant)
+            if child is None:
+                child = self._new_node(
+                    quadrant_bounds(bounds, self._centre, quadrant))
+                self._set_child(quadrant, child)
+            child._points.append(point)
+            child._names.append(name)
+        for quadrant in (1, 2, 3, 4):
+            child = self._child(quadrant)
+            if child is None:
+                continue
+            if len(child._points) > child._capacity \
+                    and child._level < child._max_depth:
+                child._split(quadrant_bounds(bounds, self._centre, quadrant))
+            else:
+                child._recount()
+        self._recount()
+
+    def _merge(self) -> None:
+        """ Gather every player below <self> into a single bucket at <self>.
+        """
+        points = []
+        names = []
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree._points is not None:
+                points.extend(tree._points)
+                names.extend(tree._names)
+                continue
+            for child in (tree._ne, tree._nw, tree._sw, tree._se):
+                if child is not None:
+                    stack.append(child)
+        self._ne = None
+        self._nw = None
+        self._sw = None
+        self._se = None
+        self._points = points
+        self._names = names
+        self._height = 1 if points else 0
+
+    def remove(self, name: str) -> None:
+        """ Remove information about a player named <name> from this tree.
+        Runtime: O(log(n) + capacity)
+        >>> b = BucketQuadTree((100, 100))
+        >>> b.insert("Eric", (150, 150))
+        >>> b.remove("Eric")
+        >>> b.__contains__("Eric"), b.contains_point((150, 150))
+        (False, False)
+        """
+        if name in self._index:
+            self.remove_point(self._index[name])
+
+    def remove_point(self, point: Tuple[int, int]) -> None:
+        """ Remove information about a player at point <point> from this tree.
+        Runtime: O(log(n) + capacity)
+        >>> b = BucketQuadTree((100, 100), capacity=2)
+        >>> for i in range(5):
+        ...     b.insert(str(i), (10 + 40 * i, 10 + 40 * i))
+        >>> b.height()
+        3
+        >>> b.remove_point((10, 10))
+        >>> b.remove_point((50, 50))
+        >>> b.remove_point((90, 90))
+        >>> b.height(), b.size()
+        (2, 2)
+        >>> b.remove_point((130, 130))
+        >>> b.height(), b.size()
+        (1, 1)
+        """
+        name = self._remove_point(point)
+        if name is not None:
+            del self._index[name]
+
+    def _remove_point(self, point: Tuple[int, int]) -> Optional[str]:
+        """ Remove the player at <point> below <self> and return its name, or
+        None if no player is at <point>.
+
+        Empty children are dropped on the way back up, and a node left with
+        at most half of capacity players is merged into one bucket.
+        """
+        tree = self
+        path = []
+        while tree._points is None:
+            quadrant = directions(tree._centre, point)
+            child = tree._child(quadrant)
+            if child is None:
+                return None
+            path.append((tree, quadrant))
+            tree = child
+        if point not in tree._points:
+            return None
+        i = tree._points.index(point)
+        name = tree._names[i]
+        tree._points[i] = tree._points[-1]
+        tree._names[i] = tree._names[-1]
+        tree._points.pop()
+        tree._names.pop()
+        team = tree._team_of.get(name)
+        if tree._teams[team] == 1:
+            del tree._teams[team]
+        else:
+            tree._teams[team] -= 1
+        tree._size -= 1
+        tree._height = 1 if tree._size else 0
+        for parent, quadrant in reversed(path):
+            if tree._size == 0:
+                parent._set_child(quadrant, None)
+            parent._recount()
+            if parent._size <= parent._capacity // 2:
+                parent._merge()
+            tree = parent
+        return name
+
+    def move(self, name: str, direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player named <name> after moving it
+        in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(log(n) + capacity)
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        >>> b = BucketQuadTree((100, 100))
+        >>> b.insert("Eric", (150, 150))
+        >>> b.move("Eric", "N", 10)
+        (150, 140)
+        >>> b.getpoint("Eric")
+        (150, 140)
+        """
+        point = self._index.get(name)
+        if point is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
+
+    def move_point(self, point: Tuple[int, int], direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player at point <point> after
+        moving it in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(log(n) + capacity)
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        """
+        name = self.getname(point)
+        if name is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
+
+    def move_many(self, moves: List[Tuple[str, str, int]]) \
+            -> List[Union[Tuple[int, int], OutOfBoundsError, None]]:
+        """ Make each (name, direction, steps) move of <moves> in order, as
+        move(name, direction, steps) would, and return the outcome of each:
+        the player's new location, None if there is no player named <name>,
+        or the OutOfBoundsError move would have raised.
+        Runtime: O(n + m (log(n) + capacity)) for m moves
+        === precondition ===
+        every direction in ['N', 'S', 'E', 'W']
+        >>> b = BucketQuadTree((100, 100))
+        >>> b.insert("Eric", (150, 150))
+        >>> b.move_many([("Eric", "S", 60), ("Eric", "W", 10)])
+        [OutOfBoundsError('out of bounds'), (140, 150)]
+        """
+        outcomes, steps = plan_moves(self._index, self._bounds(), moves)
+        for name, point, new in steps:
+            self._shift(name, point, new)
+        return outcomes
+
+    def _relocate(self, name: str, point: Tuple[int, int],
+                  new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to <new> and return <new>.
+        """
+        if new[0] < 0 or new[1] < 0 or new[0] > self._centre[0] * 2 \
+                or new[1] > self._centre[1] * 2:
+            raise OutOfBoundsError('out of bounds')
+        if self.contains_point(new):
+            raise OutOfBoundsError('occupied')
+        return self._shift(name, point, new)
+
+    def _shift(self, name: str, point: Tuple[int, int],
+               new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to the free, in-bounds point
+        <new> and return <new>.
+
+        The descent stops at the first node where <point> and <new> fall in
+        different quadrants. If it reaches the bucket holding <point>, the
+        bucket is updated in place. Otherwise only the subtree below that
+        node is reorganized.
+        """
+        tree = self
+        bounds = self._bounds()
+        path = []
+        while tree._points is None:
+            quadrant = directions(tree._centre, point)
+            if quadrant != directions(tree._centre, new):
+                break
+            bounds = quadrant_bounds(bounds, tree._centre, quadrant)
+            path.append(tree)
+            tree = tree._child(quadrant)
+        if tree._points is not None:
+            tree._points[tree._points.index(point)] = new
+            self._in_place_moves += 1
+        else:
+            tree._remove_point(point)
+            tree._insert(name, new, bounds)
+            for node in reversed(path):
+                node._recount()
+        self._moves += 1
+        self._index[name] = new
+        return new
+
+    def move_stats(self) -> Dict[str, int]:
+        """ Return the number of successful moves made in this tree under
+        'moves', and how many of those stayed in the same bucket under
+        'in_place'.
+        Runtime: O(1)
+        """
+        return {'moves': self._moves, 'in_place': self._in_place_moves}
+
+    def names_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> List[str]:
+        """ Return a list of names of players whose location is in the
+        <direction> relative to <point> and whose location is within
+        <distance> along both the x and y axis.
+
+        A bucket whose whole region lies in the box is copied without
+        checking its points.
+        Runtime: O(log(n) + k + capacity) for k names found when distance is
+        small
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW']
+        >>> b = BucketQuadTree((100, 100), capacity=2)
+        >>> b.insert('Eric', (105, 105))
+        >>> b.insert('Joe', (110, 110))
+        >>> b.insert('Jack', (90, 109))
+        >>> sorted(b.names_in_range((100, 100), 'SE', 10))
+        ['Eric', 'Joe']
+        """
+        results = [[]]
+        self._names_in_boxes([(0, range_box(point, direction, distance))],
+                             results)
+        return results[0]
+
+    def names_in_range_many(self, queries: List[Tuple[Tuple[int, int], str,
+                                                      int]]) \
+            -> List[List[str]]:
+        """ Return, for each (point, direction, distance) query in <queries>,
+        the list names_in_range(point, direction, distance) would return.
+        Results are in the same order as <queries>.
+        Runtime: faster than len(queries) separate names_in_range calls
+        === precondition ===
+        every direction in ['NE', 'SE', 'NW', 'SW']
+        >>> b = BucketQuadTree((100, 100))
+        >>> b.insert('Eric', (105, 105))
+        >>> b.insert('Joe', (95, 95))
+        >>> b.names_in_range_many([((100, 100), 'SE', 10),
+        ...                        ((100, 100), 'NW', 10),
+        ...                        ((100, 100), 'NE', 10)])
+        [['Eric'], ['Joe'], []]
+        """
+        results = [[] for _ in queries]
+        self._names_in_boxes(
+            [(i, range_box(point, direction, distance))
+             for i, (point, direction, distance) in enumerate(queries)],
+            results)
+        return results
+
+    def _names_in_boxes(self, boxes: List[Tuple[int, Tuple[int, int, int,
+                                                           int]]],
+                        results: List[List[str]]) -> None:
+        """ For every (i, box) in <boxes>, append to results[i] the names of
+        players in this tree that lie in box. Each node is only visited with
+        the boxes that overlap it.
+        """
+        if self._size == 0:
+            return
+        stack = [(self, self._bounds(), boxes)]
+        while stack:
+            tree, bounds, boxes = stack.pop()
+            if tree._points is not None:
+                for i, box in boxes:
+                    if box_contains(box, bounds):
+                        results[i].extend(tree._names)
+                        continue
+                    lst = results[i]
+                    for spot, name in zip(tree._points, tree._names):
+                        if in_box(box, spot):
+                            lst.append(name)
+                continue
+            for quadrant in (4, 3, 2, 1):
+                child = tree._child(quadrant)
+                if child is not None:
+                    sub = quadrant_bounds(bounds, tree._centre, quadrant)
+                    near = [(i, box) for i, box in boxes
+                            if boxes_overlap(box, sub)]
+                    if near:
+                        stack.append((child, sub, near))
+
+    def nearest(self, point: Tuple[int, int], k: int = 1,
+                include: Optional[Set[str]] = None) \
+            -> List[Tuple[str, float]]:
+        """ Return (name, distance) pairs for the <k> players closest to
+        <point>, nearest first, counting only players named in <include> if
+        it is given. Distances are straight-line distances. A player standing
+        at <point> itself is included, at distance 0.
+
+        Nodes are visited best first, in order of how close their region comes
+        to <point>, and the search stops once the <k> best players found are
+        closer than every region left. An <include> of at most sqrt(n) names
+        is answered from the name index instead.
+        Runtime: O(log(n) + k + capacity) typical
+        === precondition ===
+        k >= 0
+        >>> b = BucketQuadTree((100, 100), capacity=2)
+        >>> b.insert('Eric', (105, 105))
+        >>> b.insert('Joe', (110, 100))
+        >>> b.insert('Jack', (30, 160))
+        >>> b.nearest((100, 100), 2)
+        [('Eric', 7.0710678118654755), ('Joe', 10.0)]
+        >>> b.nearest((100, 100), 1, {'Jack', 'Joe'})
+        [('Joe', 10.0)]
+        """
+        if include is not None and len(include) ** 2 <= self._size:
+            return nearest_by_name(self._index, point, k, include)
+        best = []
+        if k <= 0 or self._size == 0:
+            return []
+        heap = [(0, 0, self, self._bounds())]
+        count = 1
+        while heap:
+            d2, _, tree, bounds = heapq.heappop(heap)
+            if len(best) == k and d2 >= -best[0][0]:
+                break
+            if tree._points is not None:
+                for spot, name in zip(tree._points, tree._names):
+                    if include is not None and name not in include:
+                        continue
+                    d2 = (spot[0] - point[0]) ** 2 + (spot[1] - point[1]) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-d2, name))
+                    elif d2 < -best[0][0]:
+                        heapq.heapreplace(best, (-d2, name))
+                continue
+            for quadrant in (1, 2, 3, 4):
+                child = tree._child(quadrant)
+                if child is not None:
+                    sub = quadrant_bounds(bounds, tree._centre, quadrant)
+                    d2 = box_distance2(sub, point)
+                    if len(best) < k or d2 < -best[0][0]:
+                        heapq.heappush(heap, (d2, count, child, sub))
+                        count += 1
+        return [(name, math.sqrt(-d2)) for d2, name in
+                sorted(best, key=lambda item: (-item[0], item[1]))]
+
+    def find_pairs_within(self, radius: int) -> List[Tuple[str, str]]:
+        """ Return a (name, name) pair for every two players in this tree
+        whose straight-line distance apart is at most <radius>. Each pair
+        appears once, in no particular order.
+
+        The tree is joined with itself as in QuadTree.find_pairs_within,
+        except that a stack item reaching a bucket compares the players of
+        the bucket directly.
+        Runtime: O(n * capacity + k) typical for k pairs and a small radius
+        === precondition ===
+        radius >= 0
+        >>> b = BucketQuadTree((100, 100), capacity=2)
+        >>> b.insert('Eric', (105, 105))
+        >>> b.insert('Joe', (108, 109))
+        >>> b.insert('Jack', (102, 101))
+        >>> b.insert('Ann', (150, 150))
+        >>> sorted(sorted(pair) for pair in b.find_pairs_within(5))
+        [['Eric', 'Jack'], ['Eric', 'Joe']]
+        """
+        pairs = []
+        if self._size < 2:
+            return pairs
+        limit = radius * radius
+        stack = [(self, self._bounds(), None, None)]
+        while stack:
+            a, a_region, b, b_region = stack.pop()
+            if b is None and a._points is not None:
+                spots = list(zip(a._points, a._names))
+                for i, (spot, name) in enumerate(spots):
+                    for other, other_name in spots[i + 1:]:
+                        if (spot[0] - other[0]) ** 2 \
+                                + (spot[1] - other[1]) ** 2 <= limit:
+                            pairs.append((name, other_name))
+                continue
+            if b is None:
+                parts = []
+                for quadrant in (1, 2, 3, 4):
+                    child = a._child(quadrant)
+                    if child is not None:
+                        parts.append((child, quadrant_bounds(
+                            a_region, a._centre, quadrant)))
+                for i, (child, region) in enumerate(parts):
+                    stack.append((child, region, None, None))
+                    for other, other_region in parts[i + 1:]:
+                        if boxes_distance2(region, other_region) <= limit:
+                            stack.append((child, region, other, other_region))
+                continue
+            if a._points is not None and b._points is not None:
+                for spot, name in zip(a._points, a._names):
+                    for other, other_name in zip(b._points, b._names):
+                        if (spot[0] - other[0]) ** 2 \
+                                + (spot[1] - other[1]) ** 2 <= limit:
+                            pairs.append((name, other_name))
+                continue
+            if a._points is not None or b._points is None \
+                    and b._size > a._size:
+                a, a_region, b, b_region = b, b_region, a, a_region
+            for quadrant in (1, 2, 3, 4):
+                child = a._child(quadrant)
+                if child is not None:
+                    region = quadrant_bounds(a_region, a._centre, quadrant)
+                    if boxes_distance2(region, b_region) <= limit:
+                        stack.append((child, region, b, b_region))
+        return pairs
+
+    def set_team(self, name: str, team: Optional[str]) -> None:
+        """ Record that the player named <name> plays for <team>, whether or
+        not it is in this tree yet. The team is kept if the player is
+        removed, and is used again if it is inserted later. Players never
+        given a team count under None.
+        Runtime: O(log(n))
+        """
+        old = self._team_of.get(name)
+        self._team_of[name] = team
+        point = self._index.get(name)
+        if point is None or old == team:
+            return
+        tree = self
+        while tree is not None:
+            shift_team(tree._teams, old, team)
+            if tree._points is not None:
+                return
+            tree = tree._child(directions(tree._centre, point))
+
+    def count_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> Dict[Optional[str], int]:
+        """ Return how many of the players names_in_range(<point>,
+        <direction>, <distance>) would list play for each team, leaving out
+        teams with no such player.
+
+        A node whose whole region lies in the box adds its stored counts
+        without being searched.
+        Runtime: O(log(n) + capacity) for each node on the edge of the box
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW']
+        >>> b = BucketQuadTree((100, 100), capacity=2)
+        >>> b.set_team('Eric', 'green')
+        >>> b.set_team('Jack', 'purple')
+        >>> b.insert('Eric', (105, 105))
+        >>> b.insert('Joe', (110, 110))
+        >>> b.insert('Jack', (109, 109))
+        >>> b.insert('Ann', (150, 150))
+        >>> b.count_in_range((100, 100), 'SE', 10) == {
+        ...     'green': 1, 'purple': 1, None: 1}
+        True
+        """
+        counts = {}
+        if self._size == 0:
+            return counts
+        box = range_box(point, direction, distance)
+        stack = [(self, self._bounds())]
+        while stack:
+            tree, bounds = stack.pop()
+            if box_contains(box, bounds):
+                add_teams(counts, tree._teams)
+            elif tree._points is not None:
+                for spot, name in zip(tree._points, tree._names):
+                    if in_box(box, spot):
+                        team = self._team_of.get(name)
+                        counts[team] = counts.get(team, 0) + 1
+            else:
+                for quadrant in (4, 3, 2, 1):
+                    child = tree._child(quadrant)
+                    if child is not None:
+                        sub = quadrant_bounds(bounds, tree._centre, quadrant)
+                        if boxes_overlap(box, sub):
+                            stack.append((child, sub))
+        return counts
+
+    def size(self) -> int:
+        """ Return the number of players in <self>
+        Runtime: O(1)
+        """
+        return self._size
+
+    def height(self) -> int:
+        """ Return the height of <self>, the number of nodes on the path from
+        the root to the deepest bucket.
+        Runtime: O(1)
+        """
+        return self._height
+
+    def depth(self, tree: Tree) -> Optional[int]:
+        """ Return the number of levels between <self> and the node <tree>,
+        or None if <tree> is not in <self>.
+        Runtime: O(log(n))
+        >>> b = BucketQuadTree((100, 100), capacity=1)
+        >>> b.insert('Eric', (150, 150))
+        >>> b.insert('Joe', (50, 50))
+        >>> b.depth(b._se)
+        1
+        """
+        stack = [(self, 0)]
+        while stack:
+            node, level = stack.pop()
+            if node is tree:
+                return level
+            for child in (node._ne, node._nw, node._sw, node._se):
+                if child is not None:
+                    stack.append((child, level + 1))
+        return None
+
+    def is_leaf(self) -> bool:
+        """ Return True if <self> is a bucket with no children.
+        Runtime: O(1)
+        """
+        return self._points is not None
+
+    def is_empty(self) -> bool:
+        """ Return True if <self> does not store any information about the
+        location of any players.
+        Runtime: O(1)
+        """
+        return self._size == 0
+
+    def is_valid(self) -> bool:
+        """ Return True if every player sits in a bucket whose region contains
+        its location, no bucket is over capacity unless it is at max_depth,
+        no node below the root is empty, every node with children holds more
+        than half of capacity players, every stored size, height and team
+        count is current, and the name index matches the stored players.
+        Runtime: O(n)
+        >>> b = BucketQuadTree((100, 100), capacity=2)
+        >>> for i in range(5):
+        ...     b.insert(str(i), (10 + 40 * i, 10 + 40 * i))
+        >>> b.is_valid()
+        True
+        >>> b._index["Jack"] = (10, 10)
+        >>> b.is_valid()
+        False
+        """
+        found = {}
+        stack = [(self, self._bounds())]
+        while stack:
+            tree, bounds = stack.pop()
+            if (tree._size, tree._height) != tree._counts() \
+                    or tree._teams != tree._team_counts():
+                return False
+            if tree._points is not None:
+                if len(tree._points) > tree._capacity \
+                        and tree._level < tree._max_depth:
+                    return False
+                for point, name in zip(tree._points, tree._names):
+                    if not in_box(bounds, point):
+                        return False
+                    found[name] = point
+                continue
+            if tree._size <= tree._capacity // 2:
+                return False
+            for quadrant in (1, 2, 3, 4):
+                child = tree._child(quadrant)
+                if child is not None:
+                    if child._size == 0 or child._level != tree._level + 1:
+                        return False
+                    stack.append((child, quadrant_bounds(
+                        bounds, tree._centre, quadrant)))
+        return found == self._index
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={'extra-imports': ['heapq', 'math', 'typing',
+                                                  'trees']})
@@ -1,8 +1,12 @@
 from __future__ import annotations
 import random
 from typing import Dict, Union, Optional
-from players import Player
+from players import Player, PlayerStore, Relationships
 from trees import QuadTree, TwoDTree
+from arraytree import ArrayQuadTree
+from gridfield import GridField
+from buckettree import BucketQuadTree
+from lineartree import LinearQuadTree
 
 def random_names(n_player) -> List[str]:
     names = []
@@ -36,14 +40,29 @@ class Game:
         won the game, or None if no player has won yet """
         raise NotImplementedError
 
+    def handle_collisions(self, radius: int) -> int:
+        """ Call handle_collision once for every pair of players on
+        self.field standing within <radius> of each other, and return how
+        many pairs collided. The pairs are all found in one pass over the
+        field before any is handled. """
+        pairs = self.field.find_pairs_within(radius)
+        for player1, player2 in pairs:
+            self.handle_collision(player1, player2)
+        return len(pairs)
+
 class Tag(Game):
+    _store: PlayerStore
+    _relations: Relationships
     _players: Dict[str, Player]
-    field: Union[QuadTree, TwoDTree]
+    field: Union[QuadTree, TwoDTree, GridField, ArrayQuadTree,
+                 BucketQuadTree, LinearQuadTree]
     _it: str
     _duration: int
 
     def __init__(self, n_players: int,
-                       field_type: Union[QuadTree, TwoDTree],
+                       field_type: Union[QuadTree, TwoDTree, GridField,
+                                         ArrayQuadTree, BucketQuadTree,
+                                         LinearQuadTree],
                        duration: int,
                        max_speed: int,
                        max_vision: int) -> None:
@@ -52,46 +71,42 @@ class Tag(Game):
         self._duration = duration
         self.max_speed = max_speed
         self.max_vision = max_vision
+        self._store = PlayerStore(max(n_players, 1))
+        self._relations = Relationships()
+        self._relations.add_rule('targets', 'purple', 'green')
+        self._relations.add_rule('enemies', 'green', 'purple')
         self._players = {}
-        loclist=[]
+        loclist=set()
         itnum=random.randint(0,self.n_players)
-        namtarget=[]
-        namenemy=[]
+        self._it = None
         for i in range(0,self.n_players):
             name=str(i)
             while True:
                 location=(random.randint(0,500),random.randint(0,500))
                 if location not in loclist:
-                    loclist.append(location)
+                    loclist.add(location)
                     break
             if i==itnum:
                 color='purple'
-                namenemy.append(name)
+                self._it = name
             else:
                 color='green'
-                namtarget.append(name)
             vision=random.randint(0,max_vision)
             speed=random.randint(1,max_speed)
             self._players[name]=Player(name, vision, speed, self, color, location)
         for i in self._players:
             self._players[i].assignd()
-            if self._players[i].getcolor() == 'green':
-                for item in namenemy:
-                    self._players[i].select_enemy(item)
-            elif self._players[i].getcolor() == 'purple':
-                for item in namtarget:
-                    self._players[i].select_target(item)
 
     def handle_collision(self, player1: str, player2: str) -> None:
         """ Perform some action when <player1> and <player2> collide """
         self._players[player1].reverse_direction()
         self._players[player2].reverse_direction()
         if self._it==self._players[player1].getname():
-            self._it==self._players[player2].getname()
+            self._it=self._players[player2].getname()
             self._players[player2].set_colour('purple')
             self._players[player1].set_colour('green')
         elif self._it==self._players[player2].getname():
-            self._it==self._players[player1].getname()
+            self._it=self._players[player1].getname()
             self._players[player1].set_colour('purple')
             self._players[player2].set_colour('green')
 
@@ -143,13 +158,18 @@ class Tag(Game):
 
 
 class ZombieTag(Game):
+    _store: PlayerStore
+    _relations: Relationships
     _humans: Dict[str, Player]
     _zombies: Dict[str, Player]
-    field: Union[QuadTree, TwoDTree]
+    field: Union[QuadTree, TwoDTree, GridField, ArrayQuadTree,
+                 BucketQuadTree, LinearQuadTree]
     _duration: int
 
     def __init__(self, n_players: int,
-                       field_type: Union[QuadTree, TwoDTree],
+                       field_type: Union[QuadTree, TwoDTree, GridField,
+                                         ArrayQuadTree, BucketQuadTree,
+                                         LinearQuadTree],
                        duration: int,
                        max_speed: int,
                        max_vision: int) -> None:
@@ -158,6 +178,8 @@ class ZombieTag(Game):
         self._duration = duration
         self.max_speed = max_speed
         self.max_vision = max_vision
+        self._store = PlayerStore(max(n_players, 1))
+        self._relations = Relationships()
         self._humans = {}
         self._zombies = {}
         for human in self._humans:
@@ -216,30 +238,48 @@ class ZombieTag(Game):
 
 
 class EliminationTag(Game):
+    _store: PlayerStore
+    _relations: Relationships
     _players: Dict[str, Player]
-    field: Union[QuadTree, TwoDTree]
+    field: Union[QuadTree, TwoDTree, GridField, ArrayQuadTree,
+                 BucketQuadTree, LinearQuadTree]
 
     def __init__(self, n_players: int,
-                       field_type: Union[QuadTree, TwoDTree],
+                       field_type: Union[QuadTree, TwoDTree, GridField,
+                                         ArrayQuadTree, BucketQuadTree,
+                                         LinearQuadTree],
                        max_speed: int,
                        max_vision: int) -> None:
         self.n_players = n_players
         self.field = field_type
         self.max_speed = max_speed
         self.max_vision = max_vision
+        self._store = PlayerStore(max(n_players, 1))
+        self._relations = Relationships()
         self._players = {}
 
     def handle_collision(self, player1: str, player2: str) -> None:
-        """ Perform some action when <player1> and <player2> collide """
-        if player1 in self._players[player2].get_targets:
-            for item in self._players[player1].get_targets:
-                self._players[player2].select_target(item)
-            self._players[player2].ignore_target(player1)
+        """ Perform some action when <player1> and <player2> collide. A
+        player that catches its target takes over the target's targets.
+        >>> elim = EliminationTag(3, None, 1, 10)
+        >>> for name in ('a', 'b', 'c'):
+        ...     elim._players[name] = Player(name, 5, 1, elim, 'green', None)
+        >>> elim._players['a'].select_target('b')
+        >>> elim._players['b'].select_target('c')
+        >>> elim.handle_collision('b', 'a')
+        >>> sorted(elim._players), elim._players['a'].get_targets()
+        (['a', 'c'], ['c'])
+        """
+        relations = self._relations
+        if relations.has('targets', player2, player1):
+            relations.inherit('targets', player2, player1)
+            relations.ignore('targets', player2, player1)
+            relations.forget(player1)
             del self._players[player1]
-        elif player2 in self._players[player1].get_targets:
-            for item in self._players[player2].get_targets:
-                self._players[player1].select_target(item)
-            self._players[player1].ignore_target(player2)
+        elif relations.has('targets', player1, player2):
+            relations.inherit('targets', player1, player2)
+            relations.ignore('targets', player1, player2)
+            relations.forget(player2)
             del self._players[player2]
         else:
             self._players[player1].reverse_direction()
@@ -0,0 +1,527 @@
+from __future__ import annotations
+import heapq
+import math
+from typing import Optional, List, Tuple, Dict, Set, Union
+from trees import Tree, OutOfBoundsError, range_box, in_box, step_point, \
+    nearest_by_name, add_teams, shift_team
+
+DEFAULT_CELL_SIZE = 16
+
+
+class GridField(Tree):
+    """ A field that hashes players into square buckets of a uniform grid.
+
+    Each cell maps the points inside it to player names, so insert, remove
+    and move touch a single bucket, and a names_in_range query of side d
+    only reads the (d / cell size + 2) ** 2 cells its box overlaps. This
+    suits dense, roughly uniform arenas where a tree mostly adds depth.
+    """
+    _nw: Tuple[int, int]
+    _se: Tuple[int, int]
+    _cell_size: int
+    _columns: int
+    _rows: int
+    _cells: List[Dict[Tuple[int, int], str]]
+    _cell_teams: List[Dict[Optional[str], int]]
+    _team_of: Dict[str, Optional[str]]
+    _index: Dict[str, Tuple[int, int]]
+    _moves: int
+    _in_place_moves: int
+
+    def __init__(self, nw: Tuple[int, int], se: Tuple[int, int],
+                 cell_size: Optional[int] = None,
+                 max_vision: Optional[int] = None) -> None:
+        """Initialize an empty GridField covering <nw> to <se>.
+
+        Cells are <cell_size> wide. Without a <cell_size> they are
+        <max_vision> wide, so a vision query spans at most 2 x 2 cells, or
+        DEFAULT_CELL_SIZE wide if neither is given.
+        Runtime: O(number of cells)
+        >>> GridField((0, 0), (500, 500), max_vision=10)._cell_size
+        10
+        """
+        if cell_size is None:
+            cell_size = max_vision if max_vision else DEFAULT_CELL_SIZE
+        self._nw = nw
+        self._se = se
+        self._cell_size = max(cell_size, 1)
+        self._columns = (se[0] - nw[0]) // self._cell_size + 1
+        self._rows = (se[1] - nw[1]) // self._cell_size + 1
+        self._cells = [{} for _ in range(self._columns * self._rows)]
+        self._cell_teams = [{} for _ in range(self._columns * self._rows)]
+        self._team_of = {}
+        self._index = {}
+        self._moves = 0
+        self._in_place_moves = 0
+
+    def _slot(self, point: Tuple[int, int]) -> int:
+        """ Return the position in _cells of the bucket holding <point>.
+        """
+        column = (point[0] - self._nw[0]) // self._cell_size
+        row = (point[1] - self._nw[1]) // self._cell_size
+        return row * self._columns + column
+
+    def _cell(self, point: Tuple[int, int]) -> Dict[Tuple[int, int], str]:
+        """ Return the bucket holding <point>.
+        """
+        return self._cells[self._slot(point)]
+
+    def _drop_team(self, slot: int, name: str) -> None:
+        """ Take the player <name> out of the team counts of bucket <slot>.
+        """
+        teams = self._cell_teams[slot]
+        team = self._team_of.get(name)
+        if teams[team] == 1:
+            del teams[team]
+        else:
+            teams[team] -= 1
+
+    def _add_team(self, slot: int, name: str) -> None:
+        """ Add the player <name> to the team counts of bucket <slot>.
+        """
+        teams = self._cell_teams[slot]
+        team = self._team_of.get(name)
+        teams[team] = teams.get(team, 0) + 1
+
+    def _in_bounds(self, point: Tuple[int, int]) -> bool:
+        """ Return True if <point> lies on this field.
+        """
+        return self._nw[0] <= point[0] <= self._se[0] \
+            and self._nw[1] <= point[1] <= self._se[1]
+
+    def __contains__(self, name: str) -> bool:
+        """ Return True if a player named <name> is stored in this field.
+        Runtime: O(1)
+        >>> g = GridField((0, 0), (100, 100))
+        >>> g.insert("Eric", (50, 50))
+        >>> g.__contains__("Eric")
+        True
+        """
+        return name in self._index
+
+    def contains_point(self, point: Tuple[int, int]) -> bool:
+        """ Return True if a player at location <point> is stored in this
+        field.
+        Runtime: O(1)
+        >>> g = GridField((0, 0), (100, 100))
+        >>> g.insert("Eric", (50, 50))
+        >>> g.contains_point((50, 50)), g.contains_point((51, 50))
+        (True, False)
+        """
+        return self._in_bounds(point) and point in self._cell(point)
+
+    def getpoint(self, name: str) -> Optional[Tuple[int, int]]:
+        """ Return the location of the player named <name>, or None if there
+        is no such player in this field.
+        Runtime: O(1)
+        """
+        return self._index.get(name)
+
+    def getname(self, point: Tuple[int, int]) -> Optional[str]:
+        if not self._in_bounds(point):
+            return None
+        return self._cell(point).get(point)
+
+    def insert(self, name: str, point: Tuple[int, int]) -> None:
+        """Insert a player named <name> into this field at point <point>.
+        Raise an OutOfBoundsError if <point> is out of bounds.
+        Raise an OutOfBoundsError if another player is already named <name>
+        or already at <point>.
+        Runtime: O(1)
+        >>> g = GridField((0, 0), (100, 100))
+        >>> g.insert("Eric", (50, 50))
+        >>> g.insert("Joe", (50, 50))
+        Traceback (most recent call last):
+        ...
+        trees.OutOfBoundsError
+        """
+        if not self._in_bounds(point):
+            raise OutOfBoundsError
+        slot = self._slot(point)
+        cell = self._cells[slot]
+        if name in self._index or point in cell:
+            raise OutOfBoundsError
+        cell[point] = name
+        self._add_team(slot, name)
+        self._index[name] = point
+
+    def remove(self, name: str) -> None:
+        """ Remove information about a player named <name> from this field.
+        Runtime: O(1)
+        >>> g = GridField((0, 0), (100, 100))
+        >>> g.insert("Eric", (50, 50))
+        >>> g.remove("Eric")
+        >>> g.__contains__("Eric"), g.contains_point((50, 50))
+        (False, False)
+        """
+        point = self._index.pop(name, None)
+        if point is not None:
+            slot = self._slot(point)
+            del self._cells[slot][point]
+            self._drop_team(slot, name)
+
+    def remove_point(self, point: Tuple[int, int]) -> None:
+        """ Remove information about a player at point <point> from this
+        field.
+        Runtime: O(1)
+        """
+        if self._in_bounds(point):
+            slot = self._slot(point)
+            name = self._cells[slot].pop(point, None)
+            if name is not None:
+                self._drop_team(slot, name)
+                del self._index[name]
+
+    def move(self, name: str, direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player named <name> after moving it
+        in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(1)
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        >>> g = GridField((0, 0), (100, 100))
+        >>> g.insert("Eric", (50, 50))
+        >>> g.move("Eric", "S", 10)
+        (50, 60)
+        """
+        point = self._index.get(name)
+        if point is None:
+            return None
+        return self._relocate(name, point, step_point(point, direction, steps))
+
+    def move_point(self, point: Tuple[int, int], direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player at point <point> after
+        moving it in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(1)
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        """
+        name = self.getname(point)
+        if name is None:
+            return None
+        return self._relocate(name, point, step_point(point, direction, steps))
+
+    def move_many(self, moves: List[Tuple[str, str, int]]) \
+            -> List[Union[Tuple[int, int], OutOfBoundsError, None]]:
+        """ Make each (name, direction, steps) move of <moves> in order, as
+        move(name, direction, steps) would, and return the outcome of each:
+        the player's new location, None if there is no player named <name>,
+        or the OutOfBoundsError move would have raised.
+        A bucket lookup already checks a destination in O(1), so the moves
+        are simply made one at a time.
+        Runtime: O(m) for m moves
+        === precondition ===
+        every direction in ['N', 'S', 'E', 'W']
+        >>> g = GridField((0, 0), (100, 100))
+        >>> g.insert("Eric", (50, 50))
+        >>> g.insert("Joe", (50, 70))
+        >>> g.move_many([("Eric", "S", 20), ("Eric", "N", 70),
+        ...              ("Ann", "N", 1)])
+        [OutOfBoundsError('occupied'), OutOfBoundsError('out of bounds'), None]
+        """
+        outcomes = []
+        for name, direction, steps in moves:
+            try:
+                outcomes.append(self.move(name, direction, steps))
+            except OutOfBoundsError as error:
+                outcomes.append(error)
+        return outcomes
+
+    def _relocate(self, name: str, point: Tuple[int, int],
+                  new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to <new> and return <new>.
+        """
+        if not self._in_bounds(new):
+            raise OutOfBoundsError('out of bounds')
+        old_slot = self._slot(point)
+        new_slot = self._slot(new)
+        new_cell = self._cells[new_slot]
+        if new in new_cell:
+            raise OutOfBoundsError('occupied')
+        del self._cells[old_slot][point]
+        new_cell[new] = name
+        if old_slot == new_slot:
+            self._in_place_moves += 1
+        else:
+            self._drop_team(old_slot, name)
+            self._add_team(new_slot, name)
+        self._moves += 1
+        self._index[name] = new
+        return new
+
+    def move_stats(self) -> Dict[str, int]:
+        """ Return the number of successful moves made in this field under
+        'moves', and how many of those stayed in the same cell under
+        'in_place'.
+        Runtime: O(1)
+        """
+        return {'moves': self._moves, 'in_place': self._in_place_moves}
+
+    def names_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> List[str]:
+        """ Return a list of names of players whose location is in the
+        <direction> relative to <point> and whose location is within
+        <distance> along both the x and y axis.
+        Runtime: O(cells overlapped + players in them)
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW']
+        >>> g = GridField((0, 0), (200, 200), cell_size=8)
+        >>> g.insert('Eric', (105, 105))
+        >>> g.insert('Joe', (110, 110))
+        >>> g.insert('Jack', (90, 109))
+        >>> sorted(g.names_in_range((100, 100), 'SE', 10))
+        ['Eric', 'Joe']
+        """
+        box = range_box(point, direction, distance)
+        lst = []
+        size = self._cell_size
+        first_column = max((box[0] - self._nw[0]) // size, 0)
+        last_column = min((box[2] - self._nw[0]) // size, self._columns - 1)
+        first_row = max((box[1] - self._nw[1]) // size, 0)
+        last_row = min((box[3] - self._nw[1]) // size, self._rows - 1)
+        for row in range(first_row, last_row + 1):
+            offset = row * self._columns
+            for column in range(first_column, last_column + 1):
+                for spot, name in self._cells[offset + column].items():
+                    if in_box(box, spot):
+                        lst.append(name)
+        return lst
+
+    def names_in_range_many(self, queries: List[Tuple[Tuple[int, int], str,
+                                                      int]]) \
+            -> List[List[str]]:
+        """ Return, for each (point, direction, distance) query in <queries>,
+        the list names_in_range(point, direction, distance) would return.
+        Results are in the same order as <queries>.
+
+        Grid queries share no traversal, so this answers each query in turn.
+        Runtime: O(sum of the cost of each query)
+        """
+        return [self.names_in_range(point, direction, distance)
+                for point, direction, distance in queries]
+
+    def nearest(self, point: Tuple[int, int], k: int = 1,
+                include: Optional[Set[str]] = None) \
+            -> List[Tuple[str, float]]:
+        """ Return (name, distance) pairs for the <k> players closest to
+        <point>, nearest first, counting only players named in <include> if
+        it is given. Distances are straight-line distances. A player standing
+        at <point> itself is included, at distance 0.
+
+        Cells are read in square rings around the cell of <point> until <k>
+        players are closer than anything outside the rings read so far. An
+        <include> of at most sqrt(n) names is answered from the name index
+        instead.
+        Runtime: O(cells read + players in them)
+        === precondition ===
+        k >= 0
+        >>> g = GridField((0, 0), (200, 200), cell_size=8)
+        >>> g.insert('Eric', (105, 105))
+        >>> g.insert('Joe', (110, 100))
+        >>> g.insert('Jack', (30, 160))
+        >>> g.nearest((100, 100), 2)
+        [('Eric', 7.0710678118654755), ('Joe', 10.0)]
+        """
+        if include is not None and len(include) ** 2 <= len(self._index):
+            return nearest_by_name(self._index, point, k, include)
+        if k <= 0 or not self._index:
+            return []
+        size = self._cell_size
+        column = min(max((point[0] - self._nw[0]) // size, 0),
+                     self._columns - 1)
+        row = min(max((point[1] - self._nw[1]) // size, 0), self._rows - 1)
+        found = []
+        ring = 0
+        while True:
+            for r in range(max(row - ring, 0),
+                           min(row + ring, self._rows - 1) + 1):
+                if abs(r - row) == ring:
+                    columns = range(max(column - ring, 0),
+                                    min(column + ring, self._columns - 1) + 1)
+                else:
+                    columns = [c for c in (column - ring, column + ring)
+                               if 0 <= c < self._columns]
+                for c in columns:
+                    for spot, name in self._cells[r * self._columns
+                                                  + c].items():
+                        if include is None or name in include:
+                            found.append(((spot[0] - point[0]) ** 2
+                                          + (spot[1] - point[1]) ** 2, name))
+            reach = []
+            if column - ring > 0:
+                reach.append(point[0] - self._nw[0]
+                             - (column - ring) * size + 1)
+            if column + ring < self._columns - 1:
+                reach.append(self._nw[0] + (column + ring + 1) * size
+                             - point[0])
+            if row - ring > 0:
+                reach.append(point[1] - self._nw[1] - (row - ring) * size + 1)
+            if row + ring < self._rows - 1:
+                reach.append(self._nw[1] + (row + ring + 1) * size - point[1])
+            if not reach or len(found) >= k and \
+                    heapq.nsmallest(k, found)[-1][0] <= min(reach) ** 2:
+                break
+            ring += 1
+        return [(name, math.sqrt(d2))
+                for d2, name in heapq.nsmallest(k, found)]
+
+    def find_pairs_within(self, radius: int) -> List[Tuple[str, str]]:
+        """ Return a (name, name) pair for every two players in this field
+        whose straight-line distance apart is at most <radius>. Each pair
+        appears once, in no particular order.
+
+        Every bucket is swept once against itself and against the buckets
+        after it within reach of <radius>: the rest of its own row and the
+        rows below. That way each pair of buckets is compared once.
+        Runtime: O(n + k) for k pairs when radius is at most the cell size
+        === precondition ===
+        radius >= 0
+        >>> g = GridField((0, 0), (200, 200), cell_size=4)
+        >>> g.insert('Eric', (105, 105))
+        >>> g.insert('Joe', (108, 109))
+        >>> g.insert('Jack', (102, 101))
+        >>> g.insert('Ann', (150, 150))
+        >>> sorted(sorted(pair) for pair in g.find_pairs_within(5))
+        [['Eric', 'Jack'], ['Eric', 'Joe']]
+        """
+        pairs = []
+        limit = radius * radius
+        reach = -(-radius // self._cell_size)
+        neighbours = [(0, dc) for dc in range(1, reach + 1)] \
+            + [(dr, dc) for dr in range(1, reach + 1)
+               for dc in range(-reach, reach + 1)]
+        for slot, cell in enumerate(self._cells):
+            if not cell:
+                continue
+            row, column = divmod(slot, self._columns)
+            spots = list(cell.items())
+            for i, (spot, name) in enumerate(spots):
+                for other, other_name in spots[i + 1:]:
+                    if (spot[0] - other[0]) ** 2 \
+                            + (spot[1] - other[1]) ** 2 <= limit:
+                        pairs.append((name, other_name))
+            for dr, dc in neighbours:
+                r, c = row + dr, column + dc
+                if r >= self._rows or not 0 <= c < self._columns:
+                    continue
+                near = self._cells[r * self._columns + c]
+                if not near:
+                    continue
+                for spot, name in spots:
+                    for other, other_name in near.items():
+                        if (spot[0] - other[0]) ** 2 \
+                                + (spot[1] - other[1]) ** 2 <= limit:
+                            pairs.append((name, other_name))
+        return pairs
+
+    def set_team(self, name: str, team: Optional[str]) -> None:
+        """ Record that the player named <name> plays for <team>, whether or
+        not it is in this field yet. The team is kept if the player is
+        removed, and is used again if it is inserted later. Players never
+        given a team count under None.
+        Runtime: O(1)
+        """
+        old = self._team_of.get(name)
+        self._team_of[name] = team
+        point = self._index.get(name)
+        if point is not None and old != team:
+            shift_team(self._cell_teams[self._slot(point)], old, team)
+
+    def count_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> Dict[Optional[str], int]:
+        """ Return how many of the players names_in_range(<point>,
+        <direction>, <distance>) would list play for each team, leaving out
+        teams with no such player.
+
+        Buckets wholly inside the box add their stored counts, so only the
+        buckets on its edge are read player by player.
+        Runtime: O(cells overlapped + players in the edge cells)
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW']
+        >>> g = GridField((0, 0), (200, 200), cell_size=8)
+        >>> g.set_team('Eric', 'green')
+        >>> g.insert('Eric', (105, 105))
+        >>> g.insert('Joe', (110, 110))
+        >>> g.insert('Jack', (90, 109))
+        >>> g.count_in_range((100, 100), 'SE', 10)
+        {'green': 1, None: 1}
+        """
+        box = range_box(point, direction, distance)
+        counts = {}
+        size = self._cell_size
+        first_column = max((box[0] - self._nw[0]) // size, 0)
+        last_column = min((box[2] - self._nw[0]) // size, self._columns - 1)
+        first_row = max((box[1] - self._nw[1]) // size, 0)
+        last_row = min((box[3] - self._nw[1]) // size, self._rows - 1)
+        for row in range(first_row, last_row + 1):
+            offset = row * self._columns
+            top = self._nw[1] + row * size
+            rows_inside = box[1] <= top and top + size - 1 <= box[3]
+            for column in range(first_column, last_column + 1):
+                left = self._nw[0] + column * size
+                if rows_inside and box[0] <= left \
+                        and left + size - 1 <= box[2]:
+                    add_teams(counts, self._cell_teams[offset + column])
+                    continue
+                for spot, name in self._cells[offset + column].items():
+                    if in_box(box, spot):
+                        team = self._team_of.get(name)
+                        counts[team] = counts.get(team, 0) + 1
+        return counts
+
+    def size(self) -> int:
+        """ Return the number of players in <self>
+        Runtime: O(1)
+        """
+        return len(self._index)
+
+    def height(self) -> int:
+        """ Return the height of <self>. A grid is a single level of buckets,
+        so this is 1 for a field with players and 0 for an empty one.
+        Runtime: O(1)
+        """
+        return 1 if self._index else 0
+
+    def is_leaf(self) -> bool:
+        """ Return True, since a grid has no subtrees.
+        Runtime: O(1)
+        """
+        return True
+
+    def is_empty(self) -> bool:
+        """ Return True if <self> does not store any information about the
+        location of any players.
+        Runtime: O(1)
+        """
+        return not self._index
+
+    def is_valid(self) -> bool:
+        """ Return True if every player is in the bucket covering its location,
+        every bucket's team counts are current, and the name index matches
+        the buckets.
+        Runtime: O(n + number of cells)
+        """
+        found = {}
+        for cell, teams in zip(self._cells, self._cell_teams):
+            counts = {}
+            for point, name in cell.items():
+                if not self._in_bounds(point) or self._cell(point) is not cell:
+                    return False
+                found[name] = point
+                team = self._team_of.get(name)
+                counts[team] = counts.get(team, 0) + 1
+            if counts != teams:
+                return False
+        return found == self._index
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={'extra-imports': ['heapq', 'math', 'typing',
+                                                  'trees']})
@@ -0,0 +1,652 @@
+from __future__ import annotations
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from typing import Optional, List, Tuple, Dict, Set, Union
+from trees import Tree, OutOfBoundsError, range_box, step_point, \
+    boxes_overlap, box_contains, box_distance2, nearest_by_name, plan_moves
+
+SCAN_SIZE = 16
+
+
+def _spread(value: int) -> int:
+    """ Return <value>, of at most 32 bits, with a 0 bit inserted above each
+    of its bits.
+    """
+    value &= 0xFFFFFFFF
+    value = (value | value << 16) & 0x0000FFFF0000FFFF
+    value = (value | value << 8) & 0x00FF00FF00FF00FF
+    value = (value | value << 4) & 0x0F0F0F0F0F0F0F0F
+    value = (value | value << 2) & 0x3333333333333333
+    return (value | value << 1) & 0x5555555555555555
+
+
+def _compact(value: int) -> int:
+    """ Return the even-numbered bits of <value> packed together, undoing
+    _spread.
+    """
+    value &= 0x5555555555555555
+    value = (value | value >> 1) & 0x3333333333333333
+    value = (value | value >> 2) & 0x0F0F0F0F0F0F0F0F
+    value = (value | value >> 4) & 0x00FF00FF00FF00FF
+    value = (value | value >> 8) & 0x0000FFFF0000FFFF
+    return (value | value >> 16) & 0xFFFFFFFF
+
+
+def morton_code(point: Tuple[int, int]) -> int:
+    """ Return the Z-order (Morton) code of <point>: the bits of its x and y
+    coordinates interleaved, x in the lower bit of each pair. Sorting points
+    by code lists every quadrant of every level of a quadtree as one run.
+
+    >>> morton_code((0, 0)), morton_code((1, 0)), morton_code((0, 1))
+    (0, 1, 2)
+    >>> morton_code((2, 3))
+    14
+    """
+    return _spread(point[0]) | _spread(point[1]) << 1
+
+
+def morton_point(code: int) -> Tuple[int, int]:
+    """ Return the point whose Morton code is <code>.
+
+    >>> morton_point(14)
+    (2, 3)
+    """
+    return _compact(code), _compact(code >> 1)
+
+
+class LinearQuadTree(Tree):
+    """ A quadtree kept as a sorted array of the Morton codes of its players.
+
+    The players of any quadrant of any level form one run of the array, so
+    a range query splits its box into the quadrants it covers and finds each
+    quadrant's run with bisect, never holding a node object. Parallel arrays
+    keep each player's coordinates and name id in the same order as the
+    codes. The arrays cost a few dozen bytes per player, and from_points
+    builds a field with a single sort, which suits fields that are rebuilt
+    every round.
+    """
+    _centre: Tuple[int, int]
+    _bits: int
+    _codes: array
+    _xs: array
+    _ys: array
+    _ids: array
+    _names: List[Optional[str]]
+    _id_of: Dict[str, int]
+    _free_ids: List[int]
+    _team_of: Dict[str, Optional[str]]
+    _index: Dict[str, Tuple[int, int]]
+    _moves: int
+    _in_place_moves: int
+
+    def __init__(self, centre: Tuple[int, int]) -> None:
+        """Initialize an empty LinearQuadTree covering (0, 0) to twice
+        <centre>.
+        Runtime: O(1)
+        """
+        self._centre = centre
+        self._bits = max(centre[0] * 2, centre[1] * 2, 1).bit_length()
+        self._codes = array('Q')
+        self._xs = array('i')
+        self._ys = array('i')
+        self._ids = array('i')
+        self._names = []
+        self._id_of = {}
+        self._free_ids = []
+        self._team_of = {}
+        self._index = {}
+        self._moves = 0
+        self._in_place_moves = 0
+
+    def _new_id(self, name: str) -> int:
+        """ Return a fresh id for <name>.
+        """
+        if self._free_ids:
+            i = self._free_ids.pop()
+            self._names[i] = name
+        else:
+            i = len(self._names)
+            self._names.append(name)
+        self._id_of[name] = i
+        return i
+
+    def _free_id(self, i: int) -> None:
+        """ Forget the name with id <i>.
+        """
+        del self._id_of[self._names[i]]
+        self._names[i] = None
+        self._free_ids.append(i)
+
+    def _in_bounds(self, point: Tuple[int, int]) -> bool:
+        """ Return True if <point> lies on this field.
+        """
+        return 0 <= point[0] <= self._centre[0] * 2 \
+            and 0 <= point[1] <= self._centre[1] * 2
+
+    def _find(self, point: Tuple[int, int]) -> int:
+        """ Return the position of the player at <point> in the arrays, or -1
+        if there is none.
+        """
+        if not self._in_bounds(point):
+            return -1
+        code = morton_code(point)
+        i = bisect_left(self._codes, code)
+        if i < len(self._codes) and self._codes[i] == code:
+            return i
+        return -1
+
+    def _store(self, code: int, point: Tuple[int, int], i: int) -> None:
+        """ Put the player with name id <i> at <point>, whose code is <code>,
+        into its place in the arrays.
+        """
+        k = bisect_left(self._codes, code)
+        self._codes.insert(k, code)
+        self._xs.insert(k, point[0])
+        self._ys.insert(k, point[1])
+        self._ids.insert(k, i)
+
+    def _take(self, k: int) -> int:
+        """ Take the player at position <k> out of the arrays and return its
+        name id.
+        """
+        i = self._ids[k]
+        del self._codes[k]
+        del self._xs[k]
+        del self._ys[k]
+        del self._ids[k]
+        return i
+
+    def _spans(self, box: Tuple[int, int, int, int]) \
+            -> List[Tuple[int, int, bool]]:
+        """ Return (start, end, whole) runs of positions, in order, that hold
+        every player inside <box>. A run is whole if its quadrant lies in
+        <box>, so that all of its players are inside; the players of other
+        runs still have to be checked.
+
+        Quadrants that miss <box> or hold no players are dropped, and one
+        that holds at most SCAN_SIZE players is not divided further.
+        """
+        spans = []
+        codes = self._codes
+        if not codes:
+            return spans
+        stack = [(0, self._bits, 0, 0)]
+        while stack:
+            low, level, x, y = stack.pop()
+            side = 1 << level
+            cell = (x, y, x + side - 1, y + side - 1)
+            if not boxes_overlap(box, cell):
+                continue
+            start = bisect_left(codes, low)
+            end = bisect_left(codes, low + (1 << 2 * level), start)
+            if start == end:
+                continue
+            if box_contains(box, cell):
+                spans.append((start, end, True))
+            elif end - start <= SCAN_SIZE or level == 0:
+                spans.append((start, end, False))
+            else:
+                level -= 1
+                half = 1 << level
+                quarter = 1 << 2 * level
+                for q in (3, 2, 1, 0):
+                    stack.append((low + q * quarter, level,
+                                  x + (q & 1) * half, y + (q >> 1) * half))
+        return spans
+
+    def __contains__(self, name: str) -> bool:
+        """ Return True if a player named <name> is stored in this field.
+        Runtime: O(1)
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert("Eric", (150, 150))
+        >>> t.__contains__("Eric")
+        True
+        """
+        return name in self._index
+
+    def contains_point(self, point: Tuple[int, int]) -> bool:
+        """ Return True if a player at location <point> is stored in this
+        field.
+        Runtime: O(log(n))
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert("Eric", (150, 150))
+        >>> t.contains_point((150, 150)), t.contains_point((151, 150))
+        (True, False)
+        """
+        return self._find(point) != -1
+
+    def getpoint(self, name: str) -> Optional[Tuple[int, int]]:
+        """ Return the location of the player named <name>, or None if there
+        is no such player in this field.
+        Runtime: O(1)
+        """
+        return self._index.get(name)
+
+    def getname(self, point: Tuple[int, int]) -> Optional[str]:
+        k = self._find(point)
+        if k == -1:
+            return None
+        return self._names[self._ids[k]]
+
+    def insert(self, name: str, point: Tuple[int, int]) -> None:
+        """Insert a player named <name> into this field at point <point>.
+        Raise an OutOfBoundsError if <point> is out of bounds.
+        Raise an OutOfBoundsError if another player is already named <name>
+        or already at <point>.
+        Runtime: O(n) worst case, to shift the arrays
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert("Eric", (150, 150))
+        >>> t.insert("Joe", (150, 150))
+        Traceback (most recent call last):
+        ...
+        trees.OutOfBoundsError
+        """
+        if not self._in_bounds(point):
+            raise OutOfBoundsError
+        if name in self._index or self._find(point) != -1:
+            raise OutOfBoundsError
+        self._store(morton_code(point), point, self._new_id(name))
+        self._index[name] = point
+
+    def remove(self, name: str) -> None:
+        """ Remove information about a player named <name> from this field.
+        Runtime: O(n) worst case, to shift the arrays
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert("Eric", (150, 150))
+        >>> t.remove("Eric")
+        >>> t.__contains__("Eric"), t.contains_point((150, 150))
+        (False, False)
+        """
+        if name in self._index:
+            self.remove_point(self._index[name])
+
+    def remove_point(self, point: Tuple[int, int]) -> None:
+        """ Remove information about a player at point <point> from this
+        field.
+        Runtime: O(n) worst case, to shift the arrays
+        """
+        k = self._find(point)
+        if k != -1:
+            i = self._take(k)
+            del self._index[self._names[i]]
+            self._free_id(i)
+
+    def move(self, name: str, direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player named <name> after moving it
+        in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(log(n)) when the player keeps its place in Morton order,
+        O(n) worst case otherwise
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert("Eric", (150, 150))
+        >>> t.move("Eric", "N", 10)
+        (150, 140)
+        >>> t.getpoint("Eric"), t.getname((150, 140))
+        ((150, 140), 'Eric')
+        """
+        point = self._index.get(name)
+        if point is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
+
+    def move_point(self, point: Tuple[int, int], direction: str, steps: int) \
+            -> Optional[Tuple[int, int]]:
+        """ Return the new location of the player at point <point> after
+        moving it in the given <direction> by <steps> steps.
+        Raise an OutOfBoundsError if this would move the player out of bounds
+        or onto another player (before moving the player).
+        Runtime: O(log(n)) when the player keeps its place in Morton order,
+        O(n) worst case otherwise
+        === precondition ===
+        direction in ['N', 'S', 'E', 'W']
+        """
+        name = self.getname(point)
+        if name is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
+
+    def move_many(self, moves: List[Tuple[str, str, int]]) \
+            -> List[Union[Tuple[int, int], OutOfBoundsError, None]]:
+        """ Make each (name, direction, steps) move of <moves> in order, as
+        move(name, direction, steps) would, and return the outcome of each:
+        the player's new location, None if there is no player named <name>,
+        or the OutOfBoundsError move would have raised.
+        Runtime: O(n + m log(n)) for m moves that keep their place in Morton
+        order
+        === precondition ===
+        every direction in ['N', 'S', 'E', 'W']
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert("Eric", (150, 150))
+        >>> t.move_many([("Eric", "S", 60), ("Eric", "W", 10)])
+        [OutOfBoundsError('out of bounds'), (140, 150)]
+        """
+        outcomes, steps = plan_moves(self._index, (0, 0, self._centre[0] * 2,
+                                                   self._centre[1] * 2),
+                                     moves)
+        for name, point, new in steps:
+            self._shift(name, point, new)
+        return outcomes
+
+    def _relocate(self, name: str, point: Tuple[int, int],
+                  new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to <new> and return <new>.
+        """
+        if not self._in_bounds(new):
+            raise OutOfBoundsError('out of bounds')
+        if self._find(new) != -1:
+            raise OutOfBoundsError('occupied')
+        return self._shift(name, point, new)
+
+    def _shift(self, name: str, point: Tuple[int, int],
+               new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to the free, in-bounds point
+        <new> and return <new>.
+
+        If the new code still falls between the codes of the player's
+        neighbours in the array, its entries are overwritten in place.
+        Otherwise the player is deleted from the arrays and inserted again.
+        """
+        code = morton_code(new)
+        codes = self._codes
+        k = bisect_left(codes, morton_code(point))
+        if (k == 0 or codes[k - 1] < code) \
+                and (k == len(codes) - 1 or code < codes[k + 1]):
+            codes[k] = code
+            self._xs[k] = new[0]
+            self._ys[k] = new[1]
+            self._in_place_moves += 1
+        else:
+            self._store(code, new, self._take(k))
+        self._moves += 1
+        self._index[name] = new
+        return new
+
+    def move_stats(self) -> Dict[str, int]:
+        """ Return the number of successful moves made in this field under
+        'moves', and how many of those kept the player's place in the arrays
+        under 'in_place'.
+        Runtime: O(1)
+        """
+        return {'moves': self._moves, 'in_place': self._in_place_moves}
+
+    def names_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> List[str]:
+        """ Return a list of names of players whose location is in the
+        <direction> relative to <point> and whose location is within
+        <distance> along both the x and y axis.
+
+        The box is split into the runs of Morton codes given by _spans. Runs
+        of quadrants wholly inside the box are copied without checking their
+        points.
+        Runtime: O(log(n)) for each run, plus the players in the runs
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW']
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (110, 110))
+        >>> t.insert('Jack', (90, 109))
+        >>> sorted(t.names_in_range((100, 100), 'SE', 10))
+        ['Eric', 'Joe']
+        """
+        box = range_box(point, direction, distance)
+        lst = []
+        names = self._names
+        ids = self._ids
+        xs = self._xs
+        ys = self._ys
+        for start, end, whole in self._spans(box):
+            if whole:
+                lst.extend([names[i] for i in ids[start:end]])
+                continue
+            for k in range(start, end):
+                if box[0] <= xs[k] <= box[2] and box[1] <= ys[k] <= box[3]:
+                    lst.append(names[ids[k]])
+        return lst
+
+    def names_in_range_many(self, queries: List[Tuple[Tuple[int, int], str,
+                                                      int]]) \
+            -> List[List[str]]:
+        """ Return, for each (point, direction, distance) query in <queries>,
+        the list names_in_range(point, direction, distance) would return.
+        Results are in the same order as <queries>.
+
+        Each query is answered in turn: its runs share no work.
+        Runtime: O(sum of the cost of each query)
+        """
+        return [self.names_in_range(point, direction, distance)
+                for point, direction, distance in queries]
+
+    def nearest(self, point: Tuple[int, int], k: int = 1,
+                include: Optional[Set[str]] = None) \
+            -> List[Tuple[str, float]]:
+        """ Return (name, distance) pairs for the <k> players closest to
+        <point>, nearest first, counting only players named in <include> if
+        it is given. Distances are straight-line distances. A player standing
+        at <point> itself is included, at distance 0.
+
+        Quadrants are visited best first, in order of how close they come to
+        <point>, and the search stops once the <k> best players found are
+        closer than every quadrant left. An <include> of at most sqrt(n)
+        names is answered from the name index instead.
+        Runtime: O(log(n) + k) typical
+        === precondition ===
+        k >= 0
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (110, 100))
+        >>> t.insert('Jack', (30, 160))
+        >>> t.nearest((100, 100), 2)
+        [('Eric', 7.0710678118654755), ('Joe', 10.0)]
+        >>> t.nearest((100, 100), 1, {'Jack', 'Joe'})
+        [('Joe', 10.0)]
+        """
+        if include is not None and len(include) ** 2 <= len(self._index):
+            return nearest_by_name(self._index, point, k, include)
+        best = []
+        codes = self._codes
+        if k <= 0 or not codes:
+            return []
+        heap = [(0, 0, self._bits, 0, 0)]
+        while heap:
+            d2, low, level, x, y = heapq.heappop(heap)
+            if len(best) == k and d2 >= -best[0][0]:
+                break
+            start = bisect_left(codes, low)
+            end = bisect_left(codes, low + (1 << 2 * level), start)
+            if end - start > SCAN_SIZE and level > 0:
+                level -= 1
+                half = 1 << level
+                quarter = 1 << 2 * level
+                for q in range(4):
+                    cx = x + (q & 1) * half
+                    cy = y + (q >> 1) * half
+                    d2 = box_distance2((cx, cy, cx + half - 1, cy + half - 1),
+                                       point)
+                    if len(best) < k or d2 < -best[0][0]:
+                        heapq.heappush(heap, (d2, low + q * quarter, level,
+                                              cx, cy))
+                continue
+            for j in range(start, end):
+                name = self._names[self._ids[j]]
+                if include is not None and name not in include:
+                    continue
+                d2 = (self._xs[j] - point[0]) ** 2 \
+                    + (self._ys[j] - point[1]) ** 2
+                if len(best) < k:
+                    heapq.heappush(best, (-d2, name))
+                elif d2 < -best[0][0]:
+                    heapq.heapreplace(best, (-d2, name))
+        return [(name, math.sqrt(-d2)) for d2, name in
+                sorted(best, key=lambda item: (-item[0], item[1]))]
+
+    def find_pairs_within(self, radius: int) -> List[Tuple[str, str]]:
+        """ Return a (name, name) pair for every two players in this field
+        whose straight-line distance apart is at most <radius>. Each pair
+        appears once, in no particular order.
+
+        Each player looks up the runs of the box of side 2 * <radius> around
+        it, and is paired only with players later in Morton order, so that
+        each pair is found once.
+        Runtime: O(n log(n) + k) typical for k pairs and a small radius
+        === precondition ===
+        radius >= 0
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (108, 109))
+        >>> t.insert('Jack', (102, 101))
+        >>> t.insert('Ann', (150, 150))
+        >>> sorted(sorted(pair) for pair in t.find_pairs_within(5))
+        [['Eric', 'Jack'], ['Eric', 'Joe']]
+        """
+        pairs = []
+        limit = radius * radius
+        names = self._names
+        ids = self._ids
+        xs = self._xs
+        ys = self._ys
+        for k in range(len(self._codes)):
+            x = xs[k]
+            y = ys[k]
+            for start, end, _ in self._spans((x - radius, y - radius,
+                                              x + radius, y + radius)):
+                for j in range(max(start, k + 1), end):
+                    if (xs[j] - x) ** 2 + (ys[j] - y) ** 2 <= limit:
+                        pairs.append((names[ids[k]], names[ids[j]]))
+        return pairs
+
+    def set_team(self, name: str, team: Optional[str]) -> None:
+        """ Record that the player named <name> plays for <team>, whether or
+        not it is in this field yet. The team is kept if the player is
+        removed, and is used again if it is inserted later. Players never
+        given a team count under None.
+        Runtime: O(1)
+        """
+        self._team_of[name] = team
+
+    def count_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> Dict[Optional[str], int]:
+        """ Return how many of the players names_in_range(<point>,
+        <direction>, <distance>) would list play for each team, leaving out
+        teams with no such player.
+
+        The arrays keep no per-quadrant counts, so this counts the names
+        names_in_range finds.
+        Runtime: the cost of names_in_range
+        === precondition ===
+        direction in ['NE', 'SE', 'NW', 'SW']
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.set_team('Eric', 'green')
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (110, 110))
+        >>> t.insert('Jack', (90, 109))
+        >>> t.count_in_range((100, 100), 'SE', 10)
+        {'green': 1, None: 1}
+        """
+        counts = {}
+        for name in self.names_in_range(point, direction, distance):
+            team = self._team_of.get(name)
+            counts[team] = counts.get(team, 0) + 1
+        return counts
+
+    @classmethod
+    def from_points(cls, centre: Tuple[int, int],
+                    items: List[Tuple[str, Tuple[int, int]]]) \
+            -> LinearQuadTree:
+        """ Return a new LinearQuadTree centred at <centre> that holds every
+        (name, point) pair in <items>, built with one sort of their codes.
+
+        Raise an OutOfBoundsError if a point in <items> is out of bounds, or
+        if two items share a name or a point.
+
+        Runtime: O(n log(n))
+        >>> items = [(str(i), (i, i)) for i in range(15)]
+        >>> t = LinearQuadTree.from_points((50, 50), items)
+        >>> t.getpoint('7'), t.getname((7, 7)), t.size()
+        ((7, 7), '7', 15)
+        """
+        tree = cls(centre)
+        coded = []
+        for name, point in items:
+            if not tree._in_bounds(point):
+                raise OutOfBoundsError
+            tree._index[name] = point
+            coded.append((morton_code(point), point, name))
+        coded.sort()
+        if len(tree._index) != len(items) \
+                or len(set(tree._index.values())) != len(items):
+            raise OutOfBoundsError
+        tree._codes = array('Q', [code for code, _, _ in coded])
+        tree._xs = array('i', [point[0] for _, point, _ in coded])
+        tree._ys = array('i', [point[1] for _, point, _ in coded])
+        tree._ids = array('i', range(len(coded)))
+        tree._names = [name for _, _, name in coded]
+        tree._id_of = {name: i for i, name in enumerate(tree._names)}
+        return tree
+
+    def size(self) -> int:
+        """ Return the number of players in <self>
+        Runtime: O(1)
+        """
+        return len(self._codes)
+
+    def height(self) -> int:
+        """ Return the height of <self>. The arrays are a single level, so
+        this is 1 for a field with players and 0 for an empty one.
+        Runtime: O(1)
+        """
+        return 1 if self._codes else 0
+
+    def is_leaf(self) -> bool:
+        """ Return True, since the arrays have no subtrees.
+        Runtime: O(1)
+        """
+        return True
+
+    def is_empty(self) -> bool:
+        """ Return True if <self> does not store any information about the
+        location of any players.
+        Runtime: O(1)
+        """
+        return not self._codes
+
+    def is_valid(self) -> bool:
+        """ Return True if the codes are strictly increasing, each matches the
+        in-bounds point stored beside it, the name ids are those in use, and
+        the name index matches the arrays.
+        Runtime: O(n)
+        >>> t = LinearQuadTree((100, 100))
+        >>> t.insert("Eric", (150, 150))
+        >>> t.insert("Joe", (50, 50))
+        >>> t.is_valid()
+        True
+        >>> t._index["Jack"] = (10, 10)
+        >>> t.is_valid()
+        False
+        """
+        found = {}
+        previous = -1
+        for code, x, y, i in zip(self._codes, self._xs, self._ys, self._ids):
+            if code <= previous or code != morton_code((x, y)) \
+                    or not self._in_bounds((x, y)):
+                return False
+            name = self._names[i]
+            if name is None or self._id_of.get(name) != i:
+                return False
+            found[name] = (x, y)
+            previous = code
+        return found == self._index and len(found) == len(self._id_of)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={'extra-imports': ['array', 'bisect', 'heapq',
+                                                  'math', 'typing', 'trees']})
@@ -1,5 +1,22 @@
 from __future__ import annotations
-from typing import List, Tuple, Optional, Set
+import random
+from typing import List, Tuple, Optional, Set, Dict, Union
+import numpy as np
+from trees import directions
+
+NO_VALUE = -2 ** 31
+DIRECTION_CODES = ('', 'N', 'S', 'E', 'W')
+_STEP_X = np.array([0, 0, 0, 1, -1], dtype=np.int32)
+_STEP_Y = np.array([0, -1, 1, 0, 0], dtype=np.int32)
+_REVERSE = np.array([0, 2, 1, 4, 3], dtype=np.int8)
+# What one player seen in each bin adds to the (N, S, E, W) scores of
+# box_direction. Bins 1 to 4 are targets in the NE, NW, SW and SE quadrants
+# (numbered as trees.directions numbers them) and bins 5 to 8 are enemies in
+# the same quadrants: targets draw a player towards them and enemies push it
+# away.
+_BOX_SCORES = ((0, 0, 0, 0),
+               (1, 0, 1, 0), (1, 0, 0, 1), (0, 1, 0, 1), (0, 1, 1, 0),
+               (0, 1, 0, 1), (0, 1, 1, 0), (1, 0, 1, 0), (1, 0, 0, 1))
 
 def random_direction() -> List[str]:
     output = []
@@ -13,39 +30,505 @@ def random_direction2() -> str:
     directions = ['N', 'S', 'W', 'E']
     return random.choice(directions)
 
+def field_bounds(field: Optional[Tree]) -> Tuple[int, int, int, int]:
+    """ Return the (left, top, right, bottom) edges of <field>, from the
+    centre of a quadtree field or the corners of any other field. A missing
+    field only has its top and left edges.
+    >>> from trees import QuadTree, TwoDTree
+    >>> field_bounds(QuadTree((250, 100)))
+    (0, 0, 500, 200)
+    >>> field_bounds(TwoDTree((10, 20), (300, 400)))
+    (10, 20, 300, 400)
+    """
+    if field is None:
+        return 0, 0, -NO_VALUE - 1, -NO_VALUE - 1
+    if hasattr(field, '_centre'):
+        return 0, 0, field._centre[0] * 2, field._centre[1] * 2
+    return field._nw[0], field._nw[1], field._se[0], field._se[1]
+
+def direction_towards(start: Tuple[int, int], end: Tuple[int, int]) -> str:
+    """ Return the one of 'N', 'S', 'E', 'W' that best closes the gap from
+    <start> to <end>, preferring the axis with the larger gap.
+    >>> direction_towards((50, 50), (60, 45))
+    'E'
+    >>> direction_towards((50, 50), (48, 41))
+    'N'
+    """
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    if abs(dx) >= abs(dy):
+        return 'E' if dx > 0 else 'W'
+    return 'S' if dy > 0 else 'N'
+
+class PlayerStore:
+    """ The state of every player of a game, one row per player id, held as
+    typed NumPy columns instead of one attribute dict per player.
+
+    Locations, speeds, visions and points are int32 columns, with NO_VALUE
+    standing for a value that was never given. Colours are stored as codes
+    into _colour_names, and directions as positions in DIRECTION_CODES.
+    Rows are never reused, so a Player view stays valid for as long as it
+    is held.
+    """
+    _names: List[Optional[str]]
+    _xs: np.ndarray
+    _ys: np.ndarray
+    _speeds: np.ndarray
+    _visions: np.ndarray
+    _points: np.ndarray
+    _colours: np.ndarray
+    _directions: np.ndarray
+    _colour_names: List[Optional[str]]
+    _colour_codes: Dict[Optional[str], int]
+
+    def __init__(self, capacity: int = 16) -> None:
+        """Initialize an empty store with room for <capacity> players before
+        its columns have to grow.
+        Runtime: O(capacity)
+        """
+        self._names = []
+        self._xs = np.full(capacity, NO_VALUE, dtype=np.int32)
+        self._ys = np.full(capacity, NO_VALUE, dtype=np.int32)
+        self._speeds = np.full(capacity, NO_VALUE, dtype=np.int32)
+        self._visions = np.full(capacity, NO_VALUE, dtype=np.int32)
+        self._points = np.zeros(capacity, dtype=np.int32)
+        self._colours = np.zeros(capacity, dtype=np.int16)
+        self._directions = np.zeros(capacity, dtype=np.int8)
+        self._colour_names = [None]
+        self._colour_codes = {None: 0}
+
+    def __len__(self) -> int:
+        """ Return the number of players ever added to this store.
+        Runtime: O(1)
+        """
+        return len(self._names)
+
+    def add(self, name: Optional[str], vision: Optional[int],
+            speed: Optional[int], location: Optional[Tuple[int, int]]) -> int:
+        """ Add a row for a player with no points, no colour and no direction
+        yet, and return its id.
+        Runtime: O(1) amortized
+        >>> store = PlayerStore(1)
+        >>> store.add('Eric', 10, 2, (50, 60)), store.add('Joe', 5, 1, None)
+        (0, 1)
+        >>> len(store), int(store._ys[0]), int(store._xs[1]) == NO_VALUE
+        (2, 60, True)
+        """
+        i = len(self._names)
+        if i == len(self._xs):
+            self._grow()
+        self._names.append(name)
+        if location is not None:
+            self._xs[i] = location[0]
+            self._ys[i] = location[1]
+        if speed is not None:
+            self._speeds[i] = speed
+        if vision is not None:
+            self._visions[i] = vision
+        return i
+
+    def _grow(self) -> None:
+        """ Double the room in every column.
+        """
+        for column in ('_xs', '_ys', '_speeds', '_visions', '_points',
+                       '_colours', '_directions'):
+            old = getattr(self, column)
+            new = np.full(max(len(old) * 2, 1),
+                          NO_VALUE if column in ('_xs', '_ys', '_speeds',
+                                                 '_visions') else 0,
+                          dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, column, new)
+
+    def move(self, bounds: Tuple[int, int, int, int],
+             rows: Union[slice, np.ndarray, None] = None) -> None:
+        """ Move every player in <rows>, or every player if <rows> is None,
+        by its speed in its direction, all at once. A player whose step
+        would leave <bounds> steps the other way instead and keeps that
+        reversed direction. Players with no location, speed or direction
+        stay where they are.
+        Runtime: O(n) array operations
+        >>> store = PlayerStore()
+        >>> for x in (0, 5, 10):
+        ...     _ = store.add(str(x), 1, 3, (x, 5))
+        >>> _ = store.add('unplaced', 1, 3, None)
+        >>> store._directions[:4] = [DIRECTION_CODES.index(d)
+        ...                          for d in ('W', 'N', 'E', 'N')]
+        >>> store.move((0, 0, 10, 10))
+        >>> [(int(x), int(y)) for x, y in zip(store._xs[:3], store._ys[:3])]
+        [(3, 5), (5, 2), (7, 5)]
+        >>> [DIRECTION_CODES[d] for d in store._directions[:4]]
+        ['E', 'N', 'W', 'N']
+        """
+        if rows is None:
+            rows = slice(0, len(self._names))
+        xs = self._xs[rows]
+        ys = self._ys[rows]
+        speeds = self._speeds[rows]
+        directions = self._directions[rows]
+        moving = (xs != NO_VALUE) & (speeds != NO_VALUE)
+        speeds = np.where(moving, speeds, 0)
+        dx = _STEP_X[directions] * speeds
+        dy = _STEP_Y[directions] * speeds
+        new_xs = xs + dx
+        new_ys = ys + dy
+        out = moving & ((new_xs < bounds[0]) | (new_ys < bounds[1])
+                        | (new_xs > bounds[2]) | (new_ys > bounds[3]))
+        self._xs[rows] = np.where(out, xs - dx, new_xs)
+        self._ys[rows] = np.where(out, ys - dy, new_ys)
+        self._directions[rows] = np.where(out, _REVERSE[directions],
+                                          directions)
+
+    def colour_code(self, colour: Optional[str]) -> int:
+        """ Return the code stored for <colour>, giving it one if it is new.
+        Runtime: O(1)
+        """
+        code = self._colour_codes.get(colour)
+        if code is None:
+            code = len(self._colour_names)
+            self._colour_names.append(colour)
+            self._colour_codes[colour] = code
+        return code
+
+
+class Relationships:
+    """ Who each player of a game targets and who it runs from.
+
+    Relations come from two places. Team rules say that every player of
+    one team targets, or has as enemies, every player of another team, so
+    a game sets them up once instead of once per pair of players. On top
+    of the rules each player has sparse overrides: names it added itself,
+    and names it ignores even though a rule covers them. Team members and
+    overrides are kept in dicts used as ordered sets, so asking whether
+    one player targets another is O(1) and listing them keeps the order
+    they were selected in. Every change adds one to _version, so a copy of
+    the table can tell it is out of date.
+
+    <kind> is always one of 'targets' or 'enemies'.
+    """
+    _version: int
+    _team_of: Dict[Optional[str], Optional[str]]
+    _members: Dict[Optional[str], Dict[Optional[str], None]]
+    _rules: Dict[str, Dict[Optional[str], Set[Optional[str]]]]
+    _added: Dict[str, Dict[Optional[str], Dict[Optional[str], None]]]
+    _removed: Dict[str, Dict[Optional[str], Set[Optional[str]]]]
+
+    def __init__(self) -> None:
+        """Initialize a table with no players, rules or overrides.
+        Runtime: O(1)
+        """
+        self._version = 0
+        self._team_of = {}
+        self._members = {}
+        self._rules = {'targets': {}, 'enemies': {}}
+        self._added = {'targets': {}, 'enemies': {}}
+        self._removed = {'targets': {}, 'enemies': {}}
+
+    def set_team(self, name: Optional[str], team: Optional[str]) -> None:
+        """ Record that the player named <name> now plays for <team>, so the
+        rules of <team> apply to it from now on.
+        Runtime: O(1)
+        >>> r = Relationships()
+        >>> r.set_team('a', 'green')
+        >>> r._version
+        1
+        """
+        self._version += 1
+        if name in self._team_of:
+            del self._members[self._team_of[name]][name]
+        self._team_of[name] = team
+        self._members.setdefault(team, {})[name] = None
+
+    def forget(self, name: Optional[str]) -> None:
+        """ Drop the player named <name> from its team and drop its own
+        overrides. Overrides of other players naming it are kept.
+        Runtime: O(1)
+        """
+        self._version += 1
+        if name in self._team_of:
+            del self._members[self._team_of.pop(name)][name]
+        for kind in ('targets', 'enemies'):
+            self._added[kind].pop(name, None)
+            self._removed[kind].pop(name, None)
+
+    def add_rule(self, kind: str, team: Optional[str],
+                 other_team: Optional[str]) -> None:
+        """ Make every player of <team> have every player of <other_team>
+        among its <kind>.
+        Runtime: O(1)
+        >>> r = Relationships()
+        >>> for name, team in (('a', 'purple'), ('b', 'green'),
+        ...                    ('c', 'green')):
+        ...     r.set_team(name, team)
+        >>> r.add_rule('targets', 'purple', 'green')
+        >>> r.names('targets', 'a'), r.has('targets', 'b', 'a')
+        (['b', 'c'], False)
+        >>> r.set_team('a', 'green')
+        >>> r.set_team('b', 'purple')
+        >>> r.names('targets', 'b')
+        ['c', 'a']
+        """
+        self._version += 1
+        self._rules[kind].setdefault(team, set()).add(other_team)
+
+    def select(self, kind: str, name: Optional[str],
+               other: Optional[str]) -> None:
+        """ Add <other> to the <kind> of the player named <name>.
+        Runtime: O(1)
+        """
+        self._version += 1
+        self._added[kind].setdefault(name, {})[other] = None
+
+    def ignore(self, kind: str, name: Optional[str],
+               other: Optional[str]) -> None:
+        """ Remove <other> from the <kind> of the player named <name>, even
+        if a team rule puts it there.
+        Runtime: O(1)
+
+        === precondition ===
+        <other> is one of the <kind> of <name>
+        """
+        self._version += 1
+        added = self._added[kind].get(name, {})
+        if other in added:
+            del added[other]
+        elif self._by_rule(kind, name, other):
+            self._removed[kind].setdefault(name, set()).add(other)
+        else:
+            raise ValueError(f'{other} is not one of the {kind} of {name}')
+
+    def _by_rule(self, kind: str, name: Optional[str],
+                 other: Optional[str]) -> bool:
+        """ Return whether a team rule gives <other> to the <kind> of <name>.
+        """
+        rules = self._rules[kind].get(self._team_of.get(name))
+        return bool(rules) and other != name and other in self._team_of \
+            and self._team_of[other] in rules
+
+    def has(self, kind: str, name: Optional[str],
+            other: Optional[str]) -> bool:
+        """ Return whether <other> is one of the <kind> of <name>.
+        Runtime: O(1)
+        >>> r = Relationships()
+        >>> r.set_team('a', 'green')
+        >>> r.set_team('b', 'purple')
+        >>> r.add_rule('enemies', 'green', 'purple')
+        >>> r.has('enemies', 'a', 'b')
+        True
+        >>> r.ignore('enemies', 'a', 'b')
+        >>> r.has('enemies', 'a', 'b')
+        False
+        >>> r.select('enemies', 'a', 'b')
+        >>> r.has('enemies', 'a', 'b')
+        True
+        """
+        if other in self._added[kind].get(name, ()):
+            return True
+        return self._by_rule(kind, name, other) \
+            and other not in self._removed[kind].get(name, ())
+
+    def split(self, name: Optional[str], others: List[Optional[str]]) \
+            -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """ Return the names in <others> that are targets of <name>, and the
+        rest of them that are enemies of <name>, as has() would sort them.
+        The player's rules and overrides are looked up once, not once for
+        every name.
+        Runtime: O(len(others))
+        >>> r = Relationships()
+        >>> for n, team in (('a', 'green'), ('b', 'purple'), ('c', 'green')):
+        ...     r.set_team(n, team)
+        >>> r.add_rule('enemies', 'green', 'purple')
+        >>> r.select('targets', 'a', 'c')
+        >>> r.split('a', ['a', 'b', 'c', 'd'])
+        (['c'], ['b'])
+        """
+        team_of = self._team_of
+        team = team_of.get(name)
+        found = ([], [])
+        lookups = [(self._added[kind].get(name, {}),
+                    self._rules[kind].get(team, ()),
+                    self._removed[kind].get(name, ()), result)
+                   for kind, result in zip(('targets', 'enemies'), found)]
+        for other in others:
+            for added, rules, removed, result in lookups:
+                if other in added or (
+                        rules and other != name and other in team_of
+                        and team_of[other] in rules
+                        and other not in removed):
+                    result.append(other)
+                    break
+        return found
+
+    def names(self, kind: str, name: Optional[str]) -> List[Optional[str]]:
+        """ Return a new list of the <kind> of <name>: the names it selected
+        itself, in the order they were selected, and then the players its
+        team rules give it.
+        Runtime: O(k) for k names returned
+        """
+        added = self._added[kind].get(name, {})
+        result = list(added)
+        removed = self._removed[kind].get(name, ())
+        for team in self._rules[kind].get(self._team_of.get(name), ()):
+            result.extend(other for other in self._members.get(team, ())
+                          if other != name and other not in added
+                          and other not in removed)
+        return result
+
+    def inherit(self, kind: str, heir: Optional[str],
+                name: Optional[str]) -> None:
+        """ Give <heir> all of the <kind> of <name>, except <heir> itself.
+        The overrides of <name> are moved rather than copied, and the
+        smaller of the two sets of overrides is merged into the larger, so
+        a chain of inheritances costs O(n log(n)) in total.
+        Runtime: O(min(k1, k2)) for overrides, plus O(k) for names only
+        <name>'s team rules give it
+        >>> r = Relationships()
+        >>> r.select('targets', 'a', 'b')
+        >>> r.select('targets', 'b', 'c')
+        >>> r.select('targets', 'b', 'a')
+        >>> r.inherit('targets', 'a', 'b')
+        >>> sorted(r.names('targets', 'a')), r.names('targets', 'b')
+        (['b', 'c'], [])
+        """
+        self._version += 1
+        gained = self._added[kind].pop(name, {})
+        heir_team = self._team_of.get(heir)
+        heir_rules = self._rules[kind].get(heir_team, set())
+        if self._team_of.get(name) != heir_team:
+            removed = self._removed[kind].get(name, ())
+            for team in self._rules[kind].get(self._team_of.get(name), ()):
+                if team not in heir_rules:
+                    gained.update((other, None)
+                                  for other in self._members.get(team, ())
+                                  if other != name and other not in removed)
+        own = self._added[kind].setdefault(heir, {})
+        if len(own) < len(gained):
+            own, gained = gained, own
+            self._added[kind][heir] = own
+        own.update(gained)
+        own.pop(heir, None)
+
+
+def _optional_column(column: str) -> property:
+    """ Return a property reading and writing a player's value in the int32
+    <column> of its store, with None standing for NO_VALUE.
+    """
+    def get(self: Player) -> Optional[int]:
+        value = int(getattr(self._store, column)[self._id])
+        return None if value == NO_VALUE else value
+
+    def put(self: Player, value: Optional[int]) -> None:
+        getattr(self._store, column)[self._id] = \
+            NO_VALUE if value is None else value
+    return property(get, put)
+
+
 class Player:
-    _name: str
-    _location: Tuple[int, int]
-    _colour: str
-    _vision: int
-    _speed: int
+    """ A view of one row of a PlayerStore.
+
+    The view itself only holds the store, the row id, the game and the
+    game's Relationships. _name, _location, _colour, _vision, _speed,
+    _points and _direction read and write the store, and _targets and
+    _enemies list the player's relations, so code written against plain
+    attributes keeps working. A player made without a game gets a store
+    and a relationship table of its own.
+    """
+    __slots__ = ('_store', '_id', '_game', '_relations')
+    _store: PlayerStore
+    _id: int
     _game: Game
-    _points: int
-    _targets: List[str]
-    _enemies: List[str]
-    _direction: str
+    _relations: Relationships
 
     def __init__(self, name: str, vision: int, speed: int, game: Game,
                        colour: str, location: Tuple[int, int]) -> None:
-        self._name = name
-        self._vision = vision
-        self._speed = speed
+        store = getattr(game, '_store', None)
+        if store is None:
+            store = PlayerStore(1)
+        self._store = store
+        self._id = store.add(name, vision, speed, location)
         self._game = game
-        self._colour = colour
-        self._location = location
-        self._points = 0
-        self._targets = []
-        self._enemies = []
-        self._direction = ""
+        relations = getattr(game, '_relations', None)
+        if relations is None:
+            relations = Relationships()
+        self._relations = relations
+        self.set_colour(colour)
+
+    _vision = _optional_column('_visions')
+    _speed = _optional_column('_speeds')
+
+    @property
+    def _name(self) -> str:
+        return self._store._names[self._id]
+
+    @property
+    def _location(self) -> Optional[Tuple[int, int]]:
+        x = int(self._store._xs[self._id])
+        if x == NO_VALUE:
+            return None
+        return x, int(self._store._ys[self._id])
+
+    @_location.setter
+    def _location(self, location: Optional[Tuple[int, int]]) -> None:
+        if location is None:
+            location = (NO_VALUE, NO_VALUE)
+        self._store._xs[self._id] = location[0]
+        self._store._ys[self._id] = location[1]
+
+    @property
+    def _targets(self) -> List[str]:
+        return self._relations.names('targets', self._name)
+
+    @property
+    def _enemies(self) -> List[str]:
+        return self._relations.names('enemies', self._name)
+
+    @property
+    def _points(self) -> int:
+        return int(self._store._points[self._id])
+
+    @_points.setter
+    def _points(self, points: int) -> None:
+        self._store._points[self._id] = points
+
+    @property
+    def _colour(self) -> Optional[str]:
+        return self._store._colour_names[self._store._colours[self._id]]
+
+    @_colour.setter
+    def _colour(self, colour: Optional[str]) -> None:
+        self._store._colours[self._id] = self._store.colour_code(colour)
+
+    @property
+    def _direction(self) -> str:
+        return DIRECTION_CODES[self._store._directions[self._id]]
+
+    @_direction.setter
+    def _direction(self, direction: str) -> None:
+        self._store._directions[self._id] = DIRECTION_CODES.index(direction)
 
     def set_colour(self, colour: str) -> None:
-        """ Change the colour of self
+        """ Change the colour of self, and tell the game's field, which keeps
+        count of the players of each colour, and the game's Relationships,
+        whose team rules go by colour
         >>> p = Player(None, None, None, None, None, None)
         >>> p._colour = "green"
         >>> p._colour == "green"
         True
+        >>> from games import Tag
+        >>> from arraytree import ArrayQuadTree
+        >>> game = Tag(0, ArrayQuadTree((250, 250)), 10, 3, 10)
+        >>> it = Player('it', 10, 3, game, 'purple', (250, 250))
+        >>> game.field.insert('it', (250, 250))
+        >>> game.field.count_in_range((250, 250), 'ALL', 0)
+        {'purple': 1}
+        >>> it.set_colour('green')
+        >>> game.field.count_in_range((250, 250), 'ALL', 0)
+        {'green': 1}
         """
         self._colour = colour
+        self._relations.set_team(self._name, colour)
+        if self._game is not None and self._game.field is not None:
+            self._game.field.set_team(self._name, colour)
         
     def assignd(self)->None:
         self._direction=random_direction2()
@@ -80,7 +563,7 @@ class Player:
         >>> p.get_targets()
         ['Eric', 'Joe']
         """
-        self._targets.append(name)
+        self._relations.select('targets', self._name, name)
 
     def ignore_target(self, name: str) -> None:
         """ Remove a target from <self>'s target list
@@ -91,14 +574,15 @@ class Player:
         >>> p.get_targets()
         ['Eric']
         """
-        self._targets.remove(name)
+        self._relations.ignore('targets', self._name, name)
 
     def getname(self) -> str:
-        return self.name
+        return self._name
     def getcolor(self)->str:
         return self._colour
     def get_targets(self) -> List[str]:
-        """ Return a copy of the list of target names
+        """ Return a new list of target names, from the game's team rules
+        and this player's own choices
         >>> p = Player(None, None, None, None, None, None)
         >>> p.select_target("Eric")
         >>> p.select_target("Joe")
@@ -106,7 +590,7 @@ class Player:
         >>> p.get_targets()
         ['Eric', 'Joe', 'Jack']
         """
-        return self._targets
+        return self._relations.names('targets', self._name)
 
     def select_enemy(self, name: str) -> None:
         """ Add an enemy to <self>'s target list
@@ -116,7 +600,7 @@ class Player:
         >>> p.get_enemies()
         ['Eric', 'Joe']
         """
-        self._enemies.append(name)
+        self._relations.select('enemies', self._name, name)
 
     def ignore_enemy(self, name: str) -> None:
         """ Remove an enemy from <self>'s enemy list
@@ -127,10 +611,11 @@ class Player:
         >>> p.get_enemies()
         ['Eric']
         """
-        self._enemies.remove(name)
+        self._relations.ignore('enemies', self._name, name)
 
     def get_enemies(self) -> List[str]:
-        """ Return a copy of the list of enemy names
+        """ Return a new list of enemy names, from the game's team rules
+        and this player's own choices
         >>> p = Player(None, None, None, None, None, None)
         >>> p.select_enemy("Eric")
         >>> p.select_enemy("Joe")
@@ -138,7 +623,7 @@ class Player:
         >>> p.get_enemies()
         ['Eric', 'Joe', 'Jack']
         """
-        return self._enemies
+        return self._relations.names('enemies', self._name)
 
     def reverse_direction(self) -> None:
         """ Update the direction so that <self> will move in the opposite direction
@@ -189,20 +674,23 @@ class Player:
         targets2 = []
         enemies2 = []
 
+        relations = self._relations
+        me = self._name
+
         # Collects targets and names of first direction
         for name in self._game.field.names_in_range(self._location, random_dir[0],
                                                     self._vision):
-            if name in self._targets:
+            if relations.has('targets', me, name):
                 targets1.append(name)
-            elif name in self._enemies:
+            elif relations.has('enemies', me, name):
                 enemies1.append(name)
 
         # Collects targets and names of second direction
         for name in self._game.field.names_in_range(self._location, random_dir[1],
                                                      self._vision):
-            if name in self._targets:
+            if relations.has('targets', me, name):
                 targets2.append(name)
-            elif name in self._enemies:
+            elif relations.has('enemies', me, name):
                 enemies2.append(name)
 
         # Calculates all possibilities for NSEW points
@@ -339,11 +827,98 @@ class Player:
             s.add(random_direction2())
             return s
 
+    def box_direction(self) -> Set[str]:
+        """ Update the direction to move the next time self.move is called,
+        like next_direction, but from a single names_in_range query over the
+        whole box within self._vision of self, instead of two random
+        quadrants. The targets and enemies found are binned by quadrant in
+        one pass, and each direction is scored from the bin counts with the
+        _BOX_SCORES table.
+        Return the set of all equally good directions, and point <self> at
+        one of them. If nothing in sight scores, move in a random direction.
+        This method calls the names_in_range Tree method exactly once.
+        >>> from games import Tag
+        >>> from trees import QuadTree
+        >>> game = Tag(0, QuadTree((250, 250)), 60, 1, 10)
+        >>> p = Player('p', 20, 1, game, 'green', (100, 100))
+        >>> game.field.insert('p', (100, 100))
+        >>> game.field.insert('q', (110, 90))
+        >>> game.field.insert('it', (110, 110))
+        >>> p.select_target('q')
+        >>> p.select_enemy('it')
+        >>> p.box_direction(), p._direction
+        ({'N'}, 'N')
+        >>> p.ignore_enemy('it')
+        >>> sorted(p.box_direction())
+        ['E', 'N']
+        """
+        field = self._game.field
+        location = self._location
+        targets, enemies = self._relations.split(
+            self._name, field.names_in_range(location, 'ALL', self._vision))
+        counts = [0] * len(_BOX_SCORES)
+        for name in targets:
+            counts[directions(location, field.getpoint(name))] += 1
+        for name in enemies:
+            counts[directions(location, field.getpoint(name)) + 4] += 1
+        scores = [0, 0, 0, 0]
+        for count, row in zip(counts, _BOX_SCORES):
+            if count:
+                for i in range(4):
+                    scores[i] += count * row[i]
+        best = max(scores)
+        if best == 0:
+            self._direction = random_direction2()
+            return {self._direction}
+        s = {direction for direction, score in zip('NSEW', scores)
+             if score == best}
+        self._direction = random.choice(sorted(s))
+        return s
+
+    def nearest_direction(self) -> Optional[str]:
+        """ Point <self> at the nearest target it can see, or away from the
+        nearest enemy it can see if that enemy is closer. Players further away
+        than <self>'s vision are not seen.
+        Return the new direction, or None if nothing is in sight, in which
+        case the direction is left unchanged.
+        This method calls the nearest Tree method twice.
+        >>> from games import Tag
+        >>> from trees import QuadTree
+        >>> game = Tag(0, QuadTree((250, 250)), 60, 1, 10)
+        >>> p = Player('p', 20, 1, game, 'green', (100, 100))
+        >>> game.field.insert('p', (100, 100))
+        >>> game.field.insert('it', (105, 98))
+        >>> game.field.insert('q', (100, 110))
+        >>> p.select_enemy('it')
+        >>> p.select_target('q')
+        >>> p.nearest_direction()
+        'W'
+        >>> p.ignore_enemy('it')
+        >>> p.nearest_direction()
+        'S'
+        """
+        field = self._game.field
+        target = field.nearest(self._location, 1, set(self.get_targets()))
+        enemy = field.nearest(self._location, 1, set(self.get_enemies()))
+        target = [(n, d) for n, d in target if d <= self._vision]
+        enemy = [(n, d) for n, d in enemy if d <= self._vision]
+        if enemy and (not target or enemy[0][1] < target[0][1]):
+            self._direction = direction_towards(
+                self._location, field.getpoint(enemy[0][0]))
+            self.reverse_direction()
+        elif target:
+            self._direction = direction_towards(
+                self._location, field.getpoint(target[0][0]))
+        else:
+            return None
+        return self._direction
+
     def move(self) -> None:
         """ Move <self> in the direction described by self._direction by the number of steps
         described by self._speed. Make sure to keep track of the updated location of self.
         If the movement would move self out of bounds, move self in the opposite direction instead.
         self should continue to move in this new direction until next_direction is called again.
+        This is PlayerStore.move for the one row of <self>.
         >>> p = Player(None, None, 1, None, None, (50, 50))
         >>> p._direction = "N"
         >>> p._speed == 1
@@ -354,60 +929,9 @@ class Player:
         >>> p._location == (50, 49)
         True
         """
-        if self._direction == "N" and self._location[1] - self._speed < 0:
-            self.reverse_direction()
-            # self._location[1] = self._game.field.move_point((self._location, "S", self._speed))
-            lst = list(self._location)
-            lst[1] = self._location[1] + self._speed
-            self._location = tuple(lst)
-        elif self._direction == "N" and self._location[1] - self._speed >= 0:
-            # self._location[1] = self._game.field.move_point((self._location, "N", self._speed))
-            lst = list(self._location)
-            lst[1] = self._location[1] - self._speed
-            self._location = tuple(lst)
-
-        if self._direction == "S" and self._location[1] + self._speed > (2*(self._game.field._centre[1])):
-            self.reverse_direction()
-            # self._location = self._game.field.move_point((self._location, "N", self._speed))
-            lst = list(self._location)
-            lst[1] = self._location[1] - self._speed
-            self._location = tuple(lst)
-        elif self._direction == "S" and self._location[1] + self._speed <= (2*(self._game.field._centre[1])):
-            # self._location[1] = self._game.field.move_point((self._location, "S", self._speed))
-            lst = list(self._location)
-            lst[1] = self._location[1] + self._speed
-            self._location = tuple(lst)
-
-        if self._direction == "W" and self._location[0] - self._speed < 0:
-            self.reverse_direction()
-            # self._location[0] = self._game.field.move_point(
-            #     (self._location, "E", self._speed))
-            lst = list(self._location)
-            lst[0] = self._location[0] + self._speed
-            self._location = tuple(lst)
-        elif self._direction == "W" and self._location[0] - self._speed >= 0:
-            # self._location[0] = self._game.field.move_point(
-            #     (self._location, "W", self._speed))
-            lst = list(self._location)
-            lst[0] = self._location[0] - self._speed
-            self._location = tuple(lst)
-
-        if self._direction == "E" and self._location[0] + self._speed > (
-                2 * (self._game.field._centre[0])):
-            self.reverse_direction()
-            # self._location = self._game.field.move_point(
-            #     (self._location, "W", self._speed))
-            lst = list(self._location)
-            lst[0] = self._location[0] - self._speed
-            self._location = tuple(lst)
-        elif self._direction == "E" and self._location[0] + self._speed <= (
-                2 * (self._game.field._centre[0])):
-            # self._location[0] = self._game.field.move_point(
-            #     (self._location, "E", self._speed))
-            lst = list(self._location)
-            lst[0] = self._location[0] + self._speed
-            self._location = tuple(lst)
+        field = None if self._game is None else self._game.field
+        self._store.move(field_bounds(field), slice(self._id, self._id + 1))
 
 if __name__ == '__main__':
     import python_ta
-    python_ta.check_all(config={'extra-imports': ['typing']})
+    python_ta.check_all(config={'extra-imports': ['numpy', 'typing', 'trees']})
@@ -0,0 +1,300 @@
+from __future__ import annotations
+from typing import Optional, List, Tuple, Dict, Set, FrozenSet
+import numpy as np
+from players import Player, PlayerStore, NO_VALUE
+
+DEFAULT_CELL_SIZE = 16
+
+
+class DecisionScheduler:
+    """ Decides directions for the players of one game only when something
+    they care about has changed.
+
+    Every subscribed player watches the box within its vision of its own
+    location. A player's decision is redone on the next tick only if a
+    target or enemy of it entered or left that box, or if its own speed,
+    vision or colour changed. Everyone else keeps the direction they have,
+    which is what makes a tick cheap in a sparse arena where most boxes stay
+    empty.
+
+    Changes are found by comparing the game's PlayerStore columns with the
+    values seen on the previous tick, so they are caught however they were
+    made, including through set_speed and set_colour. Watched boxes are
+    matched against locations through a grid of square cells of its own,
+    since moving a player does not update the game's field. Call touch for
+    any other change that should redo a decision, such as a new target.
+    """
+    _game: Game
+    _decide: str
+    _cell_size: int
+    _reach: int
+    _players: Dict[str, Player]
+    _rows: Optional[np.ndarray]
+    _names: List[str]
+    _columns: Optional[Tuple[np.ndarray, ...]]
+    _where: Dict[str, Tuple[int, int]]
+    _visions: Dict[str, int]
+    _cells: Dict[Tuple[int, int], Set[str]]
+    _seen: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]]
+    _dirty: Set[str]
+    skipped: List[float]
+
+    def __init__(self, game: Game, decide: str = 'next_direction',
+                 cell_size: Optional[int] = None) -> None:
+        """Initialize a scheduler for <game> with no players, which decides
+        with the Player method named <decide>, such as 'next_direction' or
+        'box_direction'. Cells are <cell_size> wide. Without a <cell_size>
+        they are twice the game's max_vision wide, so a watched box spans at
+        most 2 x 2 cells, or DEFAULT_CELL_SIZE wide if the game has none.
+        Runtime: O(1)
+        """
+        if cell_size is None:
+            max_vision = getattr(game, 'max_vision', None)
+            cell_size = 2 * max_vision if max_vision else DEFAULT_CELL_SIZE
+        self._game = game
+        self._decide = decide
+        self._cell_size = max(cell_size, 1)
+        self._reach = 0
+        self._players = {}
+        self._rows = None
+        self._names = []
+        self._columns = None
+        self._where = {}
+        self._visions = {}
+        self._cells = {}
+        self._seen = {}
+        self._dirty = set()
+        self.skipped = []
+
+    def subscribe(self, player: Player) -> None:
+        """ Start deciding for <player>, whose first decision is made on the
+        next tick.
+        Runtime: O(1)
+
+        === precondition ===
+        <player> belongs to this scheduler's game
+        """
+        self.unsubscribe(player._name)
+        self._players[player._name] = player
+        self._rows = None
+        self._dirty.add(player._name)
+
+    def unsubscribe(self, name: str) -> None:
+        """ Stop deciding for the player named <name>, and stop it counting
+        as seen by anyone.
+        Runtime: O(1)
+        """
+        if self._players.pop(name, None) is None:
+            return
+        self._rows = None
+        if name in self._where:
+            self._watchers([self._where[name]], self._dirty)
+            self._cells[self._cell(self._where.pop(name))].discard(name)
+        self._visions.pop(name, None)
+        self._seen.pop(name, None)
+        self._dirty.discard(name)
+
+    def touch(self, name: str) -> None:
+        """ Redo the decision of the player named <name> on the next tick.
+        Runtime: O(1)
+        """
+        if name in self._players:
+            self._dirty.add(name)
+
+    def tick(self) -> float:
+        """ Redo the decision of every subscribed player whose watched box
+        gained or lost a target or enemy, or who changed itself, since the
+        last tick. Return the fraction of players whose decision was skipped,
+        which is also appended to self.skipped.
+        Runtime: O(n) array operations, plus O(k) for k changed players and
+        the cells their watchers span
+        >>> from games import Tag
+        >>> from trees import QuadTree
+        >>> game = Tag(0, QuadTree((250, 250)), 60, 1, 10)
+        >>> scheduler = DecisionScheduler(game, 'box_direction')
+        >>> players = [Player(name, 10, 1, game, colour, location)
+        ...            for name, colour, location in
+        ...            (('it', 'purple', (100, 100)), ('a', 'green', (300, 300)),
+        ...             ('b', 'green', (400, 100)))]
+        >>> game._relations.add_rule('targets', 'purple', 'green')
+        >>> for player in players:
+        ...     game.field.insert(player._name, player._location)
+        ...     scheduler.subscribe(player)
+        >>> scheduler.tick()
+        0.0
+        >>> scheduler.tick()
+        1.0
+        >>> players[1]._location = (105, 95)
+        >>> game.field.remove('a')
+        >>> game.field.insert('a', (105, 95))
+        >>> round(scheduler.tick(), 2), players[0]._direction in ('N', 'E')
+        (0.33, True)
+        >>> players[2].set_speed(2)
+        >>> round(scheduler.tick(), 2)
+        0.67
+        """
+        self._sync()
+        dirty = self._dirty
+        self._dirty = set()
+        for name in dirty:
+            player = self._players[name]
+            self._seen[name] = self._look(name)
+            getattr(player, self._decide)()
+        total = len(self._players)
+        skipped = 1.0 - len(dirty) / total if total else 1.0
+        self.skipped.append(skipped)
+        return skipped
+
+    def _sync(self) -> None:
+        """ Compare the store columns of every subscribed player with the last
+        tick, and mark dirty every player whose decision may have changed.
+        """
+        store = self._game._store
+        candidates = set()
+        if self._rows is None:
+            self._rebuild(store, candidates)
+        columns = self._read(store, self._rows)
+        old = self._columns
+        self._columns = columns
+        changed = np.zeros(len(self._rows), dtype=bool)
+        for new_column, old_column in zip(columns, old):
+            changed |= new_column != old_column
+        rows = np.flatnonzero(changed)
+        now = [column[rows].tolist() for column in columns]
+        was = [column[rows].tolist() for column in old]
+        for i, x, y, colour, speed, vision, old_x, old_y, old_colour, \
+                old_speed, old_vision in zip(rows.tolist(), *now, *was):
+            name = self._names[i]
+            if vision != old_vision:
+                self._visions[name] = 0 if vision == NO_VALUE else vision
+                self._reach = max(self._reach, self._visions[name])
+            if colour != old_colour or speed != old_speed \
+                    or vision != old_vision:
+                self._dirty.add(name)
+            point = self._where.get(name)
+            points = [] if point is None else [point]
+            if x != old_x or y != old_y:
+                if point is not None:
+                    self._cells[self._cell(point)].discard(name)
+                    del self._where[name]
+                if x != NO_VALUE:
+                    self._place(name, (x, y))
+                    points.append((x, y))
+            elif colour == old_colour:
+                continue
+            watchers = {name}
+            self._watchers(points, watchers)
+            if colour != old_colour:
+                self._dirty |= watchers
+            else:
+                candidates |= watchers
+        for name in candidates - self._dirty:
+            if self._look(name) != self._seen.get(name):
+                self._dirty.add(name)
+
+    def _read(self, store: PlayerStore, rows: np.ndarray) \
+            -> Tuple[np.ndarray, ...]:
+        """ Return the columns of <store> compared between ticks, at <rows>.
+        """
+        return (store._xs[rows], store._ys[rows], store._colours[rows],
+                store._speeds[rows], store._visions[rows])
+
+    def _rebuild(self, store: PlayerStore, candidates: Set[str]) -> None:
+        """ Line the compared columns up with the players subscribed now.
+        Players that were already subscribed keep the values seen on the
+        last tick. New players start from their current values and are
+        placed on the grid, and everyone watching where they stand is added
+        to <candidates>.
+        """
+        position = {name: i for i, name in enumerate(self._names)}
+        self._names = list(self._players)
+        self._rows = np.array([self._players[name]._id
+                               for name in self._names], dtype=np.int64)
+        current = self._read(store, self._rows)
+        take = np.array([position.get(name, -1) for name in self._names],
+                        dtype=np.int64)
+        for i in np.flatnonzero(take < 0):
+            name = self._names[i]
+            vision = int(current[4][i])
+            self._visions[name] = 0 if vision == NO_VALUE else vision
+            self._reach = max(self._reach, self._visions[name])
+            if current[0][i] != NO_VALUE:
+                self._place(name, (int(current[0][i]), int(current[1][i])))
+                self._watchers([self._where[name]], candidates)
+        if self._columns is None or not len(self._columns[0]):
+            self._columns = current
+            return
+        self._columns = tuple(
+            np.where(take >= 0, old[np.maximum(take, 0)], new)
+            for old, new in zip(self._columns, current))
+
+    def _cell(self, point: Tuple[int, int]) -> Tuple[int, int]:
+        """ Return the grid cell holding <point>.
+        """
+        return point[0] // self._cell_size, point[1] // self._cell_size
+
+    def _place(self, name: str, point: Tuple[int, int]) -> None:
+        """ Record that the player named <name> stands at <point>.
+        """
+        self._where[name] = point
+        self._cells.setdefault(self._cell(point), set()).add(name)
+
+    def _near(self, box: Tuple[int, int, int, int]) -> List[str]:
+        """ Return the names of players in the cells <box> overlaps, a
+        superset of the players in <box>.
+        """
+        left, top = self._cell((box[0], box[1]))
+        right, bottom = self._cell((box[2], box[3]))
+        cells = self._cells
+        names = []
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                names.extend(cells.get((column, row), ()))
+        return names
+
+    def _watchers(self, points: List[Tuple[int, int]],
+                  found: Set[str]) -> None:
+        """ Add to <found> every player whose watched box holds one of
+        <points>, all found in one pass over the cells around them.
+        """
+        if not points:
+            return
+        reach = self._reach
+        box = (min(x for x, _ in points) - reach,
+               min(y for _, y in points) - reach,
+               max(x for x, _ in points) + reach,
+               max(y for _, y in points) + reach)
+        where = self._where
+        visions = self._visions
+        for name in self._near(box):
+            x, y = where[name]
+            vision = visions[name]
+            for point in points:
+                if abs(x - point[0]) <= vision \
+                        and abs(y - point[1]) <= vision:
+                    found.add(name)
+                    break
+
+    def _look(self, name: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """ Return the targets and the enemies of the player named <name>
+        standing in its watched box.
+        """
+        point = self._where.get(name)
+        if point is None:
+            return frozenset(), frozenset()
+        vision = self._visions[name]
+        inside = []
+        for other in self._near((point[0] - vision, point[1] - vision,
+                                 point[0] + vision, point[1] + vision)):
+            where = self._where[other]
+            if other != name and abs(where[0] - point[0]) <= vision \
+                    and abs(where[1] - point[1]) <= vision:
+                inside.append(other)
+        targets, enemies = self._players[name]._relations.split(name, inside)
+        return frozenset(targets), frozenset(enemies)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={'extra-imports': ['numpy', 'typing',
+                                                  'players']})
@@ -0,0 +1,556 @@
+from __future__ import annotations
+import multiprocessing
+from typing import Optional, List, Tuple, Dict, Set, Any
+import numpy as np
+from players import Player, PlayerStore, Relationships, NO_VALUE, \
+    field_bounds
+from trees import OutOfBoundsError
+
+DEFAULT_RADIUS = 1
+
+
+def game_players(game: Game) -> Dict[str, Player]:
+    """ Return every player of <game> by name, from whichever of _players,
+    _humans and _zombies the game keeps them in.
+    """
+    players = {}
+    for registry in ('_players', '_humans', '_zombies'):
+        players.update(getattr(game, registry, {}))
+    return players
+
+
+def _fit(column: np.ndarray, size: int, fill: int) -> np.ndarray:
+    """ Return <column> cut or padded with <fill> to <size> values.
+    """
+    if len(column) >= size:
+        return column[:size]
+    return np.concatenate((column,
+                           np.full(size - len(column), fill,
+                                   dtype=column.dtype)))
+
+
+class _Tile:
+    """ The game a worker plays its tile in, kept from tick to tick: a field
+    holding the tile's own players and its ghosts, and a store holding only
+    its own players.
+
+    A field holds one player per point, while a store lets players share
+    one, so only the first player on each point is put in the field. _at
+    lists the players on each point, and _shared the points with more than
+    one. A player that leaves the tile keeps its Player and its store row,
+    unplaced, for when it comes back.
+    """
+    field: Tree
+    _store: PlayerStore
+    _relations: Relationships
+    _bounds: Tuple[int, int, int, int]
+    _decide: str
+    _radius: int
+    _players: Dict[str, Player]
+    _own: Dict[str, Player]
+    _ids: Optional[np.ndarray]
+    _where: Dict[str, Optional[Tuple[int, int]]]
+    _at: Dict[Tuple[int, int], List[str]]
+    _shared: Set[Tuple[int, int]]
+
+    def __init__(self, field: Tree, bounds: Tuple[int, int, int, int],
+                 relations: Relationships, decide: str, radius: int) -> None:
+        """Initialize an empty tile playing on <field>, whose players move
+        within <bounds>, decide with the Player method named <decide> and
+        collide within <radius> of each other.
+        """
+        self.field = field
+        self._store = PlayerStore()
+        self._relations = relations
+        self._bounds = bounds
+        self._decide = decide
+        self._radius = radius
+        self._players = {}
+        self._own = {}
+        self._ids = None
+        self._where = {}
+        self._at = {}
+        self._shared = set()
+
+    def _place(self, name: str, point: Tuple[int, int]) -> None:
+        """ Stand the player named <name> on <point>, putting it in the field
+        if no one else stands there. A point outside the field is left out.
+        """
+        here = self._at.get(point)
+        if here is None:
+            try:
+                self.field.insert(name, point)
+            except OutOfBoundsError:
+                self._where[name] = None
+                return
+            self._at[point] = [name]
+        else:
+            here.append(name)
+            self._shared.add(point)
+        self._where[name] = point
+
+    def _lift(self, name: str) -> None:
+        """ Take the player named <name> off its point, putting the next
+        player standing there in the field in its place.
+        """
+        point = self._where.pop(name, None)
+        if point is None:
+            return
+        here = self._at[point]
+        first = here[0] == name
+        here.remove(name)
+        if len(here) < 2:
+            self._shared.discard(point)
+        if first:
+            self.field.remove(name)
+            if here:
+                self.field.insert(here[0], point)
+            else:
+                del self._at[point]
+
+    def tick(self, message: tuple) \
+            -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray,
+                     np.ndarray]:
+        """ Apply the changes in <message>, play one tick, and return the
+        collision pairs involving the tile's own players and their new x, y
+        and direction columns, in the order the coordinator keeps them.
+
+        <message> holds the names of own players that left, the names and
+        the x, y, speed, vision, colour and direction columns of own
+        players that joined or were changed by the game, the names of
+        ghosts that left the halo, the names and x, y and colour columns of
+        ghosts that joined it or moved, the game's colour names, and a new
+        copy of the game's Relationships or None. Joining players are kept
+        after the players that stayed, in the order they were sent.
+
+        Pairs are found on the positions the tick starts from. Every player
+        sharing a point collides with the others there, and with every
+        player found near the one standing for them. Then every own player
+        decides and all of them move at once, reflecting off the tile's
+        bounds.
+        """
+        left, owned, gone, ghosts, colour_names, relations = message
+        if relations is not None:
+            self._relations = relations
+            for player in self._players.values():
+                player._relations = relations
+        store = self._store
+        for name in left:
+            self._lift(name)
+            player = self._own.pop(name)
+            player._location = None
+        for name in gone:
+            self._lift(name)
+        if left:
+            self._ids = None
+        self._join(owned, colour_names)
+        names, xs, ys, colours = ghosts
+        for i, name in enumerate(names):
+            colour = colour_names[colours[i]]
+            self._lift(name)
+            self._relations.set_team(name, colour)
+            self.field.set_team(name, colour)
+            self._place(name, (int(xs[i]), int(ys[i])))
+        pairs = []
+        for point in self._shared:
+            here = self._at[point]
+            pairs.extend((here[j], here[k]) for j in range(len(here))
+                         for k in range(j + 1, len(here)))
+        at = self._at
+        where = self._where
+        for name1, name2 in self.field.find_pairs_within(self._radius):
+            pairs.extend((other1, other2)
+                         for other1 in at[where[name1]]
+                         for other2 in at[where[name2]])
+        own = self._own
+        pairs = [pair for pair in pairs if pair[0] in own or pair[1] in own]
+        if self._ids is None:
+            self._ids = np.fromiter((player._id for player in own.values()),
+                                    dtype=np.int64, count=len(own))
+        ids = self._ids
+        for player in own.values():
+            getattr(player, self._decide)()
+        old_xs = store._xs[ids]
+        old_ys = store._ys[ids]
+        store.move(self._bounds, ids)
+        new_xs = store._xs[ids]
+        new_ys = store._ys[ids]
+        self._follow(ids, old_xs, old_ys, new_xs, new_ys)
+        return pairs, new_xs, new_ys, store._directions[ids]
+
+    def _follow(self, ids: np.ndarray, old_xs: np.ndarray,
+                old_ys: np.ndarray, new_xs: np.ndarray,
+                new_ys: np.ndarray) -> None:
+        """ Bring the field up to date with the own players at <ids>, which
+        moved from <old_xs>, <old_ys> to <new_xs>, <new_ys>.
+
+        A player alone on its point moves in the field with one move_many
+        call, which only fails if its new point is taken. Every other player
+        is lifted off its point and placed on the new one.
+        """
+        names = self._store._names
+        at = self._at
+        where = self._where
+        moves = []
+        moving = []
+        others = []
+        for i in np.flatnonzero((new_xs != old_xs) | (new_ys != old_ys)):
+            name = names[ids[i]]
+            point = (int(new_xs[i]), int(new_ys[i]))
+            old = where.get(name)
+            if old is None or len(at[old]) > 1:
+                others.append((name, point))
+                continue
+            dx = point[0] - old[0]
+            dy = point[1] - old[1]
+            if dx:
+                moves.append((name, 'E' if dx > 0 else 'W', abs(dx)))
+            else:
+                moves.append((name, 'S' if dy > 0 else 'N', abs(dy)))
+            moving.append((name, old, point))
+        for (name, old, point), outcome in zip(
+                moving, self.field.move_many(moves)):
+            if isinstance(outcome, tuple):
+                del at[old]
+                at[point] = [name]
+                where[name] = point
+            else:
+                others.append((name, point))
+        for name, point in others:
+            self._lift(name)
+            self._place(name, point)
+
+    def _join(self, owned: tuple, colour_names: List[str]) -> None:
+        """ Take on the own players in <owned> that joined the tile, and
+        update the ones that were already its own.
+        """
+        names, xs, ys, speeds, visions, colours, directions = owned
+        store = self._store
+        for i, name in enumerate(names):
+            point = (int(xs[i]), int(ys[i]))
+            colour = colour_names[colours[i]]
+            player = self._players.get(name)
+            if player is None:
+                player = Player(
+                    name, None if visions[i] == NO_VALUE else int(visions[i]),
+                    None if speeds[i] == NO_VALUE else int(speeds[i]), self,
+                    colour, point)
+                self._players[name] = player
+            else:
+                self._lift(name)
+                row = player._id
+                store._xs[row], store._ys[row] = point
+                store._speeds[row] = speeds[i]
+                store._visions[row] = visions[i]
+                if player._colour != colour:
+                    player.set_colour(colour)
+            store._directions[player._id] = directions[i]
+            if name not in self._own:
+                self._own[name] = player
+                self._ids = None
+            self._place(name, point)
+
+
+def _work(connection: Any, kind: type, args: tuple,
+          bounds: Tuple[int, int, int, int], relations: Relationships,
+          decide: str, radius: int) -> None:
+    """ Play the ticks of one tile sent over <connection>, replying to each
+    with the result of _Tile.tick, until None is sent. The tile is kept
+    between ticks, so each message only carries what changed.
+    """
+    tile = _Tile(kind(*args), bounds, relations, decide, radius)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        connection.send(tile.tick(message))
+    connection.close()
+
+
+class ShardedSimulation:
+    """ Plays a game with its arena split into a grid of tiles, each played
+    by a worker process of its own.
+
+    A tile owns the players standing on it, and holds ghost copies of the
+    players of other tiles within the halo of its edges, so that decisions
+    and collisions near an edge see across it. Each worker keeps a field of
+    the game's field type and a store for its tile from tick to tick. Every
+    tick it finds the pairs colliding on its tile, decides directions for
+    its own players and moves them, and the coordinator, in this process,
+    writes the new positions back into the game's PlayerStore.
+
+    The coordinator remembers what each worker holds, and only sends the
+    players that joined or left a tile, or that the game changed between
+    ticks, and the ghosts that joined, left or moved. A player that has
+    crossed into another tile is owned by that tile on the next tick, which
+    is all a migration takes.
+
+    The coordinator owns everything that changes the game itself: it calls
+    handle_collision once for every pair found by any worker, after the
+    tick's moves, and check_for_winner at the end of run. The game's own
+    field is not kept up to date while the workers play. The workers get a
+    new copy of the game's Relationships on any tick after it changed.
+
+    The game's field may be a QuadTree, TwoDTree, GridField, ArrayQuadTree,
+    BucketQuadTree or LinearQuadTree. A worker needs set_team from its
+    field, for its own players and their ghosts, and builds it from the
+    field's centre or corners alone, so any other options of the game's
+    field take their defaults on the tiles.
+    """
+    _game: Game
+    _bounds: Tuple[int, int, int, int]
+    _columns: int
+    _rows: int
+    _halo: int
+    _relations_version: int
+    _players: Dict[str, Player]
+    _ids: np.ndarray
+    _owners: np.ndarray
+    _sent: Optional[Tuple[np.ndarray, ...]]
+    _held: Optional[Tuple[np.ndarray, ...]]
+    _owned: List[np.ndarray]
+    _ghosts: List[np.ndarray]
+    _connections: List[Any]
+    _processes: List[multiprocessing.Process]
+
+    def __init__(self, game: Game, columns: int, rows: int,
+                 decide: str = 'next_direction',
+                 radius: int = DEFAULT_RADIUS,
+                 halo: Optional[int] = None) -> None:
+        """Initialize a simulation of <game> over <columns> x <rows> tiles,
+        and start a worker process for each. Players decide with the Player
+        method named <decide> and collide within <radius> of each other.
+        The halo is <halo> wide, or as wide as the game's max_vision or
+        <radius>, whichever is larger, if not given.
+        Runtime: O(columns * rows) process starts
+
+        === precondition ===
+        columns >= 1 and rows >= 1
+        """
+        field = game.field
+        if hasattr(field, '_centre'):
+            args = (field._centre,)
+        else:
+            args = (field._nw, field._se)
+        if halo is None:
+            halo = max(getattr(game, 'max_vision', 0) or 0, radius)
+        self._game = game
+        self._bounds = field_bounds(field)
+        self._columns = columns
+        self._rows = rows
+        self._halo = halo
+        self._relations_version = game._relations._version
+        self._players = {}
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._owners = np.zeros(0, dtype=np.int64)
+        self._sent = None
+        self._held = None
+        self._owned = [np.zeros(0, dtype=np.int64)] * (columns * rows)
+        self._ghosts = [np.zeros(0, dtype=np.int64)] * (columns * rows)
+        self._connections = []
+        self._processes = []
+        for _ in range(columns * rows):
+            mine, theirs = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_work, daemon=True,
+                args=(theirs, type(field), args, self._bounds,
+                      game._relations, decide, radius))
+            process.start()
+            self._connections.append(mine)
+            self._processes.append(process)
+
+    def tile_bounds(self, tile: int) -> Tuple[int, int, int, int]:
+        """ Return the (left, top, right, bottom) region of the arena owned by
+        <tile>, counting tiles row by row from the north west.
+        Runtime: O(1)
+        """
+        left, top, right, bottom = self._bounds
+        width = right - left + 1
+        height = bottom - top + 1
+        column = tile % self._columns
+        row = tile // self._columns
+        return (left + column * width // self._columns,
+                top + row * height // self._rows,
+                left + (column + 1) * width // self._columns - 1,
+                top + (row + 1) * height // self._rows - 1)
+
+    def _tiles_of(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """ Return the tile owning each of the points <xs>, <ys>.
+        """
+        left, top, right, bottom = self._bounds
+        columns = (xs.astype(np.int64) - left) * self._columns \
+            // (right - left + 1)
+        rows = (ys.astype(np.int64) - top) * self._rows // (bottom - top + 1)
+        return np.clip(rows, 0, self._rows - 1) * self._columns \
+            + np.clip(columns, 0, self._columns - 1)
+
+    def tick(self) -> int:
+        """ Play one tick on every tile at once, then handle every collision
+        any tile found, and return how many pairs collided.
+        Runtime: O(n) array operations per tile, plus O(k) for the k players
+        and ghosts sent, plus each worker's tick
+        >>> from games import Tag
+        >>> from trees import QuadTree
+        >>> game = Tag(0, QuadTree((50, 50)), 60, 1, 10)
+        >>> game._players = {name: Player(name, 10, 1, game, 'green', point)
+        ...                  for name, point in (('a', (10, 10)),
+        ...                                      ('b', (45, 20)),
+        ...                                      ('c', (53, 20)))}
+        >>> for name, direction in zip('abc', 'EEW'):
+        ...     game._players[name]._direction = direction
+        >>> simulation = ShardedSimulation(game, 2, 1, decide='get_points',
+        ...                                radius=3)
+        >>> [simulation.tick() for _ in range(3)]
+        [0, 0, 0]
+        >>> [game._players[name]._location for name in 'abc']
+        [(13, 10), (48, 20), (50, 20)]
+        >>> simulation.tick(), game._players['b']._direction
+        (1, 'W')
+        >>> simulation.close()
+
+        A change to the game's relations reaches the workers on the next
+        tick, however it was made.
+
+        >>> game._players = {name: Player(name, 20, speed, game, 'green',
+        ...                               point)
+        ...                  for name, speed, point in
+        ...                  (('a', 1, (10, 10)), ('b', None, (10, 20)))}
+        >>> game._players['a']._direction = 'N'
+        >>> simulation = ShardedSimulation(game, 2, 1,
+        ...                                decide='nearest_direction')
+        >>> game._players['a'].select_target('b')
+        >>> _ = simulation.tick()
+        >>> game._players['a']._direction, game._players['a']._location
+        ('S', (10, 11))
+        >>> simulation.close()
+
+        Players that end a tick on the same point collide on the next one.
+
+        >>> game._players = {name: Player(name, 10, 1, game, 'green', point)
+        ...                  for name, point in (('a', (10, 10)),
+        ...                                      ('b', (12, 10)))}
+        >>> game._players['a']._direction = 'E'
+        >>> game._players['b']._direction = 'W'
+        >>> simulation = ShardedSimulation(game, 2, 1, decide='get_points',
+        ...                                radius=1)
+        >>> simulation.tick(), game._players['a']._location
+        (0, (11, 10))
+        >>> simulation.tick()
+        1
+        >>> simulation.close()
+        """
+        game = self._game
+        store = game._store
+        players = game_players(game)
+        if players != self._players:
+            self._players = players
+            self._ids = np.array([player._id for player in players.values()],
+                                 dtype=np.int64)
+        size = len(store)
+        columns = tuple(column[:size].copy() for column in (
+            store._xs, store._ys, store._speeds, store._visions,
+            store._colours, store._directions))
+        xs, ys, colours = columns[0], columns[1], columns[4]
+        playing = np.zeros(size, dtype=bool)
+        playing[self._ids] = True
+        placed = playing & (xs != NO_VALUE)
+        owners = np.where(placed, self._tiles_of(xs, ys), -1)
+        was = _fit(self._owners, size, -1)
+        if self._held is None:
+            changed = np.ones(size, dtype=bool)
+            moved = changed
+        else:
+            held = [_fit(column, size, NO_VALUE) for column in self._held]
+            changed = np.zeros(size, dtype=bool)
+            for column, old in zip(columns, held):
+                changed |= column != old
+            sent = [_fit(column, size, NO_VALUE) for column in self._sent]
+            moved = (xs != sent[0]) | (ys != sent[1]) | (colours != sent[2])
+        relations = None
+        if game._relations._version != self._relations_version:
+            relations = game._relations
+            self._relations_version = relations._version
+        names = store._names
+        for tile, connection in enumerate(self._connections):
+            left, top, right, bottom = self.tile_bounds(tile)
+            mine = owners == tile
+            owned = self._owned[tile]
+            staying = mine[owned]
+            joining = np.flatnonzero(mine & (was != tile))
+            send = np.concatenate((joining, np.flatnonzero(
+                mine & (was == tile) & changed)))
+            self._owned[tile] = np.concatenate((owned[staying], joining))
+            near = np.flatnonzero(
+                placed & ~mine
+                & (xs >= left - self._halo) & (xs <= right + self._halo)
+                & (ys >= top - self._halo) & (ys <= bottom + self._halo))
+            ghosts = self._ghosts[tile]
+            fresh = near[~np.isin(near, ghosts, assume_unique=True)
+                         | moved[near]]
+            gone = ghosts[~np.isin(ghosts, near, assume_unique=True)]
+            self._ghosts[tile] = near
+            connection.send((
+                [names[i] for i in owned[~staying]],
+                ([names[i] for i in send],) + tuple(column[send]
+                                                   for column in columns),
+                [names[i] for i in gone],
+                ([names[i] for i in fresh], xs[fresh], ys[fresh],
+                 colours[fresh]),
+                store._colour_names, relations))
+        self._owners = owners
+        self._sent = (xs, ys, colours)
+        self._held = tuple(column.copy() for column in columns)
+        pairs = set()
+        held_xs, held_ys = self._held[0], self._held[1]
+        held_directions = self._held[5]
+        for tile, connection in enumerate(self._connections):
+            found, new_xs, new_ys, directions = connection.recv()
+            mine = self._owned[tile]
+            store._xs[mine] = held_xs[mine] = new_xs
+            store._ys[mine] = held_ys[mine] = new_ys
+            store._directions[mine] = held_directions[mine] = directions
+            pairs.update(tuple(sorted(pair)) for pair in found)
+        handled = 0
+        for player1, player2 in sorted(pairs):
+            players = game_players(game)
+            if player1 in players and player2 in players:
+                game.handle_collision(player1, player2)
+                handled += 1
+        return handled
+
+    def run(self, ticks: int) -> Optional[str]:
+        """ Play <ticks> ticks, and return what the game's check_for_winner
+        says afterwards.
+        Runtime: O(ticks) ticks
+        >>> from games import Tag
+        >>> from arraytree import ArrayQuadTree
+        >>> game = Tag(10, ArrayQuadTree((250, 250)), 60, 1, 10)
+        >>> simulation = ShardedSimulation(game, 2, 2)
+        >>> _ = simulation.run(3)
+        >>> simulation.close()
+        >>> all(0 <= x <= 500 and 0 <= y <= 500
+        ...     for x, y in (p._location for p in game._players.values()))
+        True
+        """
+        for _ in range(ticks):
+            self.tick()
+        return self._game.check_for_winner()
+
+    def close(self) -> None:
+        """ Stop every worker process.
+        Runtime: O(columns * rows)
+        """
+        for connection in self._connections:
+            connection.send(None)
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={'extra-imports': ['multiprocessing', 'numpy',
+                                                  'typing', 'players',
+                                                  'trees']})
@@ -1,5 +1,21 @@
 from __future__ import annotations
-from typing import Optional, List, Tuple, Dict
+import copy
+import heapq
+import math
+import mmap
+import struct
+import sys
+from array import array
+from itertools import accumulate
+from typing import Optional, List, Tuple, Dict, Set, Union
+
+DEFAULT_VERSION_WINDOW = 64
+SNAPSHOT_MAGIC = b'FLD1'
+QUADTREE_SNAPSHOT = 1
+TWODTREE_SNAPSHOT = 2
+# magic, kind, nodes, players, teams, bounds (left, top, right, bottom),
+# bytes in the string table, alpha (NaN for None); little-endian
+_SNAPSHOT_HEADER = struct.Struct('<4s9id')
 
 
 class OutOfBoundsError(Exception):
@@ -10,7 +26,7 @@ class Tree:
     def __contains__(self, name: str) -> bool:
         """ Return True if a player named <name> is stored in this tree.
 
-        Runtime: O(n)
+        Runtime: O(1)
         """
         raise NotImplementedError
 
@@ -38,7 +54,7 @@ class Tree:
     def remove(self, name: str) -> None:
         """ Remove information about a player named <name> from this tree.
 
-        Runtime: O(n)
+        Runtime: O(log(n))
         """
         raise NotImplementedError
 
@@ -62,7 +78,7 @@ class Tree:
         same coordinates of another player in the Tree (before moving the
         player).
 
-        Runtime: O(n)
+        Runtime: O(log(n))
 
         === precondition ===
         direction in ['N', 'S', 'E', 'W']
@@ -96,6 +112,33 @@ class Tree:
         """
         raise NotImplementedError
 
+    def move_many(self, moves: List[Tuple[str, str, int]]) \
+            -> List[Union[Tuple[int, int], OutOfBoundsError, None]]:
+        """ Make each (name, direction, steps) move of <moves> in order, as
+        move(name, direction, steps) would, and return the outcome of each:
+        the player's new location, None if there is no player named <name>,
+        or the OutOfBoundsError move would have raised. A failed move does
+        not stop the moves after it.
+
+        Trees check every destination before they change, in one pass over
+        a set of the occupied points instead of a search per move.
+
+        Runtime: O(n + m log(n)) for m moves
+
+        === precondition ===
+        every direction in ['N', 'S', 'E', 'W']
+        """
+        raise NotImplementedError
+
+    def move_stats(self) -> Dict[str, int]:
+        """ Return the number of successful moves made in this tree under
+        'moves', and how many of those updated the player's node in place
+        without reorganizing the tree under 'in_place'.
+
+        Runtime: O(1)
+        """
+        raise NotImplementedError
+
     def names_in_range(self, point: Tuple[int, int], direction: str,
                        distance: int) -> List[str]:
         """ Return a list of names of players whose location is in the <dir
@@ -111,20 +154,131 @@ class Tree:
         corners at:
         (100, 100) (110, 100) (100, 110) (110, 110)
 
-        Runtime: faster than O(n) when distance is small
+        The direction 'ALL' searches the whole box around <point>, reaching
+        <distance> in every direction.
+
+        Runtime: O(log(n) + k) for k names found when distance is small
+
+        === precondition ===
+        direction in ['NE', 'SE', 'NE', 'SW', 'ALL']
+        """
+        raise NotImplementedError
+
+    def names_in_range_many(self, queries: List[Tuple[Tuple[int, int], str,
+                                                      int]]) \
+            -> List[List[str]]:
+        """ Return, for each (point, direction, distance) query in <queries>,
+        the list names_in_range(point, direction, distance) would return.
+        Results are in the same order as <queries>.
+
+        All queries are answered in a single traversal of the tree: each
+        subtree is visited once, with only the queries that can reach it.
+
+        Runtime: faster than len(queries) separate names_in_range calls
+
+        === precondition ===
+        every direction in ['NE', 'SE', 'NE', 'SW']
+        """
+        raise NotImplementedError
+
+    def nearest(self, point: Tuple[int, int], k: int = 1,
+                include: Optional[Set[str]] = None) \
+            -> List[Tuple[str, float]]:
+        """ Return (name, distance) pairs for the <k> players closest to
+        <point>, nearest first, counting only players named in <include> if
+        it is given. Distances are straight-line distances. A player standing
+        at <point> itself is included, at distance 0.
+
+        Runtime: O(log(n) + k) typical
+
+        === precondition ===
+        k >= 0
+        """
+        raise NotImplementedError
+
+    def find_pairs_within(self, radius: int) -> List[Tuple[str, str]]:
+        """ Return a (name, name) pair for every two players in this tree
+        whose straight-line distance apart is at most <radius>. Each pair
+        appears once, in no particular order.
+
+        The tree is joined with itself in one traversal, so parts of the
+        field further apart than <radius> are never compared.
+
+        Runtime: O(n + k) typical for k pairs and a small radius
+
+        === precondition ===
+        radius >= 0
+        """
+        raise NotImplementedError
+
+    def set_team(self, name: str, team: Optional[str]) -> None:
+        """ Record that the player named <name> plays for <team>, whether or
+        not it is in this tree yet. The team is kept if the player is
+        removed, and is used again if it is inserted later. Players never
+        given a team count under None.
+
+        Runtime: O(log(n))
+        """
+        raise NotImplementedError
+
+    def count_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> Dict[Optional[str], int]:
+        """ Return how many of the players names_in_range(<point>,
+        <direction>, <distance>) would list play for each team, leaving out
+        teams with no such player.
+
+        Runtime: O(log(n)) for each node on the edge of the box
 
         === precondition ===
         direction in ['NE', 'SE', 'NE', 'SW']
         """
         raise NotImplementedError
 
-    def size(self) -> int:
-        """ Return the number of nodes in <self>
+    def snapshot(self) -> int:
+        """ Save the current state of this tree as a new version and return
+        its number. Later changes copy the nodes they touch instead of
+        changing the ones the saved versions share, and only the newest
+        versions, up to the tree's version window, are kept.
+
+        Runtime: O(t) for the t players given a team
+        """
+        raise NotImplementedError
+
+    def version(self, number: int) -> Optional[Tree]:
+        """ Return the tree as it was when snapshot returned <number>, or None
+        if that version is no longer kept. A version answers queries that
+        walk its nodes, such as names_in_range, contains_point and
+        count_in_range, and must not be changed.
+
+        Runtime: O(1)
+        """
+        raise NotImplementedError
+
+    def dump(self, path: str) -> None:
+        """ Save every player in this tree, with its location and team, to the
+        file at <path> in the snapshot format read by load.
 
         Runtime: O(n)
         """
         raise NotImplementedError
 
+    @classmethod
+    def load(cls, path: str) -> Tree:
+        """ Return a new tree holding the players saved at <path> by dump.
+
+        Raise a ValueError if the file is not a snapshot of this kind of tree.
+
+        Runtime: O(n log(n))
+        """
+        raise NotImplementedError
+
+    def size(self) -> int:
+        """ Return the number of players in <self>
+
+        Runtime: O(1)
+        """
+        raise NotImplementedError
+
     def height(self) -> int:
         """ Return the height of <self>
 
@@ -132,7 +286,7 @@ class Tree:
         ot of this
         tree to the node at the greatest depth in this tree.
 
-        Runtime: O(n)
+        Runtime: O(1)
         """
         raise NotImplementedError
 
@@ -162,16 +316,268 @@ class Tree:
 
 
 def directions(centre: Tuple[int, int], point: Tuple[int, int]) -> int:
+    """ Return the quadrant of <centre> that <point> falls in: 1 for NE, 2 for
+    NW, 3 for SW and 4 for SE. Points on the centre lines belong to the
+    western and northern quadrants.
+    """
     if point[0] > centre[0] and point[1] > centre[1]:
         return 4
-    elif point[0] >= centre[0] and point[1] <= centre[1]:
+    elif point[0] > centre[0]:
         return 1
-    elif point[0] <= centre[0] and point[1] >= centre[1]:
+    elif point[1] > centre[1]:
         return 3
     else:
         return 2
 
 
+def quadrant_bounds(bounds: Tuple[int, int, int, int],
+                    centre: Tuple[int, int],
+                    quadrant: int) -> Tuple[int, int, int, int]:
+    """ Return the (left, top, right, bottom) region covered by <quadrant> of
+    the region <bounds> split at <centre>.
+
+    >>> quadrant_bounds((0, 0, 200, 200), (100, 100), 4)
+    (101, 101, 200, 200)
+    >>> quadrant_bounds((0, 0, 200, 200), (100, 100), 2)
+    (0, 0, 100, 100)
+    """
+    left, top, right, bottom = bounds
+    if quadrant in (1, 4):
+        left = centre[0] + 1
+    else:
+        right = centre[0]
+    if quadrant in (3, 4):
+        top = centre[1] + 1
+    else:
+        bottom = centre[1]
+    return left, top, right, bottom
+
+
+def range_box(point: Tuple[int, int], direction: str,
+              distance: int) -> Tuple[int, int, int, int]:
+    """ Return the (left, top, right, bottom) box searched by
+    names_in_range(<point>, <direction>, <distance>). The direction 'ALL'
+    gives the whole box reaching <distance> in every direction.
+
+    >>> range_box((100, 100), 'SE', 10)
+    (100, 100, 110, 110)
+    >>> range_box((100, 100), 'NW', 10)
+    (90, 90, 100, 100)
+    >>> range_box((100, 100), 'ALL', 10)
+    (90, 90, 110, 110)
+    """
+    if direction == 'ALL':
+        return (point[0] - distance, point[1] - distance,
+                point[0] + distance, point[1] + distance)
+    if direction in ('NE', 'SE'):
+        left, right = point[0], point[0] + distance
+    else:
+        left, right = point[0] - distance, point[0]
+    if direction in ('SE', 'SW'):
+        top, bottom = point[1], point[1] + distance
+    else:
+        top, bottom = point[1] - distance, point[1]
+    return left, top, right, bottom
+
+
+def step_point(point: Tuple[int, int], direction: str,
+               steps: int) -> Tuple[int, int]:
+    """ Return the point <steps> steps away from <point> in <direction>.
+
+    >>> step_point((50, 50), 'N', 10)
+    (50, 40)
+    >>> step_point((50, 50), 'E', 10)
+    (60, 50)
+    """
+    if direction == 'N':
+        return point[0], point[1] - steps
+    elif direction == 'S':
+        return point[0], point[1] + steps
+    elif direction == 'E':
+        return point[0] + steps, point[1]
+    return point[0] - steps, point[1]
+
+
+def in_box(box: Tuple[int, int, int, int], point: Tuple[int, int]) -> bool:
+    """ Return True if <point> lies inside <box>, edges included.
+    """
+    return box[0] <= point[0] <= box[2] and box[1] <= point[1] <= box[3]
+
+
+def boxes_overlap(a: Tuple[int, int, int, int],
+                  b: Tuple[int, int, int, int]) -> bool:
+    """ Return True if the boxes <a> and <b> share at least one point.
+    """
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def box_contains(outer: Tuple[int, int, int, int],
+                 inner: Tuple[int, int, int, int]) -> bool:
+    """ Return True if every point of the box <inner> lies in <outer>.
+
+    >>> box_contains((0, 0, 10, 10), (2, 3, 10, 4))
+    True
+    >>> box_contains((0, 0, 10, 10), (2, 3, 11, 4))
+    False
+    """
+    return outer[0] <= inner[0] and inner[2] <= outer[2] \
+        and outer[1] <= inner[1] and inner[3] <= outer[3]
+
+
+def boxes_distance2(a: Tuple[int, int, int, int],
+                    b: Tuple[int, int, int, int]) -> int:
+    """ Return the squared distance between the closest points of the boxes
+    <a> and <b>, which is 0 if they overlap.
+
+    >>> boxes_distance2((0, 0, 10, 10), (13, 14, 20, 20))
+    25
+    >>> boxes_distance2((0, 0, 10, 10), (5, 5, 20, 20))
+    0
+    """
+    dx = max(a[0] - b[2], 0, b[0] - a[2])
+    dy = max(a[1] - b[3], 0, b[1] - a[3])
+    return dx * dx + dy * dy
+
+
+def box_distance2(box: Tuple[int, int, int, int],
+                  point: Tuple[int, int]) -> int:
+    """ Return the squared distance from <point> to the closest point of
+    <box>, which is 0 if <point> lies in <box>.
+
+    >>> box_distance2((0, 0, 10, 10), (13, 14))
+    25
+    >>> box_distance2((0, 0, 10, 10), (5, 5))
+    0
+    """
+    dx = max(box[0] - point[0], 0, point[0] - box[2])
+    dy = max(box[1] - point[1], 0, point[1] - box[3])
+    return dx * dx + dy * dy
+
+
+def nearest_by_name(index: Dict[str, Tuple[int, int]],
+                    point: Tuple[int, int], k: int,
+                    include: Set[str]) -> List[Tuple[str, float]]:
+    """ Return what nearest(<point>, <k>, <include>) returns, by looking up
+    each name of <include> in the name <index> instead of searching a tree.
+    This is the cheaper way when <include> is small.
+
+    >>> nearest_by_name({'a': (0, 0), 'b': (3, 4), 'c': (1, 0)}, (0, 0), 2,
+    ...                 {'b', 'c', 'd'})
+    [('c', 1.0), ('b', 5.0)]
+    """
+    found = []
+    for name in include:
+        spot = index.get(name)
+        if spot is not None:
+            found.append(((spot[0] - point[0]) ** 2
+                          + (spot[1] - point[1]) ** 2, name))
+    return [(name, math.sqrt(d2)) for d2, name in heapq.nsmallest(k, found)]
+
+
+def plan_moves(index: Dict[str, Tuple[int, int]],
+               bounds: Tuple[int, int, int, int],
+               moves: List[Tuple[str, str, int]]) \
+        -> Tuple[List[Union[Tuple[int, int], OutOfBoundsError, None]],
+                 List[Tuple[str, Tuple[int, int], Tuple[int, int]]]]:
+    """ Return the outcome of each (name, direction, steps) move of <moves>,
+    made in order on the players of the name <index> inside <bounds>, and
+    the (name, old point, new point) steps of the moves that succeed.
+
+    An outcome is the player's new location, None for a name not in
+    <index>, or an OutOfBoundsError for a move that would leave <bounds> or
+    land on another player. Every destination is checked against one set of
+    occupied points, which each successful move updates, so no tree is
+    searched and a later move may take a spot an earlier one left.
+
+    Runtime: O(n + m) for n players and m moves
+
+    >>> outcomes, steps = plan_moves({'a': (0, 0), 'b': (1, 0)},
+    ...                              (0, 0, 9, 9),
+    ...                              [('a', 'E', 1), ('b', 'E', 1),
+    ...                               ('a', 'E', 1), ('a', 'N', 1),
+    ...                               ('c', 'S', 1)])
+    >>> outcomes[0], outcomes[3]
+    (OutOfBoundsError('occupied'), OutOfBoundsError('out of bounds'))
+    >>> outcomes[1], outcomes[2], outcomes[4]
+    ((2, 0), (1, 0), None)
+    >>> steps
+    [('b', (1, 0), (2, 0)), ('a', (0, 0), (1, 0))]
+    """
+    occupied = set(index.values())
+    moved = {}
+    outcomes = []
+    steps = []
+    for name, direction, count in moves:
+        point = moved.get(name)
+        if point is None:
+            point = index.get(name)
+            if point is None:
+                outcomes.append(None)
+                continue
+        new = step_point(point, direction, count)
+        if not in_box(bounds, new):
+            outcomes.append(OutOfBoundsError('out of bounds'))
+        elif new in occupied:
+            outcomes.append(OutOfBoundsError('occupied'))
+        else:
+            occupied.discard(point)
+            occupied.add(new)
+            moved[name] = new
+            outcomes.append(new)
+            steps.append((name, point, new))
+    return outcomes, steps
+
+
+def _keep_nearest(best: List[Tuple[int, str]], k: int, tree: Tree,
+                  point: Tuple[int, int], include: Optional[Set[str]]) -> None:
+    """ Offer the player stored at the node <tree> to <best>, a heap of at
+    most <k> (negated squared distance, name) pairs holding the players
+    nearest to <point> found so far, if <include> allows it.
+    """
+    if include is not None and tree._name not in include:
+        return
+    spot = tree._point
+    d2 = (spot[0] - point[0]) ** 2 + (spot[1] - point[1]) ** 2
+    if len(best) < k:
+        heapq.heappush(best, (-d2, tree._name))
+    elif d2 < -best[0][0]:
+        heapq.heapreplace(best, (-d2, tree._name))
+
+
+def _sorted_nearest(best: List[Tuple[int, str]]) -> List[Tuple[str, float]]:
+    """ Return the (name, distance) pairs of the heap <best> built by
+    _keep_nearest, nearest first.
+    """
+    return [(name, math.sqrt(-d2)) for d2, name in
+            sorted(best, key=lambda item: (-item[0], item[1]))]
+
+
+def _split_index(ordered: List[Tuple[str, Tuple[int, int]]],
+                 axis: int) -> int:
+    """ Return the position in <ordered>, a list of items sorted along <axis>,
+    of the item to split on so that the items up to it go to _lt and the rest
+    to _gt. Every item sharing the split coordinate must end up in _lt, so the
+    split is either the last item of the run around the median that shares
+    its coordinate or the item just before that run, whichever leaves the
+    two sides closer in size.
+    >>> _split_index([('a', (1, 0)), ('b', (2, 0)), ('c', (3, 0))], 0)
+    1
+    >>> _split_index([('a', (0, 0)), ('b', (1, 0)), ('c', (2, 0)),
+    ...               ('d', (2, 1)), ('e', (2, 2))], 0)
+    1
+    """
+    n = len(ordered)
+    low = high = n // 2
+    value = ordered[high][1][axis]
+    while high + 1 < n and ordered[high + 1][1][axis] == value:
+        high += 1
+    while low > 0 and ordered[low - 1][1][axis] == value:
+        low -= 1
+    if low > 0 and max(low - 1, n - low) < max(high, n - 1 - high):
+        return low - 1
+    return high
+
+
 def checksub(tre: QuadTree) -> int:
     if tre._ne is not None:
         return 1
@@ -183,10 +589,132 @@ def checksub(tre: QuadTree) -> int:
         return 4
 
 
-insertcount = 0
-insert1 = 0
-insert2 = 0
-checkheight = 0
+def add_teams(total: Dict[Optional[str], int],
+               teams: Dict[Optional[str], int]) -> None:
+    """ Add the per-team counts <teams> into <total>.
+    """
+    for team, count in teams.items():
+        total[team] = total.get(team, 0) + count
+
+
+def shift_team(teams: Dict[Optional[str], int], old: Optional[str],
+                new: Optional[str]) -> None:
+    """ Move one player from <old> to <new> in the per-team counts <teams>.
+    """
+    if teams[old] == 1:
+        del teams[old]
+    else:
+        teams[old] -= 1
+    teams[new] = teams.get(new, 0) + 1
+
+
+def _count_insert(path: List[Tree], team: Optional[str]) -> None:
+    """ Update the stored size, height and team counts of every node in
+    <path>, a list of nodes from the root down, after one player of <team>
+    was added below the last.
+    """
+    height = 1
+    for node in reversed(path):
+        node._size += 1
+        node._teams[team] = node._teams.get(team, 0) + 1
+        height += 1
+        if node._height < height:
+            node._height = height
+        else:
+            height = node._height
+
+
+def _write_snapshot(path: str, kind: int, bounds: Tuple[int, int, int, int],
+                    alpha: Optional[float], shape: array,
+                    items: List[Tuple[str, Tuple[int, int]]],
+                    team_of: Dict[str, Optional[str]]) -> None:
+    """ Write a snapshot of a tree of <kind> covering <bounds> to <path>: the
+    one-byte <shape> code of every node in preorder and the (name, point)
+    <items> in the order the nodes hold them, with their teams from
+    <team_of>.
+
+    After the header and the shape codes come five packed int32 arrays: the
+    x and y coordinates, each player's team number (-1 for None), the end
+    offset of each name and the end offset of each team name in the string
+    table, which follows.
+    """
+    names = [name for name, _ in items]
+    team_names = []
+    numbers = {}
+    team_ids = array('i')
+    for name in names:
+        team = team_of.get(name)
+        if team is None:
+            team_ids.append(-1)
+        else:
+            if team not in numbers:
+                numbers[team] = len(team_names)
+                team_names.append(team)
+            team_ids.append(numbers[team])
+    name_ends = array('i', accumulate(map(len, names)))
+    team_ends = array('i', accumulate(map(len, team_names),
+                                      initial=name_ends[-1] if names else 0))
+    del team_ends[0]
+    table = (''.join(names) + ''.join(team_names)).encode('utf-8')
+    header = _SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, kind, len(shape), len(names), len(team_names),
+        *bounds, len(table), math.nan if alpha is None else alpha)
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.write(shape.tobytes())
+        for column in (array('i', [point[0] for _, point in items]),
+                       array('i', [point[1] for _, point in items]),
+                       team_ids, name_ends, team_ends):
+            if sys.byteorder == 'big':
+                column.byteswap()
+            file.write(column.tobytes())
+        file.write(table)
+
+
+def _read_snapshot(path: str, kind: int) \
+        -> Tuple[Tuple[int, int, int, int], Optional[float], array,
+                 List[Tuple[str, Tuple[int, int]]], Dict[str, str]]:
+    """ Return the bounds, alpha, node shape codes, (name, point) items and
+    teams stored in the snapshot of a tree of <kind> at <path>.
+
+    The file is memory-mapped and each array is copied out in one piece, so
+    the only per-player work is slicing names out of the string table.
+
+    Raise a ValueError if <path> is not a snapshot of a tree of <kind>.
+    """
+    with open(path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < _SNAPSHOT_HEADER.size:
+            raise ValueError('not a field snapshot')
+        magic, stored_kind, node_count, count, team_count, left, top, \
+            right, bottom, table_size, alpha = \
+            _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or stored_kind != kind:
+            raise ValueError('not a snapshot of this kind of field')
+        offset = _SNAPSHOT_HEADER.size
+        shape = array('b')
+        shape.frombytes(data[offset:offset + node_count])
+        offset += node_count
+        columns = []
+        for length in (count, count, count, count, team_count):
+            column = array('i')
+            column.frombytes(data[offset:offset + 4 * length])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns.append(column)
+            offset += 4 * length
+        table = data[offset:offset + table_size].decode('utf-8')
+    xs, ys, team_ids, name_ends, team_ends = columns
+    names = [table[start:end] for start, end in
+             zip([0] + name_ends[:-1].tolist(), name_ends)]
+    team_names = [table[start:end] for start, end in
+                  zip([name_ends[-1] if count else 0]
+                      + team_ends[:-1].tolist(), team_ends)]
+    items = list(zip(names, zip(xs, ys)))
+    teams = {name: team_names[number]
+             for name, number in zip(names, team_ids) if number >= 0}
+    return (left, top, right, bottom), \
+        None if math.isnan(alpha) else alpha, shape, items, teams
 
 
 class QuadTree(Tree):
@@ -197,9 +725,21 @@ class QuadTree(Tree):
     _nw: Optional[QuadTree]
     _se: Optional[QuadTree]
     _sw: Optional[QuadTree]
-
-    def __init__(self, centre: Tuple[int, int]) -> None:
+    _size: int
+    _height: int
+    _teams: Dict[Optional[str], int]
+    _team_of: Dict[str, Optional[str]]
+    _index: Dict[str, Tuple[int, int]]
+    _moves: int
+    _in_place_moves: int
+    _epoch: int
+    _window: int
+    _versions: Dict[int, QuadTree]
+
+    def __init__(self, centre: Tuple[int, int],
+                 window: int = DEFAULT_VERSION_WINDOW) -> None:
         """Initialize a new QuadTree instance
+        <window> is the number of versions saved by snapshot that are kept.
         Runtime: O(1)
         """
         self._centre = centre
@@ -209,6 +749,46 @@ class QuadTree(Tree):
         self._nw = None
         self._sw = None
         self._name = None
+        self._size = 0
+        self._height = 0
+        self._teams = {}
+        self._team_of = {}
+        self._index = {}
+        self._moves = 0
+        self._in_place_moves = 0
+        self._epoch = 0
+        self._window = window
+        self._versions = {}
+
+    def _new_node(self, bounds: Tuple[int, int, int, int]) -> QuadTree:
+        """ Return a new empty node centred in the region <bounds>, belonging
+        to the same tree and version as <self>.
+        """
+        node = QuadTree(((bounds[0] + bounds[2]) // 2,
+                         (bounds[1] + bounds[3]) // 2))
+        node._team_of = self._team_of
+        node._epoch = self._epoch
+        return node
+
+    def _copy(self, epoch: int) -> QuadTree:
+        """ Return a copy of the node <self> for version <epoch>, sharing its
+        children.
+        """
+        node = copy.copy(self)
+        node._teams = dict(self._teams)
+        node._epoch = epoch
+        return node
+
+    def _own_child(self, quadrant: int) -> Optional[QuadTree]:
+        """ Return the child of <self> in <quadrant>, first swapping in a copy
+        of it if a saved version shares it, so that it can be changed.
+        <self> must not be shared.
+        """
+        child = self._child(quadrant)
+        if child is not None and child._epoch != self._epoch:
+            child = child._copy(self._epoch)
+            self._set_child(quadrant, child)
+        return child
 
     def countsub(self) -> int:
         count = 0
@@ -222,32 +802,74 @@ class QuadTree(Tree):
             count += 1
         return count
 
+    def _counts(self) -> Tuple[int, int]:
+        """ Return the size and height of <self> worked out from its own point
+        and the stored counts of its children.
+        """
+        if self._point is not None:
+            return 1, 1
+        size = 0
+        height = 0
+        for child in (self._ne, self._nw, self._sw, self._se):
+            if child is not None:
+                size += child._size
+                height = max(height, child._height)
+        return size, height + 1 if size else 0
+
+    def _team_counts(self) -> Dict[Optional[str], int]:
+        """ Return the per-team player counts of <self> worked out from its
+        own point and the stored counts of its children.
+        """
+        if self._point is not None:
+            return {self._team_of.get(self._name): 1}
+        teams = {}
+        for child in (self._ne, self._nw, self._sw, self._se):
+            if child is not None:
+                add_teams(teams, child._teams)
+        return teams
+
+    def _recount(self) -> None:
+        """ Refresh the stored size, height and team counts of <self> after
+        one of its children changed.
+        """
+        self._size, self._height = self._counts()
+        self._teams = self._team_counts()
+
+    def _child(self, quadrant: int) -> Optional[QuadTree]:
+        """ Return the child of <self> in <quadrant>, as numbered by
+        directions().
+        """
+        if quadrant == 1:
+            return self._ne
+        elif quadrant == 2:
+            return self._nw
+        elif quadrant == 3:
+            return self._sw
+        return self._se
+
+    def _set_child(self, quadrant: int, tree: Optional[QuadTree]) -> None:
+        """ Replace the child of <self> in <quadrant> with <tree>.
+        """
+        if quadrant == 1:
+            self._ne = tree
+        elif quadrant == 2:
+            self._nw = tree
+        elif quadrant == 3:
+            self._sw = tree
+        else:
+            self._se = tree
+
     def __contains__(self, name: str) -> bool:
         """ Return True if a player named <name> is stored in this tree.
-        Runtime: O(n)
+        Runtime: O(1)
         >>> q = QuadTree((50, 50))
-        >>> q._name = "Eric"
+        >>> q.insert("Eric", (60, 60))
         >>> q.__contains__("Eric")
         True
+        >>> q.__contains__("Joe")
+        False
         """
-        if self.is_empty():
-            return False
-        elif self._name == name:
-            return True
-        else:
-            if self._se is not None:
-                if self._se.__contains__(name):
-                    return True
-            if self._ne is not None:
-                if self._ne.__contains__(name):
-                    return True
-            if self._sw is not None:
-                if self._sw.__contains__(name):
-                    return True
-            if self._nw is not None:
-                if self._nw.__contains__(name):
-                    return True
-        return False
+        return name in self._index
 
     def contains_point(self, point: Tuple[int, int]) -> bool:
         """ Return True if a player at location <point> is stored in this tree.
@@ -257,67 +879,32 @@ class QuadTree(Tree):
         >>> q.contains_point((60, 60))
         True
         """
-        if self.is_empty():
-            return False
-        elif self._point == point:
-            return True
-        else:
-            if self._se is not None:
-                if point[0] >= self._centre[0] and point[1] >= self._centre[1]:
-                    return self._se.contains_point(point)
-            if self._ne is not None:
-                if point[0] >= self._centre[0] and point[1] <= self._centre[1]:
-                    return self._ne.contains_point(point)
-            if self._sw is not None:
-                if point[0] <= self._centre[0] and point[1] >= self._centre[1]:
-                    return self._sw.contains_point(point)
-            if self._nw is not None:
-                if point[0] <= self._centre[0] and point[1] <= self._centre[1]:
-                    return self._nw.contains_point(point)
-        return False
+        tree = self
+        while tree._point is None:
+            tree = tree._child(directions(tree._centre, point))
+            if tree is None:
+                return False
+        return tree._point == point
 
-    def getpoint(self, name: str) -> Tuple[int, int]:
-        if self.is_empty():
-            pass
-        elif self._name == name:
-            return self._point
-        else:
-            a = None
-            b = None
-            c = None
-            d = None
-            if self._ne is not None:
-                a = self._ne.getpoint(name)
-            if self._se is not None:
-                b = self._se.getpoint(name)
-            if self._nw is not None:
-                c = self._nw.getpoint(name)
-            if self._sw is not None:
-                d = self._sw.getpoint(name)
-            if a is not None:
-                return a
-            elif b is not None:
-                return b
-            elif c is not None:
-                return c
-            elif d is not None:
-                return d
-            else:
-                pass
+    def getpoint(self, name: str) -> Optional[Tuple[int, int]]:
+        """ Return the location of the player named <name>, or None if there
+        is no such player in this tree.
+        Runtime: O(1)
+        >>> q = QuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.getpoint("Eric")
+        (150, 150)
+        """
+        return self._index.get(name)
 
-    def getname(self, point: Tuple[int, int]) -> str:
-        if self.is_empty():
-            return None
-        elif self._point == point:
-            return self._name
-        elif point[0] > self._point[0] and point[1] > self._point[1]:
-            return self._se.getname(point)
-        elif point[0] > self._point[0] and point[1] < self._point[1]:
-            return self._ne.getname(point)
-        elif point[0] < self._point[0] and point[1] > self._point[1]:
-            return self._sw.getname(point)
-        elif point[0] < self._point[0] and point[1] < self._point[1]:
-            return self._nw.getname(point)
+    def getname(self, point: Tuple[int, int]) -> Optional[str]:
+        tree = self
+        while tree._point is None:
+            tree = tree._child(directions(tree._centre, point))
+            if tree is None:
+                return None
+        if tree._point == point:
+            return tree._name
         return None
 
     def insert(self, name: str, point: Tuple[int, int]) -> None:
@@ -332,149 +919,66 @@ class QuadTree(Tree):
         >>> q.insert("Eric", (150, 150))
         >>> q.contains_point((150, 150))
         True
+        >>> q.insert("Joe", (160, 160))
+        >>> q.contains_point((150, 150)) and q.contains_point((160, 160))
+        True
         """
-        global insertcount
-        global insert2
-        global insert1
-        checkup = insertcount
-        if checkup == 0:
-            insertcount += 1
-            insert1 = self._centre[0]
-            insert2 = self._centre[1]
-        if checkup == 0:
-            step = self._centre[0] // 2
-        else:
-            step = min(self._centre[0] - insert1, self._centre[1] - insert2)
-            step = step // 2
-        if point[0] > self._centre[0] * 2 or point[1] > self._centre[1] * 2:
+        if point[0] < 0 or point[1] < 0 or point[0] > self._centre[0] * 2 \
+                or point[1] > self._centre[1] * 2:
             raise OutOfBoundsError
-        if self.contains_point(point):
+        if name in self._index or self.contains_point(point):
             raise OutOfBoundsError
-        if self._nw is None and self._sw is None and self._se is None \
-                and self._ne is None and self._point is None:
-            self._point = point
-            self._name = name
-        elif self._nw is None and self._sw is None and self._se is None \
-                and self._ne is None and directions(self._centre, self._point) \
-                != directions(self._centre, point):
-            if directions(self._centre, point) == 4:
-                newquad = QuadTree(
-                    (self._centre[0] + step, self._centre[1] + step))
-                self._se = newquad
-                newquad._name = name
-                newquad._point = point
-            elif directions(self._centre, point) == 1:
-                newquad = QuadTree(
-                    (self._centre[0] + step, self._centre[1] - step))
-                self._ne = newquad
-                newquad._point = point
-                newquad._name = name
-            elif directions(self._centre, point) == 2:
-                newquad = QuadTree(
-                    (self._centre[0] - step, self._centre[1] - step))
-                self._nw = newquad
-                newquad._name = name
-                newquad._point = point
-            elif directions(self._centre, point) == 3:
-                newquad = QuadTree(
-                    (self._centre[0] - step, self._centre[1] + step))
-                self._sw = newquad
-                newquad._name = name
-                newquad._point = point
-            if directions(self._centre, self._point) == 4:
-                newquad = QuadTree(
-                    (self._centre[0] + step, self._centre[1] + step))
-                self._se = newquad
-                newquad._name = name
-                newquad._point = point
-            elif directions(self._centre, self._point) == 1:
-                newquad = QuadTree(
-                    (self._centre[0] + step, self._centre[1] - step))
-                self._ne = newquad
-                newquad._point = point
-                newquad._name = name
-            elif directions(self._centre, self._point) == 2:
-                newquad = QuadTree(
-                    (self._centre[0] - step, self._centre[1] - step))
-                self._nw = newquad
-                newquad._name = name
-                newquad._point = point
-            elif directions(self._centre, self._point) == 3:
-                newquad = QuadTree(
-                    (self._centre[0] - step, self._centre[1] + step))
-                self._sw = newquad
-                newquad._name = name
-                newquad._point = point
-        else:
-            if directions(self._centre, self._point) == 4:
-                newquad = QuadTree(
-                    (self._centre[0] + step, self._centre[1] + step))
-                self._se = newquad
-                newquad._name = name
-                newquad._point = point
-                a = self._se
-            elif directions(self._centre, self._point) == 1:
-                newquad = QuadTree(
-                    (self._centre[0] + step, self._centre[1] - step))
-                self._ne = newquad
-                newquad._point = point
-                newquad._name = name
-                a = self._ne
-            elif directions(self._centre, self._point) == 2:
-                newquad = QuadTree(
-                    (self._centre[0] - step, self._centre[1] - step))
-                self._nw = newquad
-                newquad._name = name
-                newquad._point = point
-                a = self._nw
-            else:
-                newquad = QuadTree(
-                    (self._centre[0] - step, self._centre[1] + step))
-                self._sw = newquad
-                newquad._name = name
-                newquad._point = point
-                a = self._sw
-            if directions(a._centre, point) == 4:
-                if a.is_empty() or a._se is None:
-                    newquad = QuadTree(
-                        (a._centre[0] + step, a._centre[1] + step))
-                    a._se = newquad
-                    newquad._name = name
-                    newquad._point = point
-                    insertcount = 0
-                else:
-                    a._se.insert(name, point)
-            elif directions(a._centre, point) == 1:
-                if a.is_empty() or a._ne is None:
-                    newquad = QuadTree(
-                        (a._centre[0] + step, a._centre[1] - step))
-                    a._ne = newquad
-                    newquad._point = point
-                    newquad._name = name
-                else:
-                    a._ne.insert(name, point)
-            elif directions(a._centre, point) == 2:
-                if a.is_empty() or a._nw is None:
-                    newquad = QuadTree(
-                        (a._centre[0] - step, a._centre[1] - step))
-                    a._nw = newquad
-                    newquad._name = name
-                    newquad._point = point
-                else:
-                    a._nw.insert(name, point)
-            elif directions(a._centre, point) == 3:
-                if a.is_empty() or a._sw is None:
-                    newquad = QuadTree(
-                        (a._centre[0] - step, a._centre[1] + step))
-                    a._sw = newquad
-                    newquad._name = name
-                    newquad._point = point
-                else:
-                    a._sw.insert(name, point)
+        self._insert(name, point, self._bounds())
+        self._index[name] = point
+
+    def _bounds(self) -> Tuple[int, int, int, int]:
+        """ Return the (left, top, right, bottom) region covered by this tree,
+        assuming <self> is the root.
+        """
+        return 0, 0, self._centre[0] * 2, self._centre[1] * 2
+
+    def _insert(self, name: str, point: Tuple[int, int],
+                bounds: Tuple[int, int, int, int]) -> None:
+        """ Insert <name> at <point> below <self>, which covers the region
+        <bounds>.
+
+        Points are only stored in leaves, so a leaf that already holds a point
+        pushes it down into a new child before the descent goes on. Missing
+        children are created centred in their quarter of the region, and
+        children shared with a saved version are copied.
+        """
+        tree = self
+        path = []
+        while not tree.is_empty():
+            if tree._point is not None:
+                quadrant = directions(tree._centre, tree._point)
+                leaf = tree._new_node(
+                    quadrant_bounds(bounds, tree._centre, quadrant))
+                leaf._name = tree._name
+                leaf._point = tree._point
+                leaf._recount()
+                tree._set_child(quadrant, leaf)
+                tree._name = None
+                tree._point = None
+            quadrant = directions(tree._centre, point)
+            bounds = quadrant_bounds(bounds, tree._centre, quadrant)
+            child = tree._own_child(quadrant)
+            if child is None:
+                child = tree._new_node(bounds)
+                tree._set_child(quadrant, child)
+            path.append(tree)
+            tree = child
+        team = tree._team_of.get(name)
+        tree._name = name
+        tree._point = point
+        tree._size = 1
+        tree._height = 1
+        tree._teams = {team: 1}
+        _count_insert(path, team)
 
     def remove(self, name: str) -> None:
         """ Remove information about a player named <name> from this tree.
-        Runtime: O(n)
+        Runtime: O(log(n))
         >>> q = QuadTree((100, 100))
         >>> q.insert("Eric", (150, 150))
         >>> q.__contains__("Eric")
@@ -483,54 +987,8 @@ class QuadTree(Tree):
         >>> q.__contains__("Eric")
         False
         """
-        if self._name == '' and self.countsub() == 0:
-            pass
-        elif self._name == name:
-            count = self.countsub()
-            if count >= 2:
-                self._name = None
-                self._point = None
-            elif count == 1:
-                if self._ne is not None:
-                    if self._ne.countsub() == 0:
-                        self._name = self._ne._name
-                        self._point = self._ne._point
-                    else:
-                        self._name = None
-                        self._point = None
-                if self._se is not None:
-                    if self._se.countsub() == 0:
-                        self._name = self._se._name
-                        self._point = self._se._point
-                    else:
-                        self._name = None
-                        self._point = None
-                if self._nw is not None:
-                    if self._nw.countsub() == 0:
-                        self._name = self._nw._name
-                        self._point = self._nw._point
-                    else:
-                        self._name = None
-                        self._point = None
-                if self._sw is not None:
-                    if self._sw.countsub() == 0:
-                        self._name = self._sw._name
-                        self._point = self._sw._point
-                    else:
-                        self._name = None
-                        self._point = None
-            else:
-                self._name = None
-                self._point = None
-        else:
-            if self._se is not None:
-                self._se.remove(name)
-            if self._sw is not None:
-                self._sw.remove(name)
-            if self._ne is not None:
-                self._ne.remove(name)
-            if self._nw is not None:
-                self._nw.remove(name)
+        if name in self._index:
+            self.remove_point(self._index[name])
 
     def remove_point(self, point: Tuple[int, int]) -> None:
         """ Remove information about a player at point <point> from this tree.
@@ -543,55 +1001,46 @@ class QuadTree(Tree):
         >>> q.contains_point((150, 150))
         False
         """
-        direction = directions(self._centre, point)
-        a = 0
-        if self._point is not None:
-            if self._point == point and a == 0:
-                count = self.countsub()
-                if count >= 2:
-                    self._name = None
-                    self._point = None
-                elif count == 1:
-                    if self._ne is not None:
-                        if self._ne.countsub() == 0:
-                            self._name = self._ne._name
-                            self._point = self._ne._point
-                        else:
-                            self._name = None
-                            self._point = None
-                    if self._se is not None:
-                        if self._se.countsub() == 0:
-                            self._name = self._se._name
-                            self._point = self._se._point
-                        else:
-                            self._name = None
-                            self._point = None
-                    if self._nw is not None:
-                        if self._nw.countsub() == 0:
-                            self._name = self._nw._name
-                            self._point = self._nw._point
-                        else:
-                            self._name = None
-                            self._point = None
-                    if self._sw is not None:
-                        if self._sw.countsub() == 0:
-                            self._name = self._sw._name
-                            self._point = self._sw._point
-                        else:
-                            self._name = None
-                            self._point = None
-                else:
-                    self._name = None
-                    self._point = None
-        else:
-            if direction == 4 and self._se is not None:
-                self._se.remove_point(point)
-            elif direction == 3 and self._sw is not None:
-                self._sw.remove_point(point)
-            elif direction == 1 and self._ne is not None:
-                self._ne.remove_point(point)
-            elif direction == 2 and self._nw is not None:
-                self._nw.remove_point(point)
+        name = self._remove_point(point)
+        if name is not None:
+            del self._index[name]
+
+    def _remove_point(self, point: Tuple[int, int]) -> Optional[str]:
+        """ Remove the player at <point> below <self> and return its name, or
+        None if no player is at <point>.
+
+        Empty children are dropped on the way back up, and a node left with a
+        single leaf child takes that child's point back.
+        """
+        tree = self
+        path = []
+        while tree._point is None:
+            quadrant = directions(tree._centre, point)
+            child = tree._own_child(quadrant)
+            if child is None:
+                return None
+            path.append((tree, quadrant))
+            tree = child
+        if tree._point != point:
+            return None
+        name = tree._name
+        tree._name = None
+        tree._point = None
+        tree._size = 0
+        tree._height = 0
+        tree._teams = {}
+        for parent, quadrant in reversed(path):
+            if tree.is_empty():
+                parent._set_child(quadrant, None)
+            if parent.countsub() == 1:
+                child = parent._child(checksub(parent))
+                if child.is_leaf():
+                    parent._name = child._name
+                    parent._point = child._point
+                    parent._set_child(checksub(parent), None)
+            parent._recount()
+            tree = parent
+        return name
 
     def move(self, name: str, direction: str, steps: int) \
             -> Optional[Tuple[int, int]]:
@@ -603,33 +1052,21 @@ class QuadTree(Tree):
         r at exactly the
         same coordinates of another player in the Tree (before moving the p
         layer).
-        Runtime: O(n)
+        Runtime: O(log(n))
         === precondition ===
         direction in ['N', 'S', 'E', 'W']
         >>> q = QuadTree((100, 100))
         >>> q.insert("Eric", (150, 150))
         >>> q.move("Eric", "N", 10)
         (150, 140)
+        >>> q.getpoint("Eric")
+        (150, 140)
         """
-        tempcord = (0, 0)
-        tempname = name
         point = self.getpoint(name)
-        if direction == 'N':
-            tempcord = (point[0], point[1] - steps)
-        elif direction == 'S':
-            tempcord = (point[0], point[1] + steps)
-        elif direction == 'E':
-            tempcord = (point[0] + steps, point[1])
-        elif direction == 'W':
-            tempcord = (point[0] - steps, point[1])
-        if tempcord[0] > self._centre[0] * 2 or tempcord[1] \
-                > self._centre[1] * 2:
-            raise OutOfBoundsError
-        if self.contains_point(tempcord):
-            raise OutOfBoundsError
-        self.remove(name)
-        self.insert(tempname, tempcord)
-        return tempcord
+        if point is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
 
     def move_point(self, point: Tuple[int, int], direction: str, steps: int) \
             -> Optional[Tuple[int, int]]:
@@ -650,28 +1087,102 @@ class QuadTree(Tree):
         === precondition ===
         direction in ['N', 'S', 'E', 'W']
         >>> q = QuadTree((100, 100))
-        >>> q._point = (150, 150)
+        >>> q.insert("Eric", (150, 150))
         >>> q.move_point((150, 150), "N", 10)
         (150, 140)
         """
-        tempcord = (0, 0)
-        tempname = self.getname(point)
-        if direction == 'N':
-            tempcord = (point[0], point[1] - steps)
-        elif direction == 'S':
-            tempcord = (point[0], point[1] + steps)
-        elif direction == 'E':
-            tempcord = (point[0] + steps, point[1])
-        elif direction == 'W':
-            tempcord = (point[0] - steps, point[1])
-        if tempcord[0] > self._centre[0] * 2 or tempcord[1] \
-                > self._centre[1] * 2:
-            raise OutOfBoundsError
-        if self.contains_point(tempcord):
-            raise OutOfBoundsError
-        self.remove(tempname)
-        self.insert(tempname, tempcord)
-        return tempcord
+        name = self.getname(point)
+        if name is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
+
+    def move_many(self, moves: List[Tuple[str, str, int]]) \
+            -> List[Union[Tuple[int, int], OutOfBoundsError, None]]:
+        """ Make each (name, direction, steps) move of <moves> in order, as
+        move(name, direction, steps) would, and return the outcome of each:
+        the player's new location, None if there is no player named <name>,
+        or the OutOfBoundsError move would have raised. A failed move does
+        not stop the moves after it.
+        Runtime: O(n + m log(n)) for m moves
+        === precondition ===
+        every direction in ['N', 'S', 'E', 'W']
+        >>> q = QuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (140, 150))
+        >>> outcomes = q.move_many([("Joe", "E", 10), ("Eric", "S", 60),
+        ...                         ("Joe", "N", 10), ("Eric", "W", 10)])
+        >>> outcomes[:2]
+        [OutOfBoundsError('occupied'), OutOfBoundsError('out of bounds')]
+        >>> outcomes[2:]
+        [(140, 140), (140, 150)]
+        >>> q.getpoint("Eric")
+        (140, 150)
+        """
+        outcomes, steps = plan_moves(self._index, self._bounds(), moves)
+        for name, point, new in steps:
+            self._shift(name, point, new)
+        return outcomes
+
+    def _relocate(self, name: str, point: Tuple[int, int],
+                  new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to <new> and return <new>.
+
+        The descent stops at the first node where <point> and <new> fall in
+        different quadrants. If it reaches the leaf holding <point>, the leaf
+        is updated in place. Otherwise only the subtree below that node is
+        reorganized.
+        """
+        if new[0] < 0 or new[1] < 0 or new[0] > self._centre[0] * 2 \
+                or new[1] > self._centre[1] * 2:
+            raise OutOfBoundsError('out of bounds')
+        if self.contains_point(new):
+            raise OutOfBoundsError('occupied')
+        return self._shift(name, point, new)
+
+    def _shift(self, name: str, point: Tuple[int, int],
+               new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to the free, in-bounds point
+        <new> and return <new>, as _relocate does once its checks pass.
+        """
+        tree = self
+        bounds = self._bounds()
+        path = []
+        while tree._point is None:
+            quadrant = directions(tree._centre, point)
+            if quadrant != directions(tree._centre, new):
+                break
+            bounds = quadrant_bounds(bounds, tree._centre, quadrant)
+            path.append(tree)
+            tree = tree._own_child(quadrant)
+        if tree._point is not None:
+            tree._point = new
+            self._in_place_moves += 1
+        else:
+            tree._remove_point(point)
+            tree._insert(name, new, bounds)
+            for node in reversed(path):
+                node._recount()
+        self._moves += 1
+        self._index[name] = new
+        return new
+
+    def move_stats(self) -> Dict[str, int]:
+        """ Return the number of successful moves made in this tree under
+        'moves', and how many of those updated the player's node in place
+        without reorganizing the tree under 'in_place'.
+        Runtime: O(1)
+        >>> q = QuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (50, 50))
+        >>> q.move("Eric", "N", 10)
+        (150, 140)
+        >>> q.move("Eric", "W", 100)
+        (50, 140)
+        >>> q.move_stats()
+        {'moves': 2, 'in_place': 1}
+        """
+        return {'moves': self._moves, 'in_place': self._in_place_moves}
 
     def names_in_range(self, point: Tuple[int, int], direction: str,
                        distance: int) -> List[str]:
@@ -686,100 +1197,436 @@ class QuadTree(Tree):
         In other words, find all players whose location is in the box with
         corners at:
         (100, 100) (110, 100) (100, 110) (110, 110)
-        Runtime: faster than O(n) when distance is small
+        Runtime: O(log(n) + k) for k names found when distance is small
         === precondition ===
         direction in ['NE', 'SE', 'NE', 'SW']
         >>> q = QuadTree((100, 100))
         >>> q.insert('Eric', (105, 105))
         >>> q.insert('Joe', (110, 110))
         >>> q.insert('Jack', (109, 109))
-        >>> q.names_in_range((100, 100), 'SE', 10)
-        ['Eric', 'Joe', 'Jack']
+        >>> sorted(q.names_in_range((100, 100), 'SE', 10))
+        ['Eric', 'Jack', 'Joe']
         """
         lst = []
-        endpoint = ()
-        if direction == 'NE':
-            endpoint = (point[0] + distance, point[1] - distance)
-        elif direction == 'SE':
-            endpoint = (point[0] + distance, point[1] + distance)
-        elif direction == 'SW':
-            endpoint = (point[0] - distance, point[1] + distance)
-        elif direction == 'NW':
-            endpoint = (point[0] - distance, point[1] - distance)
-
-        upl = (min(point[0], endpoint[0]), min(point[1], endpoint[1]))
-        downr = (max(point[0], endpoint[0]), max(point[1], endpoint[1]))
-        downl = (min(point[0], endpoint[0]), max(point[1], endpoint[1]))
-        if self._point is not None:
-            if downl[0] <= self._point[0] <= \
-                    downr[0] and upl[1] <= self._point[1] <= downl[1]:
-                lst.append(self._name)
-        if self._se is not None:
-            a = self._se.names_in_range(point, direction, distance)
-            lst = lst + a
-        if self._sw is not None:
-            a = self._sw.names_in_range(point, direction, distance)
-            lst = lst + a
-        if self._ne is not None:
-            a = self._ne.names_in_range(point, direction, distance)
-            lst = lst + a
-        if self._nw is not None:
-            a = self._nw.names_in_range(point, direction, distance)
-            lst = lst + a
+        if not self.is_empty():
+            self._names_in_box(range_box(point, direction, distance),
+                               self._bounds(), lst)
         return lst
 
-    def size(self) -> int:
-        """ Return the number of nodes in <self>
+    def _names_in_box(self, box: Tuple[int, int, int, int],
+                      bounds: Tuple[int, int, int, int],
+                      lst: List[str]) -> None:
+        """ Append to <lst> the names of players below <self> that lie in
+        <box>, where <self> covers the region <bounds>. Children whose region
+        misses <box> are skipped.
+        """
+        stack = [(self, bounds)]
+        while stack:
+            tree, bounds = stack.pop()
+            if tree._point is not None:
+                if in_box(box, tree._point):
+                    lst.append(tree._name)
+                continue
+            for quadrant in (4, 3, 2, 1):
+                child = tree._child(quadrant)
+                if child is not None:
+                    sub = quadrant_bounds(bounds, tree._centre, quadrant)
+                    if boxes_overlap(box, sub):
+                        stack.append((child, sub))
+
+    def names_in_range_many(self, queries: List[Tuple[Tuple[int, int], str,
+                                                      int]]) \
+            -> List[List[str]]:
+        """ Return, for each (point, direction, distance) query in <queries>,
+        the list names_in_range(point, direction, distance) would return.
+        Results are in the same order as <queries>.
+        Runtime: faster than len(queries) separate names_in_range calls
+        === precondition ===
+        every direction in ['NE', 'SE', 'NE', 'SW']
+        >>> q = QuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (95, 95))
+        >>> q.names_in_range_many([((100, 100), 'SE', 10),
+        ...                        ((100, 100), 'NW', 10),
+        ...                        ((100, 100), 'NE', 10)])
+        [['Eric'], ['Joe'], []]
+        """
+        results = [[] for _ in queries]
+        if not self.is_empty():
+            boxes = [(i, range_box(point, direction, distance))
+                     for i, (point, direction, distance) in enumerate(queries)]
+            self._names_in_boxes(boxes, self._bounds(), results)
+        return results
+
+    def _names_in_boxes(self, boxes: List[Tuple[int, Tuple[int, int, int,
+                                                           int]]],
+                        bounds: Tuple[int, int, int, int],
+                        results: List[List[str]]) -> None:
+        """ For every (i, box) in <boxes>, append to results[i] the names of
+        players below <self> that lie in box, where <self> covers the region
+        <bounds>. Each child is only visited with the boxes that overlap it.
+        """
+        stack = [(self, bounds, boxes)]
+        while stack:
+            tree, bounds, boxes = stack.pop()
+            if tree._point is not None:
+                for i, box in boxes:
+                    if in_box(box, tree._point):
+                        results[i].append(tree._name)
+                continue
+            for quadrant in (4, 3, 2, 1):
+                child = tree._child(quadrant)
+                if child is not None:
+                    sub = quadrant_bounds(bounds, tree._centre, quadrant)
+                    active = [(i, box) for i, box in boxes
+                              if boxes_overlap(box, sub)]
+                    if active:
+                        stack.append((child, sub, active))
+
+    def nearest(self, point: Tuple[int, int], k: int = 1,
+                include: Optional[Set[str]] = None) \
+            -> List[Tuple[str, float]]:
+        """ Return (name, distance) pairs for the <k> players closest to
+        <point>, nearest first, counting only players named in <include> if
+        it is given. Distances are straight-line distances. A player standing
+        at <point> itself is included, at distance 0.
+
+        Nodes are visited best first, in order of how close their region comes
+        to <point>, and the search stops once the <k> best players found are
+        closer than every region left. An <include> of at most sqrt(n) names
+        is answered from the name index instead.
+        Runtime: O(log(n) + k) typical
+        === precondition ===
+        k >= 0
+        >>> q = QuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (110, 100))
+        >>> q.insert('Jack', (30, 160))
+        >>> q.nearest((100, 100), 2)
+        [('Eric', 7.0710678118654755), ('Joe', 10.0)]
+        >>> q.nearest((100, 100), 1, {'Jack', 'Joe'})
+        [('Joe', 10.0)]
+        """
+        if include is not None and len(include) ** 2 <= self._size:
+            return nearest_by_name(self._index, point, k, include)
+        best = []
+        if k <= 0 or self.is_empty():
+            return []
+        heap = [(0, 0, self, self._bounds())]
+        count = 1
+        while heap:
+            d2, _, tree, bounds = heapq.heappop(heap)
+            if len(best) == k and d2 >= -best[0][0]:
+                break
+            if tree._point is not None:
+                _keep_nearest(best, k, tree, point, include)
+                continue
+            for quadrant in (1, 2, 3, 4):
+                child = tree._child(quadrant)
+                if child is None:
+                    continue
+                if child._point is not None:
+                    _keep_nearest(best, k, child, point, include)
+                    continue
+                sub = quadrant_bounds(bounds, tree._centre, quadrant)
+                d2 = box_distance2(sub, point)
+                if len(best) < k or d2 < -best[0][0]:
+                    heapq.heappush(heap, (d2, count, child, sub))
+                    count += 1
+        return _sorted_nearest(best)
+
+    def find_pairs_within(self, radius: int) -> List[Tuple[str, str]]:
+        """ Return a (name, name) pair for every two players in this tree
+        whose straight-line distance apart is at most <radius>. Each pair
+        appears once, in no particular order.
+
+        The tree is joined with itself: a stack holds either a node, standing
+        for the pairs inside it, or two nodes, standing for the pairs with one
+        player in each. Two nodes whose regions are more than <radius> apart
+        are dropped, and otherwise the larger one is split into its children.
+        A leaf's region is just its point.
+        Runtime: O(n + k) typical for k pairs and a small radius
+        === precondition ===
+        radius >= 0
+        >>> q = QuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (108, 109))
+        >>> q.insert('Jack', (102, 101))
+        >>> q.insert('Ann', (150, 150))
+        >>> sorted(sorted(pair) for pair in q.find_pairs_within(5))
+        [['Eric', 'Jack'], ['Eric', 'Joe']]
+        """
+        pairs = []
+        if self._size < 2:
+            return pairs
+        limit = radius * radius
+        stack = [(self, self._bounds(), None, None)]
+        while stack:
+            a, a_region, b, b_region = stack.pop()
+            if b is None:
+                parts = []
+                for quadrant in (1, 2, 3, 4):
+                    child = a._child(quadrant)
+                    if child is not None:
+                        if child._point is not None:
+                            parts.append((child, child._point + child._point))
+                        else:
+                            parts.append((child, quadrant_bounds(
+                                a_region, a._centre, quadrant)))
+                for i, (child, region) in enumerate(parts):
+                    if child._point is None:
+                        stack.append((child, region, None, None))
+                    for other, other_region in parts[i + 1:]:
+                        if boxes_distance2(region, other_region) <= limit:
+                            stack.append((child, region, other, other_region))
+                continue
+            if a._point is not None and b._point is not None:
+                if (a._point[0] - b._point[0]) ** 2 \
+                        + (a._point[1] - b._point[1]) ** 2 <= limit:
+                    pairs.append((a._name, b._name))
+                continue
+            if a._point is not None or b._point is None \
+                    and b._size > a._size:
+                a, a_region, b, b_region = b, b_region, a, a_region
+            for quadrant in (1, 2, 3, 4):
+                child = a._child(quadrant)
+                if child is not None:
+                    if child._point is not None:
+                        region = child._point + child._point
+                    else:
+                        region = quadrant_bounds(a_region, a._centre,
+                                                 quadrant)
+                    if boxes_distance2(region, b_region) <= limit:
+                        stack.append((child, region, b, b_region))
+        return pairs
+
+    def set_team(self, name: str, team: Optional[str]) -> None:
+        """ Record that the player named <name> plays for <team>, whether or
+        not it is in this tree yet. The team is kept if the player is
+        removed, and is used again if it is inserted later. Players never
+        given a team count under None.
+        Runtime: O(log(n))
+        >>> q = QuadTree((100, 100))
+        >>> q.insert('Eric', (105, 105))
+        >>> q.count_in_range((100, 100), 'SE', 10)
+        {None: 1}
+        >>> q.set_team('Eric', 'green')
+        >>> q.count_in_range((100, 100), 'SE', 10)
+        {'green': 1}
+        """
+        old = self._team_of.get(name)
+        self._team_of[name] = team
+        point = self._index.get(name)
+        if point is None or old == team:
+            return
+        tree = self
+        while tree is not None:
+            shift_team(tree._teams, old, team)
+            if tree._point is not None:
+                return
+            tree = tree._own_child(directions(tree._centre, point))
+
+    def count_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> Dict[Optional[str], int]:
+        """ Return how many of the players names_in_range(<point>,
+        <direction>, <distance>) would list play for each team, leaving out
+        teams with no such player.
+
+        A node whose whole region lies in the box adds its stored counts
+        without being searched.
+        Runtime: O(log(n)) for each node on the edge of the box
+        === precondition ===
+        direction in ['NE', 'SE', 'NE', 'SW']
+        >>> q = QuadTree((100, 100))
+        >>> q.set_team('Eric', 'green')
+        >>> q.set_team('Joe', 'green')
+        >>> q.set_team('Jack', 'purple')
+        >>> q.insert('Eric', (105, 105))
+        >>> q.insert('Joe', (110, 110))
+        >>> q.insert('Jack', (109, 109))
+        >>> q.insert('Ann', (150, 150))
+        >>> q.count_in_range((100, 100), 'SE', 10)
+        {'green': 2, 'purple': 1}
+        >>> q.count_in_range((0, 0), 'SE', 200)
+        {'green': 2, 'purple': 1, None: 1}
+        """
+        counts = {}
+        if self.is_empty():
+            return counts
+        box = range_box(point, direction, distance)
+        stack = [(self, self._bounds())]
+        while stack:
+            tree, bounds = stack.pop()
+            if tree._point is not None:
+                if in_box(box, tree._point):
+                    team = self._team_of.get(tree._name)
+                    counts[team] = counts.get(team, 0) + 1
+            elif box_contains(box, bounds):
+                add_teams(counts, tree._teams)
+            else:
+                for quadrant in (4, 3, 2, 1):
+                    child = tree._child(quadrant)
+                    if child is not None:
+                        sub = quadrant_bounds(bounds, tree._centre, quadrant)
+                        if boxes_overlap(box, sub):
+                            stack.append((child, sub))
+        return counts
+
+    def snapshot(self) -> int:
+        """ Save the current state of this tree as a new version and return
+        its number. Later changes copy the nodes they touch instead of
+        changing the ones the saved versions share, and only the newest
+        versions, up to the tree's version window, are kept.
+
+        The version is a copy of the root sharing every other node, and each
+        node records the version it was made for. A change copies each node
+        from an older version on its way down, so it copies the O(depth)
+        nodes on its path, and only once per version. The version keeps its
+        own copy of the players' teams.
+        Runtime: O(t) for the t players given a team
+        >>> q = QuadTree((100, 100), window=2)
+        >>> q.insert('Eric', (150, 150))
+        >>> first = q.snapshot()
+        >>> _ = q.move('Eric', 'W', 100)
+        >>> q.insert('Joe', (160, 160))
+        >>> q.set_team('Joe', 'green')
+        >>> q.version(first).names_in_range((100, 100), 'SE', 100)
+        ['Eric']
+        >>> q.version(first).count_in_range((100, 100), 'SE', 100)
+        {None: 1}
+        >>> q.names_in_range((100, 100), 'SE', 100)
+        ['Joe']
+        >>> _ = q.snapshot(), q.snapshot()
+        >>> q.version(first) is None
+        True
+        """
+        frozen = self._copy(self._epoch)
+        frozen._index = None
+        frozen._versions = {}
+        frozen._team_of = dict(self._team_of)
+        self._versions[self._epoch] = frozen
+        while len(self._versions) > self._window:
+            del self._versions[next(iter(self._versions))]
+        self._epoch += 1
+        return self._epoch - 1
+
+    def version(self, number: int) -> Optional[QuadTree]:
+        """ Return the tree as it was when snapshot returned <number>, or None
+        if that version is no longer kept. A version answers queries that
+        walk its nodes, such as names_in_range, contains_point and
+        count_in_range, and must not be changed.
+        Runtime: O(1)
+        """
+        return self._versions.get(number)
+
+    def dump(self, path: str) -> None:
+        """ Save every player in this tree, with its location and team, to the
+        file at <path> in the snapshot format read by load.
+
+        Each node is saved in preorder as a bit mask of the quadrants it has
+        children in, and each leaf's player follows the leaves before it, so
+        load can relink the same tree without searching.
         Runtime: O(n)
+        >>> import os, tempfile
+        >>> q = QuadTree((100, 100))
+        >>> q.set_team('Eric', 'green')
+        >>> q.insert('Eric', (150, 150))
+        >>> q.insert('Joe', (50, 50))
+        >>> path = os.path.join(tempfile.mkdtemp(), 'field.snap')
+        >>> q.dump(path)
+        >>> copy = QuadTree.load(path)
+        >>> copy.getpoint('Eric'), copy.height()
+        ((150, 150), 2)
+        >>> copy.count_in_range((0, 0), 'SE', 200) == {'green': 1, None: 1}
+        True
+        >>> os.remove(path)
+        """
+        shape = array('b')
+        items = []
+        stack = [self] if not self.is_empty() else []
+        while stack:
+            tree = stack.pop()
+            if tree._point is not None:
+                shape.append(0)
+                items.append((tree._name, tree._point))
+                continue
+            mask = 0
+            for quadrant in (4, 3, 2, 1):
+                child = tree._child(quadrant)
+                if child is not None:
+                    mask |= 1 << (quadrant - 1)
+                    stack.append(child)
+            shape.append(mask)
+        _write_snapshot(path, QUADTREE_SNAPSHOT, self._bounds(), None, shape,
+                        items, self._team_of)
+
+    @classmethod
+    def load(cls, path: str) -> QuadTree:
+        """ Return a new QuadTree holding the players saved at <path> by
+        dump, with the same nodes the saved tree had.
+        Raise a ValueError if the file is not a QuadTree snapshot.
+        Runtime: O(n)
+        """
+        bounds, _, shape, items, teams = _read_snapshot(path,
+                                                        QUADTREE_SNAPSHOT)
+        tree = cls((bounds[2] // 2, bounds[3] // 2))
+        team_of = tree._team_of
+        team_of.update(teams)
+        tree._index = dict(items)
+        players = iter(items)
+        inner = []
+        stack = [(tree, bounds)]
+        for mask in shape:
+            node, (left, top, right, bottom) = stack.pop()
+            if not mask:
+                node._name, node._point = next(players)
+                node._size = node._height = 1
+                node._teams = {team_of.get(node._name): 1}
+                continue
+            inner.append(node)
+            x, y = node._centre
+            for quadrant, sub in ((4, (x + 1, y + 1, right, bottom)),
+                                  (3, (left, y + 1, x, bottom)),
+                                  (2, (left, top, x, y)),
+                                  (1, (x + 1, top, right, y))):
+                if mask & 1 << (quadrant - 1):
+                    child = node._new_node(sub)
+                    node._set_child(quadrant, child)
+                    stack.append((child, sub))
+        for node in reversed(inner):
+            node._recount()
+        return tree
+
+    def size(self) -> int:
+        """ Return the number of players in <self>
+        Runtime: O(1)
         >>> q = QuadTree((100, 100))
-        >>> q._point = (150, 150)
         >>> q.size()
-        1
+        0
+        >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (50, 50))
+        >>> q.size()
+        2
         """
-        if self._name is None and self._point is None:
-            return 0
-        elif self.countsub() == 0:
-            return 1
-        else:
-            a = self._ne.size()
-            b = self._nw.size()
-            c = self._se.size()
-            d = self._sw.size()
-            total = a + b + c + d
-            return total
+        return self._size
 
     def height(self) -> int:
         """ Return the height of <self>
         Height is measured as the number of nodes in the path from the root
         of this
         tree to the node at the greatest depth in this tree.
-        Runtime: O(n)
+        Runtime: O(1)
         >>> q = QuadTree((100, 100))
-        >>> q._point = (150, 150)
+        >>> q.height()
+        0
+        >>> q.insert("Eric", (150, 150))
         >>> q.height()
         1
+        >>> q.insert("Joe", (50, 50))
+        >>> q.height()
+        2
         """
-        if self._centre is not None and self._se is None and self._ne is None \
-                and self._sw is None and self._nw is None:
-            return 1
-        elif self.is_empty():
-            return 0
-        elif self.is_leaf():
-            return 1
-        else:
-            a = 0
-            b = 0
-            c = 0
-            d = 0
-            if self._ne is not None:
-                a = self._ne.height()
-            if self._nw is not None:
-                b = self._nw.height()
-            if self._se is not None:
-                c = self._se.height()
-            if self._sw is not None:
-                d = self._sw.height()
-            return max(a, b, c, d) + 1
+        return self._height
 
     def same(self, tree: TwoDTree) -> bool:
         if self._point != tree._point:
@@ -866,6 +1713,50 @@ class QuadTree(Tree):
                 else:
                     return None
 
+    def is_valid(self) -> bool:
+        """ Return True if every player in <self> sits in a leaf whose region
+        contains its location, no node below the root is empty, every stored
+        size, height and team count is current, and the name index matches
+        the stored players.
+        Runtime: O(n)
+        >>> q = QuadTree((100, 100))
+        >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (50, 50))
+        >>> q.is_valid()
+        True
+        >>> q._index["Jack"] = (10, 10)
+        >>> q.is_valid()
+        False
+        """
+        found = {}
+        return self._valid_below(self._bounds(), found) \
+            and found == self._index
+
+    def _valid_below(self, bounds: Tuple[int, int, int, int],
+                     found: Dict[str, Tuple[int, int]]) -> bool:
+        """ Return True if the subtree <self>, covering <bounds>, is well
+        formed, recording each player it holds in <found>.
+        """
+        stack = [(self, bounds)]
+        while stack:
+            tree, bounds = stack.pop()
+            if (tree._size, tree._height) != tree._counts() \
+                    or tree._teams != tree._team_counts():
+                return False
+            if tree._point is not None:
+                if not tree.is_leaf() or not in_box(bounds, tree._point):
+                    return False
+                found[tree._name] = tree._point
+                continue
+            for quadrant in (1, 2, 3, 4):
+                child = tree._child(quadrant)
+                if child is not None:
+                    if child.is_empty():
+                        return False
+                    stack.append((child, quadrant_bounds(
+                        bounds, tree._centre, quadrant)))
+        return True
+
     def is_leaf(self) -> bool:
         """ Return True if <self> has no children
         Runtime: O(1)
@@ -873,6 +1764,7 @@ class QuadTree(Tree):
         >>> q.is_leaf()
         True
         >>> q.insert("Eric", (150, 150))
+        >>> q.insert("Joe", (50, 50))
         >>> q.is_leaf()
         False
         """
@@ -909,9 +1801,6 @@ class QuadTree(Tree):
         return True
 
 
-splitt = 'x'
-
-
 class TwoDTree(Tree):
     _name: Optional[str]
     _point: Optional[Tuple[int, int]]
@@ -920,12 +1809,40 @@ class TwoDTree(Tree):
     _lt: Optional[TwoDTree]
     _gt: Optional[TwoDTree]
     _split_type: str
+    _size: int
+    _height: int
+    _teams: Dict[Optional[str], int]
+    _team_of: Dict[str, Optional[str]]
+    _alpha: Optional[float]
+    _index: Dict[str, Tuple[int, int]]
+    _moves: int
+    _in_place_moves: int
+    _epoch: int
+    _window: int
+    _versions: Dict[int, TwoDTree]
 
     def __init__(self, nw: Optional[Tuple[int, int]],
-                 se: Optional[Tuple[int, int]]) -> None:
+                 se: Optional[Tuple[int, int]],
+                 alpha: Optional[float] = None,
+                 window: int = DEFAULT_VERSION_WINDOW) -> None:
         """Initialize a new Tree instance
+
+        With an <alpha>, the tree balances itself: whenever an insert, remove
+        or move leaves it deeper than a tree in which no child holds more than
+        <alpha> of its parent's players could be, it rebuilds one subtree that
+        breaks that rule. A rebuilt subtree only guarantees a 3/4 split when
+        players share coordinates, hence the lower bound on <alpha>.
+        <window> is the number of versions saved by snapshot that are kept.
         Runtime: O(1)
+        === precondition ===
+        alpha is None or 0.75 <= alpha < 1
+        >>> t = TwoDTree((0, 0), (500, 500), 0.75)
+        >>> for i in range(100):
+        ...     t.insert(str(i), (i, i))
+        >>> t.height()
+        16
         """
+        self._alpha = alpha
         self._nw = nw
         self._se = se
         self._name = None
@@ -933,27 +1850,101 @@ class TwoDTree(Tree):
         self._gt = None
         self._split_type = 'x'
         self._point = None
+        self._size = 0
+        self._height = 0
+        self._teams = {}
+        self._team_of = {}
+        self._index = {}
+        self._moves = 0
+        self._in_place_moves = 0
+        self._epoch = 0
+        self._window = window
+        self._versions = {}
+
+    def _new_node(self) -> TwoDTree:
+        """ Return a new empty node belonging to the same tree and version as
+        <self>.
+        """
+        node = TwoDTree(self._nw, self._se)
+        node._team_of = self._team_of
+        node._epoch = self._epoch
+        return node
+
+    def _copy(self, epoch: int) -> TwoDTree:
+        """ Return a copy of the node <self> for version <epoch>, sharing its
+        children.
+        """
+        node = copy.copy(self)
+        node._teams = dict(self._teams)
+        node._epoch = epoch
+        return node
+
+    def _own_child(self, lt: bool) -> Optional[TwoDTree]:
+        """ Return the _lt child of <self> if <lt> is True and the _gt child
+        otherwise, first swapping in a copy of it if a saved version shares
+        it, so that it can be changed. <self> must not be shared.
+        """
+        child = self._lt if lt else self._gt
+        if child is not None and child._epoch != self._epoch:
+            child = child._copy(self._epoch)
+            if lt:
+                self._lt = child
+            else:
+                self._gt = child
+        return child
 
     def __contains__(self, name: str) -> bool:
         """ Return True if a player named <name> is stored in this tree.
-        Runtime: O(n)
+        Runtime: O(1)
         >>> t = TwoDTree((0, 0), (100, 100))
-        >>> t._name = "Eric"
+        >>> t.insert("Eric", (50, 50))
         >>> t.__contains__("Eric")
         True
+        >>> t.__contains__("Joe")
+        False
         """
-        if self.is_empty():
-            return False
-        elif self._name == name:
-            return True
-        else:
-            if self._lt is not None:
-                if self._lt.__contains__(name):
-                    return True
-            if self._gt is not None:
-                if self._gt.__contains__(name):
-                    return True
-        return False
+        return name in self._index
+
+    def _counts(self) -> Tuple[int, int]:
+        """ Return the size and height of <self> worked out from its own point
+        and the stored counts of its children.
+        """
+        if self._point is None:
+            return 0, 0
+        lt, gt = self._lt, self._gt
+        if lt is None:
+            if gt is None:
+                return 1, 1
+            return gt._size + 1, gt._height + 1
+        if gt is None:
+            return lt._size + 1, lt._height + 1
+        return lt._size + gt._size + 1, max(lt._height, gt._height) + 1
+
+    def _team_counts(self) -> Dict[Optional[str], int]:
+        """ Return the per-team player counts of <self> worked out from its
+        own point and the stored counts of its children.
+        """
+        if self._point is None:
+            return {}
+        teams = {self._team_of.get(self._name): 1}
+        for child in (self._lt, self._gt):
+            if child is not None:
+                add_teams(teams, child._teams)
+        return teams
+
+    def _recount(self) -> None:
+        """ Refresh the stored size, height and team counts of <self> after
+        one of its children changed.
+        """
+        self._size, self._height = self._counts()
+        self._teams = self._team_counts()
+
+    def _goes_lt(self, point: Tuple[int, int]) -> bool:
+        """ Return True if <point> belongs in the _lt subtree of <self>.
+        """
+        if self._split_type == 'y':
+            return point[1] <= self._point[1]
+        return point[0] <= self._point[0]
 
     def contains_point(self, point: Tuple[int, int]) -> bool:
         """ Return True if a player at location <point> is stored in this tree.
@@ -963,26 +1954,16 @@ class TwoDTree(Tree):
         >>> t.contains_point((50, 50))
         True
         """
-        if self.is_empty():
-            return False
-        elif self._point == point:
-            return True
-        elif self._point is None:
-            return False
-        elif self._split_type == 'x':
-            if point[0] <= self._point[0]:
-                if self._lt is not None:
-                    return self._lt.contains_point(point)
-            else:
-                if self._gt is not None:
-                    return self._gt.contains_point(point)
-        elif self._split_type == 'y':
-            if point[1] <= self._point[1]:
-                if self._lt is not None:
-                    return self._lt.contains_point(point)
+        x, y = point
+        tree = self
+        while tree is not None and tree._point is not None:
+            split = tree._point
+            if split == point:
+                return True
+            if tree._split_type == 'y':
+                tree = tree._lt if y <= split[1] else tree._gt
             else:
-                if self._gt is not None:
-                    return self._gt.contains_point(point)
+                tree = tree._lt if x <= split[0] else tree._gt
         return False
 
     def insert(self, name: str, point: Tuple[int, int]) -> None:
@@ -998,69 +1979,63 @@ class TwoDTree(Tree):
         >>> t.contains_point((50, 50))
         True
         """
-        global splitt
         if point[0] > self._se[0] or point[1] > self._se[1] or point[0] < \
                 self._nw[0] or point[1] < self._nw[1]:
             raise OutOfBoundsError
-        if self.__contains__(name):
+        if name in self._index or self.contains_point(point):
             raise OutOfBoundsError
-        if self._point is None:
-            self._point = point
-            self._name = name
-            if splitt == 'x':
-                self._split_type = 'x'
-            elif splitt == 'y':
-                self._split_type = 'y'
-        elif self._split_type == 'x':
-            splitt = 'y'
-            if point[0] <= self._point[0]:
-                if self._lt is not None:
-                    self._lt.insert(name, point)
-                else:
-                    newquad = TwoDTree(self._nw, self._se)
-                    newquad._point = point
-                    newquad._name = name
-                    self._lt = newquad
-            else:
-                if self._gt is not None:
-                    self._gt.insert(name, point)
-                else:
-                    newquad = TwoDTree(self._nw, self._se)
-                    newquad._point = point
-                    newquad._name = name
-                    self._gt = newquad
-        elif self._split_type == 'y':
-            splitt = 'x'
-            if point[1] <= self._point[1]:
-                if self._lt is not None:
-                    self._lt.insert(name, point)
-                else:
-                    newquad = TwoDTree(self._nw, self._se)
-                    newquad._point = point
-                    newquad._name = name
-                    self._lt = newquad
+        self._insert(name, point)
+        self._index[name] = point
+        self._rebalance()
+
+    def _insert(self, name: str, point: Tuple[int, int]) -> None:
+        """ Insert <name> at <point> below <self> without any checks.
+
+        An empty node keeps its split type, and each new child splits on the
+        other axis from its parent. Children shared with a saved version are
+        copied on the way down.
+        """
+        tree = self
+        path = []
+        while tree._point is not None:
+            path.append(tree)
+            if tree._split_type == 'y':
+                goes_lt = point[1] <= tree._point[1]
             else:
-                if self._gt is not None:
-                    self._gt.insert(name, point)
+                goes_lt = point[0] <= tree._point[0]
+            child = tree._own_child(goes_lt)
+            if child is None:
+                child = tree._new_node()
+                child._split_type = 'y' if tree._split_type == 'x' else 'x'
+                if goes_lt:
+                    tree._lt = child
                 else:
-                    newquad = TwoDTree(self._nw, self._se)
-                    newquad._point = point
-                    newquad._name = name
-                    self._gt = newquad
+                    tree._gt = child
+            tree = child
+        team = self._team_of.get(name)
+        tree._point = point
+        tree._name = name
+        tree._size = 1
+        tree._height = 1
+        tree._teams = {team: 1}
+        _count_insert(path, team)
 
     def bigswitch(self) -> None:
-        if self._split_type == 'x':
-            self._split_type = 'y'
-        elif self._split_type == 'y':
-            self._split_type = 'x'
-        if self._lt is not None:
-            self._lt.bigswitch()
-        if self._gt is not None:
-            self._gt.bigswitch()
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree._split_type == 'x':
+                tree._split_type = 'y'
+            elif tree._split_type == 'y':
+                tree._split_type = 'x'
+            if tree._lt is not None:
+                stack.append(tree._lt)
+            if tree._gt is not None:
+                stack.append(tree._gt)
 
     def remove(self, name: str) -> None:
         """ Remove information about a player named <name> from this tree.
-        Runtime: O(n)
+        Runtime: O(log(n))
         >>> t = TwoDTree((0, 0), (100, 100))
         >>> t.insert("Eric", (50, 50))
         >>> t.__contains__("Eric")
@@ -1069,100 +2044,120 @@ class TwoDTree(Tree):
         >>> t.__contains__("Eric")
         False
         """
-        if self._name == name:
-            if self._lt is None and self._gt is None:
-                self._name = None
-                self._point = None
-            elif self._lt is not None:
-                if self._lt._gt is not None:
-                    self._name = self._lt._name
-                    self._point = self._lt._point
-                    a = self._lt._gt
-                    self._lt = self._lt._lt
-                    self._lt._gt = a
-                    self.bigswitch()
-                else:
-                    self._name = self._lt._name
-                    self._point = self._lt._point
-                    self._lt = self._lt._lt
-                    self.bigswitch()
-            else:
-                if self._lt is not None:
-                    if self._lt._gt is not None:
-                        self._name = self._gt._name
-                        self._point = self._gt._point
-                        self.bigswitch()
-                    else:
-                        self._name = None
-                        self._point = None
-                        self._split_type = None
-        else:
-            if self._lt is not None:
-                self._lt.remove(name)
-            if self._gt is not None:
-                self._gt.remove(name)
+        if name in self._index:
+            self.remove_point(self._index[name])
 
     def remove_point(self, point: Tuple[int, int]) -> None:
         """ Remove information about a player at point <point> from this tree.
         Runtime: O(log(n))
         >>> t = TwoDTree((0, 0), (100, 100))
         >>> t.insert("Eric", (50, 50))
+        >>> t.insert("Joe", (20, 70))
         >>> t.contains_point((50, 50))
         True
         >>> t.remove_point((50, 50))
         >>> t.contains_point((50, 50))
         False
+        >>> t.contains_point((20, 70))
+        True
         """
-        if self._point == point:
-            if self._lt is None and self._gt is None:
-                self._name = None
-                self._point = None
-            elif self._lt is not None:
-                if self._lt._gt is not None:
-                    self._name = self._lt._name
-                    self._point = self._lt._point
-                    a = self._lt._gt
-                    self._lt = self._lt._lt
-                    self._lt._gt = a
-                    self.bigswitch()
-                else:
-                    self._name = self._lt._name
-                    self._point = self._lt._point
-                    self._lt = self._lt._lt
-                    self.bigswitch()
-            else:
-                if self._lt._gt is not None:
-                    self._name = self._gt._name
-                    self._point = self._gt._point
-                    self.bigswitch()
-                else:
-                    self._name = None
-                    self._point = None
-                    self._split_type = None
-        elif self._split_type == 'x':
-            if point[0] <= self._point[0]:
-                if self._lt is not None:
-                    self._lt.remove_point(point)
-            else:
-                if self._gt is not None:
-                    self._gt.remove_point(point)
-        elif self._split_type == 'y':
-            if point[1] <= self._point[1]:
-                if self._lt is not None:
-                    self._lt.remove_point(point)
+        name = self._remove_point(point)
+        if name is not None:
+            del self._index[name]
+            self._rebalance()
+
+    def _remove_point(self, point: Tuple[int, int]) -> Optional[str]:
+        """ Remove the player at <point> below <self> and return its name, or
+        None if no player is at <point>.
+
+        The node holding <point> takes the largest point of its _lt subtree
+        along its split axis, which keeps every _lt point <= and every _gt
+        point > the new split, and the node that point came from is removed
+        in turn. A node with no _lt subtree has no such point, so its _gt
+        subtree is rebuilt in its place.
+        """
+        x, y = point
+        tree = self
+        path = []
+        while tree._point != point:
+            if tree._point is None:
+                return None
+            path.append(tree)
+            if tree._split_type == 'y':
+                tree = tree._own_child(y <= tree._point[1])
             else:
-                if self._gt is not None:
-                    self._gt.remove_point(point)
-
-    def getpoint(self, name: str) -> Tuple[int, int]:
-        if self._name == name:
-            return self._point
+                tree = tree._own_child(x <= tree._point[0])
+            if tree is None:
+                return None
+        name = tree._name
+        while tree._lt is not None:
+            replacement = tree._lt._max_node(1 if tree._split_type == 'y'
+                                             else 0)
+            spot = replacement._point
+            tree._name = replacement._name
+            tree._point = spot
+            path.append(tree)
+            tree = tree._own_child(True)
+            while tree._point != spot:
+                path.append(tree)
+                tree = tree._own_child(tree._goes_lt(spot))
+        if tree._gt is not None:
+            tree._rebuild(tree._gt._items(), tree._split_type)
         else:
-            if self._gt is not None:
-                return self._gt.getpoint(name)
-            if self._lt is not None:
-                return self._lt.getpoint(name)
-        return None
+            tree._rebuild([], tree._split_type)
+            if path:
+                if path[-1]._lt is tree:
+                    path[-1]._lt = None
+                else:
+                    path[-1]._gt = None
+        for node in reversed(path):
+            node._recount()
+        return name
+
+    def _max_node(self, axis: int) -> TwoDTree:
+        """ Return the node below <self> whose point is largest along <axis>,
+        the first such node in preorder if several tie. Below a node that
+        splits on <axis>, only its _gt subtree can hold a larger point.
+        """
+        best = self
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree._point[axis] > best._point[axis]:
+                best = tree
+            if tree._gt is not None:
+                stack.append(tree._gt)
+            if tree._lt is not None \
+                    and tree._split_type != ('y' if axis else 'x'):
+                stack.append(tree._lt)
+        return best
+
+    def _items(self) -> List[Tuple[str, Tuple[int, int]]]:
+        """ Return a flat list of (name, point) pairs stored below <self>, in
+        preorder.
+        """
+        items = []
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree._point is not None:
+                items.append((tree._name, tree._point))
+            if tree._gt is not None:
+                stack.append(tree._gt)
+            if tree._lt is not None:
+                stack.append(tree._lt)
+        return items
+
+    def getpoint(self, name: str) -> Optional[Tuple[int, int]]:
+        """ Return the location of the player named <name>, or None if there
+        is no such player in this tree.
+        Runtime: O(1)
+        >>> t = TwoDTree((0, 0), (100, 100))
+        >>> t.insert("Eric", (50, 50))
+        >>> t.getpoint("Eric")
+        (50, 50)
+        """
+        return self._index.get(name)
 
     def move(self, name: str, direction: str, steps: int) \
             -> Optional[Tuple[int, int]]:
@@ -1174,43 +2169,33 @@ class TwoDTree(Tree):
         at exactly the
         same coordinates of another player in the Tree (before moving the
         player).
-        Runtime: O(n)
+        Runtime: O(log(n))
         === precondition ===
         direction in ['N', 'S', 'E', 'W']
+        >>> t = TwoDTree((0, 0), (100, 100))
+        >>> t.insert("Eric", (50, 50))
+        >>> t.move("Eric", "E", 10)
+        (60, 50)
+        >>> t.getpoint("Eric")
+        (60, 50)
         """
-        tempcord = (0, 0)
-        tempname = name
         point = self.getpoint(name)
-        if direction == 'N':
-            tempcord = (point[0], point[1] - steps)
-        elif direction == 'S':
-            tempcord = (point[0], point[1] + steps)
-        elif direction == 'E':
-            tempcord = (point[0] + steps, point[1])
-        elif direction == 'W':
-            tempcord = (point[0] - steps, point[1])
-        if tempcord[0] > self._se[0] or tempcord[1] > self._se[1] \
-                or tempcord[0] < self._nw[0] or tempcord[1] < self._nw[1]:
-            raise OutOfBoundsError
-        if self.contains_point(tempcord):
-            raise OutOfBoundsError
-        self.remove(name)
-        self.insert(tempname, tempcord)
-        return tempcord
-
-    def getname(self, point: Tuple[int, int]) -> str:
-        if self._point == point:
-            return self._name
-        elif self._split_type == 'x':
-            if point[0] <= self._point[0]:
-                return self._lt.getname(point)
-            else:
-                return self._gt.getname(point)
-        elif self._split_type == 'y':
-            if point[1] <= self._point[1]:
-                return self._lt.getname(point)
+        if point is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
+
+    def getname(self, point: Tuple[int, int]) -> Optional[str]:
+        x, y = point
+        tree = self
+        while tree is not None and tree._point is not None:
+            split = tree._point
+            if split == point:
+                return tree._name
+            if tree._split_type == 'y':
+                tree = tree._lt if y <= split[1] else tree._gt
             else:
-                return self._gt.getname(point)
+                tree = tree._lt if x <= split[0] else tree._gt
         return None
 
     def move_point(self, point: Tuple[int, int], direction: str, steps: int) \
@@ -1232,24 +2217,107 @@ class TwoDTree(Tree):
         === precondition ===
         direction in ['N', 'S', 'E', 'W']
         """
-        tempcord = (0, 0)
-        tempname = self.getname(point)
-        if direction == 'N':
-            tempcord = (point[0], point[1] - steps)
-        elif direction == 'S':
-            tempcord = (point[0], point[1] + steps)
-        elif direction == 'E':
-            tempcord = (point[0] + steps, point[1])
-        elif direction == 'W':
-            tempcord = (point[0] - steps, point[1])
-        if point[0] > self._se[0] or point[1] > self._se[1] or point[0] < \
-                self._nw[0] or point[1] < self._nw[1]:
-            raise OutOfBoundsError
-        if self.contains_point(tempcord):
-            raise OutOfBoundsError
-        self.remove(tempname)
-        self.insert(tempname, tempcord)
-        return tempcord
+        name = self.getname(point)
+        if name is None:
+            return None
+        return self._relocate(name, point,
+                              step_point(point, direction, steps))
+
+    def move_many(self, moves: List[Tuple[str, str, int]]) \
+            -> List[Union[Tuple[int, int], OutOfBoundsError, None]]:
+        """ Make each (name, direction, steps) move of <moves> in order, as
+        move(name, direction, steps) would, and return the outcome of each:
+        the player's new location, None if there is no player named <name>,
+        or the OutOfBoundsError move would have raised. A failed move does
+        not stop the moves after it.
+        A tree that balances itself is rebalanced once, after all the moves
+        are made, rather than after each of them.
+        Runtime: O(n + m log(n)) for m moves
+        === precondition ===
+        every direction in ['N', 'S', 'E', 'W']
+        >>> t = TwoDTree((0, 0), (100, 100))
+        >>> t.insert("Eric", (50, 50))
+        >>> t.insert("Joe", (40, 50))
+        >>> outcomes = t.move_many([("Joe", "E", 10), ("Eric", "W", 60),
+        ...                         ("Eric", "N", 10), ("Joe", "E", 10)])
+        >>> outcomes[:2]
+        [OutOfBoundsError('occupied'), OutOfBoundsError('out of bounds')]
+        >>> outcomes[2:]
+        [(50, 40), (50, 50)]
+        """
+        outcomes, steps = plan_moves(self._index, self._nw + self._se, moves)
+        for name, point, new in steps:
+            self._shift(name, point, new)
+        for _ in steps:
+            if self._alpha is None \
+                    or self._height <= self._height_limit(self._size):
+                break
+            self._rebalance()
+        return outcomes
+
+    def _relocate(self, name: str, point: Tuple[int, int],
+                  new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to <new> and return <new>.
+
+        The descent stops at the first node whose split line separates <point>
+        from <new>. If it reaches the node holding <point>, and that node is a
+        leaf or the move runs parallel to its split line, the node is updated
+        in place. Otherwise only the subtree below the stopping node is
+        reorganized.
+        """
+        if new[0] > self._se[0] or new[1] > self._se[1] \
+                or new[0] < self._nw[0] or new[1] < self._nw[1]:
+            raise OutOfBoundsError('out of bounds')
+        if self.contains_point(new):
+            raise OutOfBoundsError('occupied')
+        self._shift(name, point, new)
+        self._rebalance()
+        return new
+
+    def _shift(self, name: str, point: Tuple[int, int],
+               new: Tuple[int, int]) -> Tuple[int, int]:
+        """ Move the player <name> from <point> to the free, in-bounds point
+        <new> and return <new>, as _relocate does once its checks pass,
+        without rebalancing the tree afterwards.
+        """
+        tree = self
+        path = []
+        while tree._point != point:
+            goes_lt = tree._goes_lt(point)
+            if goes_lt != tree._goes_lt(new):
+                break
+            path.append(tree)
+            tree = tree._own_child(goes_lt)
+        axis = 1 if tree._split_type == 'y' else 0
+        if tree._point == point and (tree.is_leaf()
+                                     or point[axis] == new[axis]):
+            tree._point = new
+            self._in_place_moves += 1
+        else:
+            tree._remove_point(point)
+            tree._insert(name, new)
+            for node in reversed(path):
+                node._recount()
+        self._moves += 1
+        self._index[name] = new
+        return new
+
+    def move_stats(self) -> Dict[str, int]:
+        """ Return the number of successful moves made in this tree under
+        'moves', and how many of those updated the player's node in place
+        without reorganizing the tree under 'in_place'.
+        Runtime: O(1)
+        >>> t = TwoDTree((0, 0), (100, 100))
+        >>> t.insert("Eric", (50, 50))
+        >>> t.insert("Joe", (20, 70))
+        >>> t.move("Eric", "N", 10)
+        (50, 40)
+        >>> t.move("Eric", "W", 40)
+        (10, 40)
+        >>> t.move_stats()
+        {'moves': 2, 'in_place': 1}
+        """
+        return {'moves': self._moves, 'in_place': self._in_place_moves}
 
     def names_in_range(self, point: Tuple[int, int], direction: str,
                        distance: int) -> List[str]:
@@ -1264,37 +2332,345 @@ class TwoDTree(Tree):
         In other words, find all players whose location is in the box with
         corners at:
         (100, 100) (110, 100) (100, 110) (110, 110)
-        Runtime: faster than O(n) when distance is small
+        Runtime: O(log(n) + k) for k names found when distance is small
         === precondition ===
         direction in ['NE', 'SE', 'NE', 'SW']
+        >>> t = TwoDTree((0, 0), (200, 200))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (110, 110))
+        >>> t.insert('Jack', (90, 109))
+        >>> sorted(t.names_in_range((100, 100), 'SE', 10))
+        ['Eric', 'Joe']
         """
         lst = []
-        endpoint = ()
-        if direction == 'NE':
-            endpoint = (point[0] + distance, point[1] - distance)
-        elif direction == 'SE':
-            endpoint = (point[0] + distance, point[1] + distance)
-        elif direction == 'SW':
-            endpoint = (point[0] - distance, point[1] + distance)
-        elif direction == 'NW':
-            endpoint = (point[0] - distance, point[1] - distance)
-        upl = (min(point[0], endpoint[0]), min(point[1], endpoint[1]))
-        downr = (max(point[0], endpoint[0]), max(point[1], endpoint[1]))
-        downl = (min(point[0], endpoint[0]), max(point[1], endpoint[1]))
-        if downl[0] <= self._point[0] <= downr[0] and upl[1] \
-                <= self._point[1] <= downl[1]:
-            lst.append(self._name)
-        if self._lt is not None:
-            a = self._lt.names_in_range(point, direction, distance)
-            lst = lst + a
-        if self._gt is not None:
-            a = self._gt.names_in_range(point, direction, distance)
-            lst = lst + a
+        if not self.is_empty():
+            self._names_in_box(range_box(point, direction, distance), lst)
         return lst
 
+    def _names_in_box(self, box: Tuple[int, int, int, int],
+                      lst: List[str]) -> None:
+        """ Append to <lst> the names of players below <self> that lie in
+        <box>, skipping any side of a split line that <box> cannot reach.
+        """
+        left, top, right, bottom = box
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            x, y = tree._point
+            if left <= x <= right and top <= y <= bottom:
+                lst.append(tree._name)
+            if tree._split_type == 'y':
+                low, high, split = top, bottom, y
+            else:
+                low, high, split = left, right, x
+            if tree._gt is not None and high > split:
+                stack.append(tree._gt)
+            if tree._lt is not None and low <= split:
+                stack.append(tree._lt)
+
+    def names_in_range_many(self, queries: List[Tuple[Tuple[int, int], str,
+                                                      int]]) \
+            -> List[List[str]]:
+        """ Return, for each (point, direction, distance) query in <queries>,
+        the list names_in_range(point, direction, distance) would return.
+        Results are in the same order as <queries>.
+        Runtime: faster than len(queries) separate names_in_range calls
+        === precondition ===
+        every direction in ['NE', 'SE', 'NE', 'SW']
+        >>> t = TwoDTree((0, 0), (200, 200))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (95, 95))
+        >>> t.names_in_range_many([((100, 100), 'SE', 10),
+        ...                        ((100, 100), 'NW', 10),
+        ...                        ((100, 100), 'NE', 10)])
+        [['Eric'], ['Joe'], []]
+        """
+        results = [[] for _ in queries]
+        if not self.is_empty():
+            boxes = [(i, range_box(point, direction, distance))
+                     for i, (point, direction, distance) in enumerate(queries)]
+            self._names_in_boxes(boxes, results)
+        return results
+
+    def _names_in_boxes(self, boxes: List[Tuple[int, Tuple[int, int, int,
+                                                           int]]],
+                        results: List[List[str]]) -> None:
+        """ For every (i, box) in <boxes>, append to results[i] the names of
+        players below <self> that lie in box. Each side of the split line is
+        only visited with the boxes that reach it.
+        """
+        stack = [(self, boxes)]
+        while stack:
+            tree, boxes = stack.pop()
+            lt_boxes = []
+            gt_boxes = []
+            axis = 1 if tree._split_type == 'y' else 0
+            split = tree._point[axis]
+            for i, box in boxes:
+                if in_box(box, tree._point):
+                    results[i].append(tree._name)
+                if box[axis] <= split:
+                    lt_boxes.append((i, box))
+                if box[axis + 2] > split:
+                    gt_boxes.append((i, box))
+            if tree._gt is not None and gt_boxes:
+                stack.append((tree._gt, gt_boxes))
+            if tree._lt is not None and lt_boxes:
+                stack.append((tree._lt, lt_boxes))
+
+    def nearest(self, point: Tuple[int, int], k: int = 1,
+                include: Optional[Set[str]] = None) \
+            -> List[Tuple[str, float]]:
+        """ Return (name, distance) pairs for the <k> players closest to
+        <point>, nearest first, counting only players named in <include> if
+        it is given. Distances are straight-line distances. A player standing
+        at <point> itself is included, at distance 0.
+
+        Subtrees are visited best first, in order of how close the region
+        their ancestors' split lines leave them comes to <point>. Each visit
+        walks down the side of every split that <point> is on and queues the
+        other side, and the search stops once the <k> best players found are
+        closer than every region left. An <include> of at most sqrt(n) names
+        is answered from the name index instead.
+        Runtime: O(log(n) + k) typical
+        === precondition ===
+        k >= 0
+        >>> t = TwoDTree((0, 0), (200, 200))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (110, 100))
+        >>> t.insert('Jack', (30, 160))
+        >>> t.nearest((100, 100), 2)
+        [('Eric', 7.0710678118654755), ('Joe', 10.0)]
+        >>> t.nearest((100, 100), 1, {'Jack', 'Joe'})
+        [('Joe', 10.0)]
+        """
+        if include is not None and len(include) ** 2 <= self._size:
+            return nearest_by_name(self._index, point, k, include)
+        best = []
+        if k <= 0 or self.is_empty():
+            return []
+        px, py = point
+        box = (self._nw[0], self._nw[1], self._se[0], self._se[1])
+        heap = [(0, 0, self, box)]
+        count = 1
+        while heap:
+            d2, _, tree, box = heapq.heappop(heap)
+            if len(best) == k and d2 >= -best[0][0]:
+                break
+            while tree is not None:
+                x, y = tree._point
+                if include is None or tree._name in include:
+                    d2 = (x - px) ** 2 + (y - py) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-d2, tree._name))
+                    elif d2 < -best[0][0]:
+                        heapq.heapreplace(best, (-d2, tree._name))
+                if tree._split_type == 'y':
+                    if py <= y:
+                        far = tree._gt
+                        far_box = (box[0], y + 1, box[2], box[3])
+                        tree, box = tree._lt, (box[0], box[1], box[2], y)
+                    else:
+                        far = tree._lt
+                        far_box = (box[0], box[1], box[2], y)
+                        tree, box = tree._gt, (box[0], y + 1, box[2], box[3])
+                elif px <= x:
+                    far = tree._gt
+                    far_box = (x + 1, box[1], box[2], box[3])
+                    tree, box = tree._lt, (box[0], box[1], x, box[3])
+                else:
+                    far = tree._lt
+                    far_box = (box[0], box[1], x, box[3])
+                    tree, box = tree._gt, (x + 1, box[1], box[2], box[3])
+                if far is not None:
+                    d2 = box_distance2(far_box, point)
+                    if len(best) < k or d2 < -best[0][0]:
+                        heapq.heappush(heap, (d2, count, far, far_box))
+                        count += 1
+        return _sorted_nearest(best)
+
+    def find_pairs_within(self, radius: int) -> List[Tuple[str, str]]:
+        """ Return a (name, name) pair for every two players in this tree
+        whose straight-line distance apart is at most <radius>. Each pair
+        appears once, in no particular order.
+
+        The tree is joined with itself: a stack holds either a subtree,
+        standing for the pairs inside it, or two parts, standing for the
+        pairs with one player in each. A part is a subtree or a single node's
+        own point. Two parts whose regions are more than <radius> apart are
+        dropped. A point against a subtree is answered by walking down the
+        subtree, and otherwise the larger part is split into its point and its
+        two subtrees, whose regions are cut at its split line.
+        Runtime: O(n + k) typical for k pairs and a small radius
+        === precondition ===
+        radius >= 0
+        >>> t = TwoDTree((0, 0), (200, 200))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (108, 109))
+        >>> t.insert('Jack', (102, 101))
+        >>> t.insert('Ann', (150, 150))
+        >>> sorted(sorted(pair) for pair in t.find_pairs_within(5))
+        [['Eric', 'Jack'], ['Eric', 'Joe']]
+        """
+        pairs = []
+        if self._size < 2:
+            return pairs
+        limit = radius * radius
+        box = (self._nw[0], self._nw[1], self._se[0], self._se[1])
+        stack = [(self, box, False, None, None, False)]
+        while stack:
+            a, a_region, a_alone, b, b_region, b_alone = stack.pop()
+            if b is None:
+                parts = a._parts(a_region)
+                for i, (node, region, alone) in enumerate(parts):
+                    if not alone:
+                        stack.append((node, region, False, None, None, False))
+                    for other, other_region, other_alone in parts[i + 1:]:
+                        if boxes_distance2(region, other_region) <= limit:
+                            stack.append((node, region, alone,
+                                          other, other_region, other_alone))
+                continue
+            if b_alone:
+                a, a_region, a_alone, b, b_region, b_alone = \
+                    b, b_region, b_alone, a, a_region, a_alone
+            if a_alone:
+                if b_alone:
+                    if (a._point[0] - b._point[0]) ** 2 \
+                            + (a._point[1] - b._point[1]) ** 2 <= limit:
+                        pairs.append((a._name, b._name))
+                else:
+                    b._pairs_with(a._name, a._point, radius, pairs)
+                continue
+            if b._size > a._size:
+                a, a_region, b, b_region = b, b_region, a, a_region
+            for node, region, alone in a._parts(a_region):
+                if boxes_distance2(region, b_region) <= limit:
+                    stack.append((node, region, alone,
+                                  b, b_region, b_alone))
+        return pairs
+
+    def _pairs_with(self, name: str, point: Tuple[int, int], radius: int,
+                    pairs: List[Tuple[str, str]]) -> None:
+        """ Append to <pairs> a (<name>, name) pair for every player below
+        <self> within <radius> of <point>, skipping any side of a split line
+        that is further than <radius> away.
+        """
+        px, py = point
+        limit = radius * radius
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            x, y = tree._point
+            if (x - px) ** 2 + (y - py) ** 2 <= limit:
+                pairs.append((name, tree._name))
+            if tree._split_type == 'y':
+                low, high, split = py - radius, py + radius, y
+            else:
+                low, high, split = px - radius, px + radius, x
+            if tree._gt is not None and high > split:
+                stack.append(tree._gt)
+            if tree._lt is not None and low <= split:
+                stack.append(tree._lt)
+
+    def _parts(self, region: Tuple[int, int, int, int]) \
+            -> List[Tuple[TwoDTree, Tuple[int, int, int, int], bool]]:
+        """ Return the parts that find_pairs_within splits the subtree <self>,
+        covering <region>, into: its own point, flagged True, and each of its
+        subtrees with the part of <region> on its side of the split line,
+        flagged True as well if the subtree is a single point.
+        """
+        x, y = self._point
+        parts = [(self, (x, y, x, y), True)]
+        if self._split_type == 'y':
+            lt_region = (region[0], region[1], region[2], y)
+            gt_region = (region[0], y + 1, region[2], region[3])
+        else:
+            lt_region = (region[0], region[1], x, region[3])
+            gt_region = (x + 1, region[1], region[2], region[3])
+        for child, sub in ((self._lt, lt_region), (self._gt, gt_region)):
+            if child is not None:
+                if child.is_leaf():
+                    parts.append((child, child._point + child._point, True))
+                else:
+                    parts.append((child, sub, False))
+        return parts
+
+    def set_team(self, name: str, team: Optional[str]) -> None:
+        """ Record that the player named <name> plays for <team>, whether or
+        not it is in this tree yet. The team is kept if the player is
+        removed, and is used again if it is inserted later. Players never
+        given a team count under None.
+        Runtime: O(log(n))
+        >>> t = TwoDTree((0, 0), (200, 200))
+        >>> t.insert('Eric', (105, 105))
+        >>> t.set_team('Eric', 'green')
+        >>> t.count_in_range((100, 100), 'SE', 10)
+        {'green': 1}
+        """
+        old = self._team_of.get(name)
+        self._team_of[name] = team
+        point = self._index.get(name)
+        if point is None or old == team:
+            return
+        tree = self
+        while True:
+            shift_team(tree._teams, old, team)
+            if tree._point == point:
+                return
+            tree = tree._own_child(tree._goes_lt(point))
+
+    def count_in_range(self, point: Tuple[int, int], direction: str,
+                       distance: int) -> Dict[Optional[str], int]:
+        """ Return how many of the players names_in_range(<point>,
+        <direction>, <distance>) would list play for each team, leaving out
+        teams with no such player.
+
+        A subtree whose region, as left by its ancestors' split lines, lies
+        wholly in the box adds its stored counts without being searched.
+        Runtime: O(log(n)) for each node on the edge of the box
+        === precondition ===
+        direction in ['NE', 'SE', 'NE', 'SW']
+        >>> t = TwoDTree((0, 0), (200, 200))
+        >>> t.set_team('Eric', 'green')
+        >>> t.set_team('Jack', 'purple')
+        >>> t.insert('Eric', (105, 105))
+        >>> t.insert('Joe', (110, 110))
+        >>> t.insert('Jack', (90, 109))
+        >>> t.count_in_range((100, 100), 'SE', 10)
+        {'green': 1, None: 1}
+        """
+        counts = {}
+        if self.is_empty():
+            return counts
+        left, top, right, bottom = range_box(point, direction, distance)
+        team_of = self._team_of
+        stack = [(self, self._nw[0], self._nw[1], self._se[0], self._se[1])]
+        while stack:
+            tree, r_left, r_top, r_right, r_bottom = stack.pop()
+            if left <= r_left and r_right <= right \
+                    and top <= r_top and r_bottom <= bottom:
+                add_teams(counts, tree._teams)
+                continue
+            x, y = tree._point
+            if left <= x <= right and top <= y <= bottom:
+                team = team_of.get(tree._name)
+                counts[team] = counts.get(team, 0) + 1
+            lt, gt = tree._lt, tree._gt
+            if tree._split_type == 'y':
+                if gt is not None and bottom > y:
+                    stack.append((gt, r_left, y + 1, r_right, r_bottom))
+                if lt is not None and top <= y:
+                    stack.append((lt, r_left, r_top, r_right, y))
+            else:
+                if gt is not None and right > x:
+                    stack.append((gt, x + 1, r_top, r_right, r_bottom))
+                if lt is not None and left <= x:
+                    stack.append((lt, r_left, r_top, x, r_bottom))
+        return counts
+
     def size(self) -> int:
         """ Return the number of nodes in <self>
-        Runtime: O(n)
+        Runtime: O(1)
         >>> t = TwoDTree((0, 0), (100, 100))
         >>> t.size()
         0
@@ -1302,22 +2678,14 @@ class TwoDTree(Tree):
         >>> t.size()
         1
         """
-        if self._name is None and self._point is None:
-            return 0
-        else:
-            if self._lt is not None:
-                a = self._lt.size()
-            if self._gt is not None:
-                b = self._gt.size()
-            total = a + b
-            return total
+        return self._size
 
     def height(self) -> int:
         """ Return the height of <self>
         Height is measured as the number of nodes in the path from the root of
         this
         tree to the node at the greatest depth in this tree.
-        Runtime: O(n)
+        Runtime: O(1)
         >>> t = TwoDTree((0, 0), (100, 100))
         >>> t.height()
         0
@@ -1325,21 +2693,7 @@ class TwoDTree(Tree):
         >>> t.height()
         1
         """
-        if self._lt is None and self._gt is None and self._point is None:
-            return 1
-        elif self.is_empty():
-            return 0
-        elif self.is_leaf():
-            return 1
-        else:
-            a = 0
-            b = 0
-            if self._lt is not None:
-                a = self._lt.height()
-            if self._gt is not None:
-                b = self._gt.height()
-            total = max(a, b)
-            return total + 1
+        return self._height
 
     def depth(self, tree: Tree) -> Optional[int]:
         """ Return the depth of the subtree <tree> relative to <self>. Return
@@ -1365,6 +2719,53 @@ class TwoDTree(Tree):
             elif not self._gt.is_empty():
                 return self._gt.depth(tree) + 1
 
+    def is_valid(self) -> bool:
+        """ Return True if every player in <self> lies inside the bounds and on
+        the correct side of every ancestor's split line, no node below the
+        root is empty, every stored size, height and team count is current,
+        and the name index matches the stored players.
+        Runtime: O(n)
+        >>> t = TwoDTree((0, 0), (100, 100))
+        >>> t.insert("Eric", (50, 50))
+        >>> t.insert("Joe", (20, 70))
+        >>> t.is_valid()
+        True
+        >>> t._lt._point = (60, 70)
+        >>> t.is_valid()
+        False
+        """
+        found = {}
+        box = (self._nw[0], self._nw[1], self._se[0], self._se[1])
+        return self._valid_below(box, found) and found == self._index
+
+    def _valid_below(self, box: Tuple[int, int, int, int],
+                     found: Dict[str, Tuple[int, int]]) -> bool:
+        """ Return True if the subtree <self>, whose points must lie in <box>,
+        is well formed, recording each player it holds in <found>.
+        """
+        if self._point is None:
+            return self._lt is None and self._gt is None \
+                and self._size == 0 and not self._teams
+        stack = [(self, box)]
+        while stack:
+            tree, box = stack.pop()
+            if (tree._size, tree._height) != tree._counts() \
+                    or tree._teams != tree._team_counts() \
+                    or not in_box(box, tree._point):
+                return False
+            found[tree._name] = tree._point
+            axis = 1 if tree._split_type == 'y' else 0
+            lt_box = list(box)
+            lt_box[axis + 2] = min(box[axis + 2], tree._point[axis])
+            gt_box = list(box)
+            gt_box[axis] = max(box[axis], tree._point[axis] + 1)
+            for child, sub in ((tree._lt, lt_box), (tree._gt, gt_box)):
+                if child is not None:
+                    if child.is_empty():
+                        return False
+                    stack.append((child, tuple(sub)))
+        return True
+
     def is_leaf(self) -> bool:
         """ Return True if <self> has no children
         Runtime: O(1)
@@ -1387,34 +2788,299 @@ class TwoDTree(Tree):
 
     def takeoff(self) -> List:
         a = []
-        if self._point is not None and self._name is not None:
-            ab = [self._name, self._point]
-            a.append(ab)
-        if self._lt is not None:
-            ab = self._lt.takeoff()
-            a.append(ab)
-        if self._gt is not None:
-            ab = self._gt.takeoff()
-            a.append(ab)
+        stack = [(self, a)]
+        while stack:
+            tree, out = stack.pop()
+            if tree._point is not None and tree._name is not None:
+                out.append([tree._name, tree._point])
+            for child in (tree._lt, tree._gt):
+                if child is not None:
+                    ab = []
+                    out.append(ab)
+                    stack.append((child, ab))
         return a
 
+    @classmethod
+    def from_points(cls, nw: Tuple[int, int], se: Tuple[int, int],
+                    items: List[Tuple[str, Tuple[int, int]]],
+                    alpha: Optional[float] = None) -> TwoDTree:
+        """ Return a new TwoDTree covering <nw> to <se> that holds every
+        (name, point) pair in <items>, built by splitting on the median point
+        at every level so that the tree has logarithmic height. <alpha> is
+        passed on to the new tree.
+
+        Raise an OutOfBoundsError if a point in <items> is out of bounds, or
+        if two items share a name or a point.
+
+        Runtime: O(n log(n))
+        >>> t = TwoDTree.from_points((0, 0), (100, 100),
+        ...                          [(str(i), (i, i)) for i in range(15)])
+        >>> t.height()
+        4
+        >>> t.getpoint('7')
+        (7, 7)
+        """
+        tree = cls(nw, se, alpha)
+        for name, point in items:
+            if point[0] > se[0] or point[1] > se[1] or point[0] < nw[0] \
+                    or point[1] < nw[1]:
+                raise OutOfBoundsError
+            tree._index[name] = point
+        if len(tree._index) != len(items) \
+                or len(set(tree._index.values())) != len(items):
+            raise OutOfBoundsError
+        tree._rebuild(items, 'x')
+        return tree
+
+    def snapshot(self) -> int:
+        """ Save the current state of this tree as a new version and return
+        its number. Later changes copy the nodes they touch instead of
+        changing the ones the saved versions share, and only the newest
+        versions, up to the tree's version window, are kept.
+
+        The version is a copy of the root sharing every other node, and each
+        node records the version it was made for. A change copies each node
+        from an older version on its way down, so it copies the O(depth)
+        nodes on its path, and only once per version. A rebuild makes new
+        nodes and leaves the old ones to the versions that share them. The
+        version keeps its own copy of the players' teams.
+        Runtime: O(t) for the t players given a team
+        >>> t = TwoDTree((0, 0), (200, 200))
+        >>> t.insert('Eric', (150, 150))
+        >>> t.insert('Joe', (50, 50))
+        >>> first = t.snapshot()
+        >>> t.remove('Eric')
+        >>> t.set_team('Joe', 'green')
+        >>> t.version(first).contains_point((150, 150))
+        True
+        >>> t.version(first).count_in_range((0, 0), 'SE', 200)
+        {None: 2}
+        >>> t.contains_point((150, 150))
+        False
+        """
+        frozen = self._copy(self._epoch)
+        frozen._index = None
+        frozen._versions = {}
+        frozen._team_of = dict(self._team_of)
+        self._versions[self._epoch] = frozen
+        while len(self._versions) > self._window:
+            del self._versions[next(iter(self._versions))]
+        self._epoch += 1
+        return self._epoch - 1
+
+    def version(self, number: int) -> Optional[TwoDTree]:
+        """ Return the tree as it was when snapshot returned <number>, or None
+        if that version is no longer kept. A version answers queries that
+        walk its nodes, such as names_in_range, contains_point and
+        count_in_range, and must not be changed.
+        Runtime: O(1)
+        """
+        return self._versions.get(number)
+
+    def dump(self, path: str) -> None:
+        """ Save every player in this tree, with its location and team, and
+        the tree's bounds and alpha, to the file at <path> in the snapshot
+        format read by load.
+
+        Nodes are saved in preorder with a code for their split type and
+        which children they have, so load can relink the same tree without
+        sorting.
+        Runtime: O(n)
+        >>> import os, tempfile
+        >>> t = TwoDTree((0, 0), (200, 200), 0.8)
+        >>> t.set_team('Eric', 'green')
+        >>> t.insert('Eric', (150, 150))
+        >>> t.insert('Joe', (50, 50))
+        >>> path = os.path.join(tempfile.mkdtemp(), 'field.snap')
+        >>> t.dump(path)
+        >>> copy = TwoDTree.load(path)
+        >>> copy.getpoint('Eric'), copy._alpha
+        ((150, 150), 0.8)
+        >>> copy.count_in_range((0, 0), 'SE', 200) == {'green': 1, None: 1}
+        True
+        >>> QuadTree.load(path)
+        Traceback (most recent call last):
+        ...
+        ValueError: not a snapshot of this kind of field
+        >>> os.remove(path)
+        """
+        shape = array('b')
+        items = []
+        stack = [self] if not self.is_empty() else []
+        while stack:
+            tree = stack.pop()
+            shape.append((tree._split_type == 'y')
+                         | (tree._lt is not None) << 1
+                         | (tree._gt is not None) << 2)
+            items.append((tree._name, tree._point))
+            if tree._gt is not None:
+                stack.append(tree._gt)
+            if tree._lt is not None:
+                stack.append(tree._lt)
+        _write_snapshot(path, TWODTREE_SNAPSHOT,
+                        (self._nw[0], self._nw[1], self._se[0], self._se[1]),
+                        self._alpha, shape, items, self._team_of)
+
+    @classmethod
+    def load(cls, path: str) -> TwoDTree:
+        """ Return a new TwoDTree holding the players saved at <path> by
+        dump, with the same nodes the saved tree had.
+        Raise a ValueError if the file is not a TwoDTree snapshot.
+        Runtime: O(n)
+        """
+        bounds, alpha, shape, items, teams = _read_snapshot(
+            path, TWODTREE_SNAPSHOT)
+        tree = cls(bounds[:2], bounds[2:], alpha)
+        team_of = tree._team_of
+        team_of.update(teams)
+        tree._index = dict(items)
+        inner = []
+        stack = [tree]
+        for code, (name, point) in zip(shape, items):
+            node = stack.pop()
+            node._split_type = 'y' if code & 1 else 'x'
+            node._name = name
+            node._point = point
+            if code < 2:
+                node._size = node._height = 1
+                node._teams = {team_of.get(name): 1}
+                continue
+            inner.append(node)
+            if code & 4:
+                node._gt = node._new_node()
+                stack.append(node._gt)
+            if code & 2:
+                node._lt = node._new_node()
+                stack.append(node._lt)
+        for node in reversed(inner):
+            node._recount()
+        return tree
+
+    def _rebuild(self, items: List[Tuple[str, Tuple[int, int]]],
+                 split_type: str) -> None:
+        """ Replace the subtree <self> with a median-split tree of <items>
+        whose top node splits on <split_type>.
+        """
+        self._name = None
+        self._point = None
+        self._lt = None
+        self._gt = None
+        self._size = 0
+        self._height = 0
+        self._teams = {}
+        self._split_type = split_type
+        if items:
+            by_x = sorted(items, key=lambda item: item[1])
+            by_y = sorted(items, key=lambda item: (item[1][1], item[1][0]))
+            self._build(by_x, by_y, split_type)
+
+    def _height_limit(self, size: int) -> int:
+        """ Return the greatest height a subtree of <size> players can have
+        when no child holds more than <alpha> of its parent's players.
+        """
+        return int(math.log(size) / -math.log(self._alpha)) + 1
+
+    def _rebalance(self) -> None:
+        """ If <self> balances itself and has grown deeper than _height_limit
+        allows, rebuild the smallest subtree on its longest path that is too
+        deep for its own size. That subtree is the scapegoat: it holds a node
+        whose larger child has more than <alpha> of its players.
+        Runtime: O(1) while balanced, amortized O(log(n)) otherwise
+        """
+        if self._alpha is None or self._size == 0 \
+                or self._height <= self._height_limit(self._size):
+            return
+        path = [self]
+        node = self
+        while not node.is_leaf():
+            if node._lt is None or node._gt is not None \
+                    and node._gt._height > node._lt._height:
+                node = node._own_child(False)
+            else:
+                node = node._own_child(True)
+            path.append(node)
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            if node._height > self._height_limit(node._size):
+                node._rebuild(node._items(), node._split_type)
+                for parent in reversed(path[:i]):
+                    parent._recount()
+                return
+
+    def _build(self, by_x: List[Tuple[str, Tuple[int, int]]],
+               by_y: List[Tuple[str, Tuple[int, int]]],
+               split_type: str) -> None:
+        """ Store the items of <by_x> in the empty node <self> and new
+        subtrees below it, splitting on <split_type> here and alternating
+        below. <by_x> and <by_y> hold the same items, sorted by x and by y.
+
+        The split is the median item or a neighbour of the run of items that
+        share its coordinate (see _split_index). If players sharing coordinates
+        would leave more than 3/4 of the items on one side, the node splits on
+        the other axis instead, which can then always do better.
+        """
+        if len(by_x) == 1:
+            self._split_type = split_type
+            self._name, self._point = by_x[0]
+            self._size = 1
+            self._height = 1
+            self._teams = {self._team_of.get(self._name): 1}
+            return
+        axis = 0 if split_type == 'x' else 1
+        ordered, other = (by_x, by_y) if axis == 0 else (by_y, by_x)
+        k = _split_index(ordered, axis)
+        if 4 * max(k, len(ordered) - 1 - k) > 3 * len(ordered):
+            other_k = _split_index(other, 1 - axis)
+            if max(other_k, len(other) - 1 - other_k) \
+                    < max(k, len(ordered) - 1 - k):
+                axis = 1 - axis
+                split_type = 'y' if split_type == 'x' else 'x'
+                ordered, other, k = other, ordered, other_k
+        self._split_type = split_type
+        self._name, self._point = ordered[k]
+        split = self._point[axis]
+        next_split = 'y' if split_type == 'x' else 'x'
+        if k > 0:
+            lt_other = [item for item in other
+                        if item[1][axis] <= split and item[0] != self._name]
+            self._lt = self._new_node()
+            if axis == 0:
+                self._lt._build(ordered[:k], lt_other, next_split)
+            else:
+                self._lt._build(lt_other, ordered[:k], next_split)
+        if k + 1 < len(ordered):
+            gt_other = [item for item in other if item[1][axis] > split]
+            self._gt = self._new_node()
+            if axis == 0:
+                self._gt._build(ordered[k + 1:], gt_other, next_split)
+            else:
+                self._gt._build(gt_other, ordered[k + 1:], next_split)
+        self._recount()
+
     def balance(self) -> None:
         """ Balance <self> so that there is at most a difference of 1 between
         the
         size of the _lt subtree and the size of the _gt subtree for all trees in
-        <self>.
+        <self>. Players sharing the split coordinate of a node all go to its
+        _lt subtree, which can leave that side larger.
+        Runtime: O(n log(n))
         >>> q=TwoDTree((0, 0), (500, 500))
         >>> q1=TwoDTree((0, 0), (500, 500))
         >>> q1.insert('d', (250,250))
         >>> q.balance()
+        >>> q1.balance()
+        >>> q1.getpoint('d')
+        (250, 250)
+        >>> q2 = TwoDTree((0, 0), (500, 500))
+        >>> for i in range(31):
+        ...     q2.insert(str(i), (i, i))
+        >>> q2.height()
+        31
+        >>> q2.balance()
+        >>> q2.height()
+        5
         """
-        alist = self.takeoff()
-        newquad = TwoDTree(self._nw, self._se)
-        for item in alist:
-            newquad.insert(item[0], item[1])
-        self._lt = newquad._lt
-        self._gt = newquad._gt
-
+        self._rebuild(self._items(), 'x')
 
 if __name__ == '__main__':
     import python_ta